@@ -0,0 +1,5 @@
+"""
+Performance benchmarks for the learning_assistant app.
+
+These are not collected by the default test run; use ``make benchmark`` to run them.
+"""
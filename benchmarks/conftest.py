@@ -0,0 +1,55 @@
+"""
+Shared fixtures for the learning_assistant performance benchmarks.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class _CompletionRequestHandler(BaseHTTPRequestHandler):
+    """
+    Request handler that answers every POST with a canned chat completion.
+    """
+
+    # HTTP/1.1 is required for connections to be kept alive between requests.
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, which Nagle's algorithm would delay on a kept-alive connection.
+    disable_nagle_algorithm = True
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """
+        Consume the request body and respond with a single assistant message.
+        """
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = json.dumps({'role': 'assistant', 'content': 'This is a benchmark completion.'}).encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """
+        Silence per-request logging, which would otherwise dominate the benchmark output.
+        """
+
+
+@pytest.fixture(scope='session')
+def completion_server():
+    """
+    Run a local stub of the chat completion endpoint for the duration of the benchmark session.
+
+    Yields the URL of the endpoint.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _CompletionRequestHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f'http://127.0.0.1:{server.server_port}/'
+
+    server.shutdown()
+    server.server_close()
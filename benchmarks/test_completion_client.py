@@ -0,0 +1,34 @@
+"""
+Benchmarks for the chat completion HTTP client.
+
+These compare a new connection per request, as made by requests.post, with the pooled ChatCompletionClient, against a
+local stub of the completion endpoint. The difference between the two is the per-request connection setup cost.
+"""
+import json
+
+import pytest
+import requests
+
+from learning_assistant.utils import ChatCompletionClient
+
+REQUEST_BODY = json.dumps({'message_list': [{'role': 'user', 'content': 'What is 2+2?'}]})
+HEADERS = {'Content-Type': 'application/json'}
+
+
+@pytest.mark.benchmark(group='completion-client')
+def test_unpooled_post(benchmark, completion_server):
+    def post():
+        return requests.post(completion_server, headers=HEADERS, data=REQUEST_BODY, timeout=(1, 15)).json()
+
+    assert benchmark(post)['role'] == 'assistant'
+
+
+@pytest.mark.benchmark(group='completion-client')
+def test_pooled_client_post(benchmark, completion_server):
+    client = ChatCompletionClient()
+
+    def post():
+        return client.post(completion_server, headers=HEADERS, data=REQUEST_BODY, timeout=(1, 15)).json()
+
+    assert benchmark(post)['role'] == 'assistant'
+    client.close()
@@ -0,0 +1,93 @@
+"""
+Benchmarks for a chat turn through the CourseChatView, end to end.
+
+The platform functions that the view calls are stubbed: the user is a verified learner, the course run data comes from
+a canned catalog response, and the unit content is the one extracted when the course was published. The chat
+completion endpoint is a local stub, so the time measured is that of the view itself, from authentication to the
+chat history write, plus a round trip to a local server.
+"""
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.test import Client, override_settings
+from django.urls import reverse
+from opaque_keys.edx.keys import CourseKey
+
+from learning_assistant.models import LearningAssistantCourseEnabled, LearningAssistantUnitContent
+from learning_assistant.utils import reset_chat_completion_client
+
+User = get_user_model()
+
+COURSE_RUN_ID = 'course-v1:edx+benchmark+run'
+COURSE_RUN_KEY = CourseKey.from_string(COURSE_RUN_ID)
+UNIT_ID = 'block-v1:edx+benchmark+run+type@vertical+block@unit'
+UNIT_CONTENT_ITEMS = [
+    {'content_type': 'TEXT', 'content_text': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 40},
+    {'content_type': 'VIDEO', 'content_text': 'Welcome to this video about the benchmark course. ' * 80},
+]
+HISTORY_LENGTHS = (1, 20)
+COURSE_RUN_DATA = {'course': 'edx+benchmark', 'start': '2020-01-01T00:00:00Z', 'end': None}
+
+pytestmark = pytest.mark.django_db
+
+
+def _message_list(length):
+    """
+    Return a chat history of the given length, ending with a message of the learner.
+    """
+    return [
+        {
+            'role': 'assistant' if (length - i) % 2 == 0 else 'user',
+            'content': f'Message {i}: ' + 'What does this part of the unit mean? ' * 5,
+        }
+        for i in range(length)
+    ]
+
+
+@pytest.fixture(name='chat_client')
+def _chat_client(completion_server):
+    """
+    Return a client logged in as a verified learner of a course with the learning assistant enabled.
+    """
+    user = User.objects.create(username='benchmark-learner', email='benchmark-learner@example.com')
+    LearningAssistantCourseEnabled.objects.create(course_id=COURSE_RUN_KEY, enabled=True)
+    LearningAssistantUnitContent.objects.create(
+        course_id=COURSE_RUN_KEY,
+        unit_usage_key=UNIT_ID,
+        content_length=sum(len(item['content_text']) for item in UNIT_CONTENT_ITEMS),
+        content_items=UNIT_CONTENT_ITEMS,
+    )
+
+    course_mode = MagicMock(VERIFIED_MODES=['verified'], CREDIT_MODES=['credit'], NO_ID_PROFESSIONAL_MODE='no-id')
+    course_enrollment = MagicMock()
+    course_enrollment.get_enrollment.return_value = MagicMock(mode='verified', upgrade_deadline=None)
+
+    client = Client()
+    client.force_login(user)
+
+    with override_settings(LEARNING_ASSISTANT_AVAILABLE=True, CHAT_COMPLETION_API=completion_server), \
+            patch('learning_assistant.views.CourseMode', course_mode), \
+            patch('learning_assistant.views.CourseEnrollment', course_enrollment), \
+            patch('learning_assistant.views.get_user_role', return_value='student'), \
+            patch('learning_assistant.views.chat_history_enabled', return_value=True), \
+            patch('learning_assistant.views.get_cache_course_run_data', return_value=COURSE_RUN_DATA), \
+            patch('learning_assistant.api.get_cache_course_run_data', return_value=COURSE_RUN_DATA), \
+            patch('learning_assistant.api.get_cache_course_data', return_value={
+                'skill_names': ['Python', 'Django'], 'title': 'Benchmark Course'
+            }):
+        reset_chat_completion_client()
+        yield client
+        reset_chat_completion_client()
+
+
+@pytest.mark.parametrize('history_length', HISTORY_LENGTHS)
+def test_course_chat_view(benchmark, chat_client, history_length):
+    benchmark.group = 'course-chat-view'
+    url = reverse('chat', kwargs={'course_run_id': COURSE_RUN_ID}) + f'?unit_id={UNIT_ID}'
+    data = _message_list(history_length)
+
+    response = benchmark(chat_client.post, url, data=data, content_type='application/json')
+
+    assert response.status_code == 200
+    assert response.json()['role'] == 'assistant'
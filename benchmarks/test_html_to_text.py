@@ -0,0 +1,168 @@
+"""
+Benchmarks for converting the HTML of course units to text.
+
+The corpus is made of generated course pages of increasing size, with the markup found in course HTML blocks: nested
+sections, inline formatting, lists, tables, code, embedded media, scripts and styles, entities and the irregular
+indentation left by the Studio editor. The original implementation is kept here as a reference point, and its output
+must be identical to that of html_to_text.
+"""
+import random
+from html.parser import HTMLParser
+from re import sub
+
+import pytest
+from django.conf import settings
+
+from learning_assistant.text_utils import cleanup_text, html_to_text
+
+PAGE_SECTIONS = {'small': 10, 'medium': 100, 'large': 1000}
+TAGS_TO_REMOVE = ['script', 'style', 'iframe']
+
+WORDS = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore et dolore '
+    'magna aliqua enim ad minim veniam quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo'
+).split()
+
+
+def _reference_cleanup_text(text):
+    """
+    The multiple pass cleanup_text that html_to_text used to run.
+    """
+    stripped = sub(r'[^\S\r\n]+', ' ', text)
+    stripped = sub(r'\n{2,}', '\n', stripped)
+    stripped = sub(r'(\s+)?\n(\s+)?', '\n', stripped)
+    stripped = sub(r'(^(\s+)\n?)|(\n(\s+)?$)', '', stripped)
+
+    return stripped
+
+
+class _ReferenceHTMLToTextHelper(HTMLParser):
+    """
+    The HTML parser that html_to_text used to run, which reads the tags to remove from settings on every start tag.
+    """
+
+    _is_content = True
+
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.reset()
+        self.fed = []
+
+    def handle_starttag(self, tag, _):
+        tags_to_filter = getattr(settings, 'LEARNING_ASSISTANT_HTML_TAGS_TO_REMOVE', None)
+        self._is_content = not (tags_to_filter and tag in tags_to_filter)
+
+    def handle_data(self, data):
+        if self._is_content:
+            self.fed.append(data)
+
+    def get_data(self):
+        return ''.join(self.fed)
+
+
+def _reference_html_to_text(html):
+    """
+    The html_to_text implementation that was replaced.
+    """
+    htmlstripper = _ReferenceHTMLToTextHelper()
+    htmlstripper.feed(html)
+    return _reference_cleanup_text(htmlstripper.get_data())
+
+
+def _sentence(generator):
+    """
+    Return a sentence of random words, some of them with inline formatting or entities.
+    """
+    words = []
+    for word in generator.choices(WORDS, k=generator.randint(6, 20)):
+        decoration = generator.random()
+        if decoration < 0.05:
+            word = f'<strong>{word}</strong>'
+        elif decoration < 0.1:
+            word = f'<a href="/courses/{word}" target="_blank">{word}</a>'
+        elif decoration < 0.12:
+            word = f'{word}&nbsp;&amp;'
+        words.append(word)
+    return ' '.join(words).capitalize() + '.'
+
+
+def _section(generator, index):
+    """
+    Return one section of a course page.
+    """
+    paragraphs = '\n'.join(
+        f'        <p>\n            {_sentence(generator)}  {_sentence(generator)}\t\n        </p>'
+        for _ in range(generator.randint(1, 4))
+    )
+    items = ''.join(f'<li>{_sentence(generator)}</li>\n\n' for _ in range(generator.randint(2, 5)))
+    rows = ''.join(
+        f'<tr><td>{generator.choice(WORDS)}</td>  <td>{generator.randint(0, 1000)}</td></tr>\r\n' for _ in range(3)
+    )
+    return f'''
+    <section id="section-{index}">
+        <h2>Section {index}: {_sentence(generator)}</h2>
+{paragraphs}
+        <ul>
+            {items}
+        </ul>
+        <table class="data"><tbody>{rows}</tbody></table>
+        <pre><code>def example_{index}():
+    return {index}</code></pre>
+        <script type="text/javascript">window.analytics.track("section-{index}", {{"viewed": true}});</script>
+        <style>#section-{index} p {{ margin: 0 }}</style>
+        <iframe src="https://www.youtube.com/embed/{index}" width="560" height="315"></iframe>
+        <!-- Section {index} ends here -->
+    </section>
+'''
+
+
+def _page(sections):
+    """
+    Return a generated course page with the given number of sections.
+    """
+    generator = random.Random(sections)
+    return '<div class="course-content">\n' + ''.join(_section(generator, i) for i in range(sections)) + '\n</div>\n'
+
+
+@pytest.fixture(params=sorted(PAGE_SECTIONS), name='page')
+def _page_fixture(request, settings):  # pylint: disable=redefined-outer-name
+    settings.LEARNING_ASSISTANT_HTML_TAGS_TO_REMOVE = TAGS_TO_REMOVE
+    return request.param, _page(PAGE_SECTIONS[request.param])
+
+
+def test_reference_html_to_text(benchmark, page):
+    size, html = page
+    benchmark.group = f'html-to-text-{size}'
+
+    result = benchmark(_reference_html_to_text, html)
+
+    assert result == html_to_text(html)
+
+
+def test_html_to_text(benchmark, page):
+    size, html = page
+    benchmark.group = f'html-to-text-{size}'
+
+    benchmark(html_to_text, html)
+
+
+def test_reference_cleanup_text(benchmark, page):
+    size, html = page
+    benchmark.group = f'cleanup-text-{size}'
+    helper = _ReferenceHTMLToTextHelper()
+    helper.feed(html)
+    text = helper.get_data()
+
+    benchmark(_reference_cleanup_text, text)
+
+
+def test_cleanup_text(benchmark, page):
+    size, html = page
+    benchmark.group = f'cleanup-text-{size}'
+    helper = _ReferenceHTMLToTextHelper()
+    helper.feed(html)
+    text = helper.get_data()
+
+    result = benchmark(cleanup_text, text)
+
+    assert result == _reference_cleanup_text(text)
@@ -0,0 +1,103 @@
+"""
+Benchmarks for reading the chat history of a user in a course.
+
+The message table is filled with a million messages, or the number set by the BENCHMARK_MESSAGE_COUNT environment
+variable, from thousands of users in several courses. The history that is read is that of a heavy user, who sent one
+percent of the messages. The history query is compared with the query it replaced, which fetched
+every column, run without the composite (user, course_id, created) index.
+"""
+import os
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.utils import timezone
+from opaque_keys.edx.keys import CourseKey
+
+from learning_assistant.api import get_message_history
+from learning_assistant.models import LearningAssistantMessage
+
+User = get_user_model()
+
+MESSAGE_COUNT = int(os.environ.get('BENCHMARK_MESSAGE_COUNT', 1000000))
+USER_COUNT = 5000
+# every HEAVY_USER_SHARE-th message belongs to the user whose history is read, who chats in every course
+HEAVY_USER_SHARE = 100
+COURSE_KEYS = [CourseKey.from_string(f'course-v1:edx+benchmark+{i}') for i in range(4)]
+HISTORY_LENGTH = 50
+BATCH_SIZE = 20000
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(scope='module', name='history_owner')
+def _message_table(django_db_setup, django_db_blocker):  # pylint: disable=unused-argument
+    """
+    Fill the message table, and return a user and course whose history is read.
+    """
+    with django_db_blocker.unblock():
+        users = User.objects.bulk_create(
+            [User(username=f'benchmark-{i}', email=f'benchmark-{i}@example.com') for i in range(USER_COUNT)]
+        )
+        start = timezone.now() - timedelta(days=30)
+
+        for batch_start in range(0, MESSAGE_COUNT, BATCH_SIZE):
+            LearningAssistantMessage.objects.bulk_create([
+                LearningAssistantMessage(
+                    course_id=COURSE_KEYS[(i // HEAVY_USER_SHARE) % len(COURSE_KEYS)],
+                    user=users[0] if i % HEAVY_USER_SHARE == 0 else users[(i * 7919) % USER_COUNT],
+                    role=LearningAssistantMessage.USER_ROLE if i % 2 else LearningAssistantMessage.ASSISTANT_ROLE,
+                    content=f'Message {i}: ' + 'Lorem ipsum dolor sit amet. ' * 10,
+                    created=start + timedelta(seconds=i),
+                )
+                for i in range(batch_start, min(batch_start + BATCH_SIZE, MESSAGE_COUNT))
+            ])
+
+        yield users[0], COURSE_KEYS[0]
+
+        LearningAssistantMessage.objects.all().delete()
+        User.objects.filter(username__startswith='benchmark-').delete()
+
+
+def _reference_get_message_history(courserun_key, user, message_count):
+    """
+    The get_message_history query that fetched every column of the messages.
+    """
+    return list(LearningAssistantMessage.objects.filter(
+        course_id=courserun_key, user=user).order_by('-created')[:message_count])[::-1]
+
+
+def _without_history_index(func, *args):
+    """
+    Call func with the composite history index dropped, as it was before the index was added.
+    """
+    index = next(
+        index for index in LearningAssistantMessage._meta.indexes if index.name == 'la_message_user_course_created'
+    )
+    # The statements are run directly, because the schema editor cannot be entered within the test's transaction.
+    schema_editor = connection.schema_editor()
+    with connection.cursor() as cursor:
+        cursor.execute(str(index.remove_sql(LearningAssistantMessage, schema_editor)))
+        try:
+            return func(*args)
+        finally:
+            cursor.execute(str(index.create_sql(LearningAssistantMessage, schema_editor)))
+
+
+def test_reference_message_history(benchmark, history_owner):
+    benchmark.group = 'message-history'
+    user, course_key = history_owner
+
+    result = _without_history_index(benchmark, _reference_get_message_history, course_key, user, HISTORY_LENGTH)
+
+    assert [message.content for message in result] == [
+        message.content for message in get_message_history(course_key, user, HISTORY_LENGTH)
+    ]
+
+
+def test_message_history(benchmark, history_owner):
+    benchmark.group = 'message-history'
+    user, course_key = history_owner
+
+    benchmark(get_message_history, course_key, user, HISTORY_LENGTH)
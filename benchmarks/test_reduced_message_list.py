@@ -0,0 +1,91 @@
+"""
+Benchmarks for trimming the chat history to the completion token budget.
+
+Clients resend the whole chat history on every turn, so these run get_reduced_message_list over histories of
+increasing length. The original implementation is kept here as a reference point.
+"""
+import copy
+
+import pytest
+from django.conf import settings
+
+from learning_assistant.token_counters import _load_token_counter
+from learning_assistant.utils import estimated_message_tokens, get_reduced_message_list
+
+PROMPT_TEMPLATE = 'This is a prompt. ' * 200
+HISTORY_LENGTHS = (50, 500, 5000)
+
+
+def _reference_get_reduced_message_list(prompt_template, message_list):
+    """
+    The deepcopy and insert based implementation that get_reduced_message_list replaced.
+    """
+    total_system_tokens = estimated_message_tokens(prompt_template)
+
+    max_tokens = getattr(settings, 'CHAT_COMPLETION_MAX_TOKENS', 16385)
+    response_tokens = getattr(settings, 'CHAT_COMPLETION_RESPONSE_TOKENS', 1000)
+    remaining_tokens = max_tokens - response_tokens - total_system_tokens
+
+    new_message_list = []
+    message_list_copy = copy.deepcopy(message_list)
+    total_message_tokens = 0
+
+    while total_message_tokens < remaining_tokens and len(message_list_copy) != 0:
+        new_message = message_list_copy.pop()
+        total_message_tokens += estimated_message_tokens(new_message['content'])
+        if total_message_tokens >= remaining_tokens:
+            break
+
+        new_message_list.insert(0, new_message)
+
+    return new_message_list
+
+
+def _history(length):
+    """
+    Return a chat history of the given length, alternating between user and assistant messages.
+    """
+    return [
+        {
+            'role': 'user' if i % 2 == 0 else 'assistant',
+            'content': f'Message {i}: ' + 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 4,
+        }
+        for i in range(length)
+    ]
+
+
+@pytest.mark.parametrize('length', HISTORY_LENGTHS)
+def test_reference_reduced_message_list(benchmark, length):
+    benchmark.group = f'reduced-message-list-{length}'
+    history = _history(length)
+
+    result = benchmark(_reference_get_reduced_message_list, PROMPT_TEMPLATE, history)
+
+    assert result == get_reduced_message_list(PROMPT_TEMPLATE, history)
+
+
+@pytest.mark.parametrize('length', HISTORY_LENGTHS)
+def test_reduced_message_list(benchmark, settings, length):  # pylint: disable=redefined-outer-name
+    benchmark.group = f'reduced-message-list-{length}'
+    settings.CHAT_COMPLETION_TOKEN_COUNT_CACHE_SIZE = 0
+    history = _history(length)
+
+    benchmark(get_reduced_message_list, PROMPT_TEMPLATE, history)
+
+
+@pytest.mark.parametrize('length', HISTORY_LENGTHS)
+def test_reduced_message_list_cached(benchmark, length):
+    benchmark.group = f'reduced-message-list-{length}'
+    _load_token_counter.cache_clear()
+    history = _history(length)
+
+    benchmark(get_reduced_message_list, PROMPT_TEMPLATE, history)
+
+
+@pytest.mark.parametrize('length', HISTORY_LENGTHS)
+def test_reduced_message_list_regex_token_counter(benchmark, settings, length):  # pylint: disable=redefined-outer-name
+    benchmark.group = f'reduced-message-list-{length}'
+    settings.CHAT_COMPLETION_TOKEN_COUNTER = 'learning_assistant.token_counters.RegexTokenCounter'
+    history = _history(length)
+
+    benchmark(get_reduced_message_list, PROMPT_TEMPLATE, history)
@@ -0,0 +1,66 @@
+"""
+Benchmarks for rendering the prompt template.
+
+The prompt template is rendered on every chat turn. These compare compiling it on every render, as
+render_prompt_template used to, with rendering the cached compiled template, and measure render_prompt_template as a
+whole, with the unit content and the course data returned by stubs of the platform.
+"""
+from unittest.mock import MagicMock, patch
+
+from django.conf import settings
+from jinja2 import BaseLoader, Environment
+
+from learning_assistant.api import _compiled_prompt_templates, get_compiled_prompt_template, render_prompt_template
+
+UNIT_CONTENT = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 200
+UNIT_CONTENT_ITEMS = [
+    {'content_type': 'TEXT', 'content_text': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 100},
+    {'content_type': 'VIDEO', 'content_text': 'Welcome to this video about the benchmark course. ' * 200},
+]
+CONTEXT = {'unit_content': UNIT_CONTENT, 'skill_names': ['Python', 'Django', 'Jinja'], 'title': 'Benchmark Course'}
+
+
+def _reference_render(template_string):
+    """
+    Compile and render the template string, as render_prompt_template did before compiled templates were cached.
+    """
+    return Environment(loader=BaseLoader).from_string(template_string).render(**CONTEXT)
+
+
+def _cached_render(template_string):
+    """
+    Render the cached compiled template for the template string.
+    """
+    return get_compiled_prompt_template(template_string).render(**CONTEXT)
+
+
+def test_reference_render_prompt_template(benchmark):
+    benchmark.group = 'render-prompt-template'
+    template_string = settings.LEARNING_ASSISTANT_PROMPT_TEMPLATE
+
+    result = benchmark(_reference_render, template_string)
+
+    assert result == _cached_render(template_string)
+
+
+def test_render_prompt_template_cached(benchmark):
+    benchmark.group = 'render-prompt-template'
+    template_string = settings.LEARNING_ASSISTANT_PROMPT_TEMPLATE
+    _compiled_prompt_templates.clear()
+
+    benchmark(_cached_render, template_string)
+
+
+def test_render_prompt_template(benchmark):
+    benchmark.group = 'render-prompt-template'
+    template_string = settings.LEARNING_ASSISTANT_PROMPT_TEMPLATE
+    unit_id = 'block-v1:edx+benchmark+run+type@vertical+block@unit'
+
+    with patch('learning_assistant.api.get_block_content', return_value=(15000, UNIT_CONTENT_ITEMS)), \
+            patch('learning_assistant.api.get_cache_course_data', return_value={
+                'skill_names': CONTEXT['skill_names'], 'title': CONTEXT['title']
+            }):
+        benchmark(
+            render_prompt_template,
+            MagicMock(), 1, 'course-v1:edx+benchmark+run', unit_id, 'edx+benchmark', template_string
+        )
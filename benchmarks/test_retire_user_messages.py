@@ -0,0 +1,93 @@
+"""
+Benchmarks for removing expired messages with the retire_user_messages management command.
+
+Before each round, the message table is filled with a hundred thousand messages, or the number set by the
+BENCHMARK_RETIRE_MESSAGE_COUNT environment variable, of which half are expired. The command, which deletes the expired
+messages in ranges of IDs, is compared with the loop it replaced, which fetched a batch of expired IDs and deleted
+them by ID until there were none left.
+"""
+import os
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+from opaque_keys.edx.keys import CourseKey
+
+from learning_assistant.models import LearningAssistantMessage
+
+User = get_user_model()
+
+MESSAGE_COUNT = int(os.environ.get('BENCHMARK_RETIRE_MESSAGE_COUNT', 100000))
+USER_COUNT = 1000
+COURSE_KEY = CourseKey.from_string('course-v1:edx+benchmark+retire')
+BATCH_SIZE = 1000
+INSERT_BATCH_SIZE = 20000
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(scope='module', name='users')
+def _users(django_db_setup, django_db_blocker):  # pylint: disable=unused-argument
+    """
+    Create the users the messages belong to.
+    """
+    with django_db_blocker.unblock():
+        users = User.objects.bulk_create([
+            User(username=f'benchmark-retire-{i}', email=f'benchmark-retire-{i}@example.com') for i in range(USER_COUNT)
+        ])
+        yield users
+        User.objects.filter(username__startswith='benchmark-retire-').delete()
+
+
+def _fill_message_table(users):
+    """
+    Replace the messages with a fresh table, in which every other message is older than the retention window.
+    """
+    LearningAssistantMessage.objects.all().delete()
+    now = timezone.now()
+
+    for batch_start in range(0, MESSAGE_COUNT, INSERT_BATCH_SIZE):
+        LearningAssistantMessage.objects.bulk_create([
+            LearningAssistantMessage(
+                course_id=COURSE_KEY,
+                user=users[i % USER_COUNT],
+                role=LearningAssistantMessage.USER_ROLE,
+                content=f'Message {i}: ' + 'Lorem ipsum dolor sit amet. ' * 10,
+                created=now - timedelta(days=60 if i % 2 else 1, seconds=i),
+            )
+            for i in range(batch_start, min(batch_start + INSERT_BATCH_SIZE, MESSAGE_COUNT))
+        ])
+
+
+def _reference_retire_user_messages():
+    """
+    The batch loop that the retire_user_messages command used to run, without its sleep between batches.
+    """
+    expiry_date = timezone.now() - timedelta(days=30)
+    deleted_count = None
+
+    while deleted_count != 0:
+        ids_to_delete = list(LearningAssistantMessage.objects.filter(
+            created__lte=expiry_date
+        ).values_list('id', flat=True)[:BATCH_SIZE])
+        deleted_count, _ = LearningAssistantMessage.objects.filter(id__in=ids_to_delete).delete()
+
+
+def _retire_user_messages():
+    """
+    Run the retire_user_messages command, without pauses between batches.
+    """
+    call_command('retire_user_messages', batch_size=BATCH_SIZE, throttle_factor=0)
+
+
+@pytest.mark.parametrize(
+    'retire', [_reference_retire_user_messages, _retire_user_messages], ids=['reference', 'id-ranges']
+)
+def test_retire_user_messages(benchmark, users, retire):
+    benchmark.group = 'retire-user-messages'
+
+    benchmark.pedantic(retire, setup=lambda: _fill_message_table(users), rounds=3)
+
+    assert LearningAssistantMessage.objects.count() == MESSAGE_COUNT // 2
@@ -1,37 +1,66 @@
 """
 Library for the learning_assistant app.
 """
+import base64
+import binascii
+import hashlib
 import logging
-from datetime import timedelta
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from datetime import datetime, timedelta
 
 from django.conf import settings
-from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Q
 from django.utils import timezone
 from edx_django_utils.cache import get_cache_key
-from jinja2 import BaseLoader, Environment
+from jinja2 import BaseLoader
+from jinja2.sandbox import SandboxedEnvironment
 from opaque_keys import InvalidKeyError
-
-from learning_assistant.constants import ACCEPTED_CATEGORY_TYPES, AUDIT_TRIAL_MAX_DAYS, CATEGORY_TYPE_MAP
+from opaque_keys.edx.keys import CourseKey, UsageKey
+
+from learning_assistant.constants import (
+    ACCEPTED_CATEGORY_TYPES,
+    AUDIT_TRIAL_MAX_DAYS,
+    CATEGORY_TYPE_MAP,
+    USER_VARYING_CATEGORY_TYPES,
+    USER_VARYING_SUBSECTION_FIELDS,
+)
 from learning_assistant.data import LearningAssistantAuditTrialData, LearningAssistantCourseEnabledData
+from learning_assistant.instrumentation import span
+from learning_assistant.message_buffer import get_chat_message_buffer
 from learning_assistant.models import (
     LearningAssistantAuditTrial,
     LearningAssistantCourseEnabled,
     LearningAssistantMessage,
+    LearningAssistantUnitContent,
 )
 from learning_assistant.platform_imports import (
     block_get_children,
     block_leaf_filter,
     get_cache_course_data,
     get_cache_course_run_data,
+    get_published_units,
+    get_required_content,
     get_single_block,
     get_text_transcript,
     traverse_block_pre_order,
 )
 from learning_assistant.text_utils import html_to_text
+from learning_assistant.token_counters import get_token_counter
 
 log = logging.getLogger(__name__)
-User = get_user_model()
+
+# Prompt templates are compiled once per process, and shared between requests. The environment is sandboxed, because
+# the prompt template comes from settings, which may be managed outside of the code base.
+_prompt_template_environment = SandboxedEnvironment(loader=BaseLoader())
+_compiled_prompt_templates = {}
+_compiled_prompt_templates_lock = threading.Lock()
+COMPILED_PROMPT_TEMPLATES_MAX_SIZE = 32
 
 
 def _extract_block_contents(child, category):
@@ -42,11 +71,13 @@ def _extract_block_contents(child, category):
     """
     if category == 'html':
         content_html = child.get_html()
-        text = html_to_text(content_html)
+        with span('html_to_text'):
+            text = html_to_text(content_html)
         return text
 
     if category == 'video':
-        transcript = get_text_transcript(child)  # may be None
+        with span('transcript_fetch'):
+            transcript = get_text_transcript(child)  # may be None
         return transcript
 
     return None
@@ -62,18 +93,109 @@ def _leaf_filter(block):
     return is_leaf and category in ACCEPTED_CATEGORY_TYPES
 
 
+_content_extraction_executor = None
+_content_extraction_executor_pid = None
+_content_extraction_executor_lock = threading.Lock()
+
+
+def _extract_transcript(block):
+    """
+    Return the transcript of a video block, closing any database connection that has outlived its maximum age.
+
+    This runs in the threads of the content extraction executor, which are reused between requests.
+    """
+    close_old_connections()
+    try:
+        with span('transcript_fetch'):
+            return get_text_transcript(block)
+    finally:
+        close_old_connections()
+
+
+def get_content_extraction_executor():
+    """
+    Return the process-wide thread pool that video transcripts are fetched in, creating it on first use.
+
+    The number of threads is set by the LEARNING_ASSISTANT_CONTENT_EXTRACTION_MAX_WORKERS setting.
+    """
+    global _content_extraction_executor, _content_extraction_executor_pid  # pylint: disable=global-statement
+
+    pid = os.getpid()
+    if _content_extraction_executor is None or _content_extraction_executor_pid != pid:
+        with _content_extraction_executor_lock:
+            if _content_extraction_executor is None or _content_extraction_executor_pid != pid:
+                _content_extraction_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'LEARNING_ASSISTANT_CONTENT_EXTRACTION_MAX_WORKERS', 4),
+                    thread_name_prefix='learning_assistant_content_extraction',
+                )
+                _content_extraction_executor_pid = pid
+
+    return _content_extraction_executor
+
+
+def reset_content_extraction_executor():
+    """
+    Shut down and discard the process-wide content extraction thread pool, so it is recreated with current settings.
+    """
+    global _content_extraction_executor, _content_extraction_executor_pid  # pylint: disable=global-statement
+
+    with _content_extraction_executor_lock:
+        if _content_extraction_executor is not None:
+            _content_extraction_executor.shutdown(wait=False)
+        _content_extraction_executor = None
+        _content_extraction_executor_pid = None
+
+
 def _get_children_contents(block):
     """
     Given a specific block, return the content type and text of a pre-order traversal of the blocks children.
+
+    Fetching a video transcript may read from storage, so the transcripts of a unit with several videos are fetched
+    concurrently, unless the LEARNING_ASSISTANT_CONTENT_EXTRACTION_MAX_WORKERS setting is 1. The transcripts of the
+    unit are given LEARNING_ASSISTANT_CONTENT_EXTRACTION_TIMEOUT seconds in total; those that are not fetched by then
+    are left out, and the content is then returned as partial. The fetches that have not started yet are cancelled, so
+    that they do not hold threads of the pool that later requests need.
+
+    Returns
+        length - the cummulative length of the children's content
+        items - a list of dictionaries containing the content type and text for each child
+        partial - whether the content of any child was left out because it could not be fetched in time
     """
-    leaf_nodes = traverse_block_pre_order(block, block_get_children, _leaf_filter)
+    leaf_nodes = list(traverse_block_pre_order(block, block_get_children, _leaf_filter))
+
+    video_count = sum(1 for node in leaf_nodes if node.category == 'video')
+    max_workers = getattr(settings, 'LEARNING_ASSISTANT_CONTENT_EXTRACTION_MAX_WORKERS', 4)
+    timeout = getattr(settings, 'LEARNING_ASSISTANT_CONTENT_EXTRACTION_TIMEOUT', 10)
+
+    # Transcripts are submitted to the thread pool first, and the other leaves are extracted while they are fetched.
+    contents = {}
+    if video_count > 1 and max_workers > 1:
+        executor = get_content_extraction_executor()
+        for index, node in enumerate(leaf_nodes):
+            if node.category == 'video':
+                contents[index] = executor.submit(_extract_transcript, node)
+    deadline = time.monotonic() + timeout
 
     length = 0
     items = []
+    partial = False
 
-    for node in leaf_nodes:
+    for index, node in enumerate(leaf_nodes):
         category = node.category
-        content = _extract_block_contents(node, category)
+
+        if index in contents:
+            try:
+                content = contents[index].result(timeout=max(deadline - time.monotonic(), 0))
+            except FuturesTimeoutError:
+                contents[index].cancel()
+                log.warning(
+                    'Timed out fetching the transcript of block_id=%(block_id)s',
+                    {'block_id': node.scope_ids.usage_id}
+                )
+                partial = True
+                continue
+        else:
+            content = _extract_block_contents(node, category)
 
         if content:
             length += len(content)
@@ -82,34 +204,289 @@ def _get_children_contents(block):
                 'content_text': content,
             })
 
-    return length, items
+    return length, items, partial
+
+
+def _block_ancestors(block):
+    """
+    Return the ancestors of the block, from its parent up to the course.
+    """
+    get_parent = getattr(block, 'get_parent', None)
+    parent = get_parent() if get_parent else None
+    while parent is not None:
+        yield parent
+        get_parent = getattr(parent, 'get_parent', None)
+        parent = get_parent() if get_parent else None
+
+
+def _node_varies_by_user(node, now):
+    """
+    Return whether the node is restricted to content groups or cohorts, only visible to staff, or not released by now.
+
+    The group restrictions of a block are checked with merged_group_access, which includes those of its ancestors,
+    because group_access is not inherited.
+    """
+    if getattr(node, 'merged_group_access', None) or getattr(node, 'group_access', None):
+        return True
+
+    if getattr(node, 'visible_to_staff_only', False):
+        return True
+
+    start = getattr(node, 'start', None)
+    return isinstance(start, datetime) and start > now
+
+
+def _block_varies_by_user(block):
+    """
+    Return whether the content of the block or any of its descendants may differ between users.
+
+    This is the case if any of the blocks or their ancestors is restricted to content groups or cohorts, is only
+    visible to staff or is not released by now, if the block is in a special exam, a subsection gated by a prerequisite
+    or a subsection hidden once it is due, or if any of the blocks chooses which children to show to each user or has
+    children that were hidden from this user.
+    """
+    now = timezone.now()
+
+    for ancestor in _block_ancestors(block):
+        if _node_varies_by_user(ancestor, now):
+            return True
+
+        if getattr(ancestor, 'category', None) == 'sequential':
+            if any(getattr(ancestor, field, False) for field in USER_VARYING_SUBSECTION_FIELDS):
+                return True
+
+            usage_key = ancestor.scope_ids.usage_id
+            if get_required_content(usage_key.course_key, usage_key):
+                return True
+
+    for node in traverse_block_pre_order(block, block_get_children):
+        if node.category in USER_VARYING_CATEGORY_TYPES:
+            return True
+
+        if _node_varies_by_user(node, now):
+            return True
+
+        if len(getattr(node, 'children', None) or []) != len(block_get_children(node)):
+            return True
+
+    return False
+
+
+def _shared_block_content_cache_key(course_id, unit_usage_key):
+    """
+    Return the key under which the content of a unit is cached for all users.
+    """
+    return get_cache_key(
+        resource='learning_assistant',
+        course_id=str(course_id),
+        unit_usage_key=str(unit_usage_key)
+    )
+
+
+def _unit_content_version(unit):
+    """
+    Return a string that changes whenever the content of the unit or any of its descendants is edited.
+    """
+    version = getattr(unit, 'subtree_edited_on', None) or getattr(unit, 'published_on', None)
+    return str(version) if version else ''
+
+
+def get_extracted_unit_content(course_id, unit_usage_key):
+    """
+    Return the content of a unit extracted when its course was published, or None if it was not extracted.
+
+    Only units of the given course run are returned, so that the content of a unit cannot be read through another
+    course run. Content extracted, or last found unchanged, more than LEARNING_ASSISTANT_EXTRACTED_UNIT_CONTENT_MAX_AGE
+    seconds ago is not returned, so that changes that were not published, such as a new transcript, are picked up.
+
+    Returns
+        a dictionary with the content_length and content_items of the unit
+    """
+    if isinstance(course_id, str):
+        course_id = CourseKey.from_string(course_id)
+    if isinstance(unit_usage_key, str):
+        unit_usage_key = UsageKey.from_string(unit_usage_key)
+
+    max_age = getattr(settings, 'LEARNING_ASSISTANT_EXTRACTED_UNIT_CONTENT_MAX_AGE', 24 * 60 * 60)
+
+    return LearningAssistantUnitContent.objects.filter(
+        course_id=course_id,
+        unit_usage_key=unit_usage_key,
+        modified__gte=timezone.now() - timedelta(seconds=max_age),
+    ).values('content_length', 'content_items').first()
+
+
+def extract_course_unit_contents(course_key):
+    """
+    Extract and store the content of every published unit of a course, so chat requests do not need to extract it.
+
+    Units that have not changed since their content was last extracted are skipped. Units whose content varies by user,
+    including units that are not released yet, are not stored, because their content is extracted for each user when
+    they chat, with the access checks of the platform. Units whose content could only be partially extracted, because
+    a transcript timed out, are not stored either, so that they are extracted again the next time.
+
+    Returns
+        extracted - the number of units whose content was extracted
+        skipped - the number of units that were unchanged, whose content varies by user or was partially extracted
+    """
+    stored_versions = dict(
+        LearningAssistantUnitContent.objects.filter(course_id=course_key).values_list(
+            'unit_usage_key', 'content_version'
+        )
+    )
+    published_unit_keys = set()
+    unchanged_unit_keys = []
+    extracted = skipped = 0
+
+    for unit in get_published_units(course_key):
+        # Units loaded from the modulestore have keys that include the branch and version they were loaded from.
+        unit_usage_key = unit.scope_ids.usage_id.for_branch(None).version_agnostic()
+        published_unit_keys.add(unit_usage_key)
+        version = _unit_content_version(unit)
+
+        if version and stored_versions.get(unit_usage_key) == version:
+            unchanged_unit_keys.append(unit_usage_key)
+            skipped += 1
+            continue
+
+        if _block_varies_by_user(unit):
+            LearningAssistantUnitContent.objects.filter(unit_usage_key=unit_usage_key).delete()
+            skipped += 1
+        else:
+            length, items, partial = _get_children_contents(unit)
+            if partial:
+                log.warning(
+                    'Not storing the partially extracted content of unit_usage_key=%(unit_usage_key)s',
+                    {'unit_usage_key': unit_usage_key}
+                )
+                LearningAssistantUnitContent.objects.filter(unit_usage_key=unit_usage_key).delete()
+                skipped += 1
+            else:
+                LearningAssistantUnitContent.objects.update_or_create(
+                    unit_usage_key=unit_usage_key,
+                    defaults={
+                        'course_id': course_key,
+                        'content_version': version,
+                        'content_length': length,
+                        'content_items': items,
+                    },
+                )
+                extracted += 1
+
+        cache.delete(_shared_block_content_cache_key(course_key, unit_usage_key))
+
+    # The stored content of unchanged units is still up to date, so it is marked as such, to keep it from expiring.
+    LearningAssistantUnitContent.objects.filter(unit_usage_key__in=unchanged_unit_keys).update(modified=timezone.now())
+
+    removed_unit_keys = set(stored_versions) - published_unit_keys
+    if removed_unit_keys:
+        LearningAssistantUnitContent.objects.filter(unit_usage_key__in=removed_unit_keys).delete()
+
+    return extracted, skipped
 
 
 def get_block_content(request, user_id, course_id, unit_usage_key):
     """
     Public wrapper for retrieving the content of a given block's children.
 
+    The content of a unit is cached per course run and unit, and shared between users, unless it varies by user, in
+    which case it is cached per user. On a cache miss, if the LEARNING_ASSISTANT_EXTRACT_UNIT_CONTENT_ON_PUBLISH setting
+    is True, the content extracted when the course was published is used if there is any, so that the unit does not
+    need to be loaded. If the LEARNING_ASSISTANT_SHARED_BLOCK_CONTENT_CACHE
+    setting is False, neither the shared cache nor the extracted content is read, and the content is cached per user.
+    Content that was only partially extracted, because a transcript timed out, is cached for this user only, for
+    LEARNING_ASSISTANT_PARTIAL_CONTENT_CACHE_TIMEOUT seconds.
+
     Returns
         length - the cummulative length of a block's children's content
         items - a list of dictionaries containing the content type and text for each child
     """
-    cache_key = get_cache_key(
+    shared_cache_key = _shared_block_content_cache_key(course_id, unit_usage_key)
+    user_cache_key = get_cache_key(
         resource='learning_assistant',
         user_id=user_id,
         course_id=course_id,
         unit_usage_key=unit_usage_key
     )
-    cache_data = cache.get(cache_key)
-
-    if not isinstance(cache_data, dict):
-        block = get_single_block(request, user_id, course_id, unit_usage_key)
-        length, items = _get_children_contents(block)
-        cache_data = {'content_length': length, 'content_items': items}
-        cache.set(cache_key, cache_data, getattr(settings, 'LEARNING_ASSISTANT_CACHE_TIMEOUT', 360))
+    shared = getattr(settings, 'LEARNING_ASSISTANT_SHARED_BLOCK_CONTENT_CACHE', True)
+    extract_on_publish = getattr(settings, 'LEARNING_ASSISTANT_EXTRACT_UNIT_CONTENT_ON_PUBLISH', False)
+    with span('get_block_content', cache='hit') as block_content_span:
+        if shared:
+            cached = cache.get_many([shared_cache_key, user_cache_key])
+            cache_data = cached.get(shared_cache_key, cached.get(user_cache_key))
+        else:
+            cache_data = cache.get(user_cache_key)
+
+        cache_timeout = getattr(settings, 'LEARNING_ASSISTANT_CACHE_TIMEOUT', 360)
+
+        if shared and extract_on_publish and not isinstance(cache_data, dict):
+            block_content_span.set_tag('cache', 'extracted')
+            cache_data = get_extracted_unit_content(course_id, unit_usage_key)
+            if cache_data is not None:
+                cache.set(shared_cache_key, cache_data, cache_timeout)
+
+        if not isinstance(cache_data, dict):
+            block_content_span.set_tag('cache', 'miss')
+            block = get_single_block(request, user_id, course_id, unit_usage_key)
+            length, items, partial = _get_children_contents(block)
+            cache_data = {'content_length': length, 'content_items': items}
+
+            if partial:
+                cache.set(
+                    user_cache_key,
+                    cache_data,
+                    getattr(settings, 'LEARNING_ASSISTANT_PARTIAL_CONTENT_CACHE_TIMEOUT', 30),
+                )
+            else:
+                cache_key = shared_cache_key if shared and not _block_varies_by_user(block) else user_cache_key
+                cache.set(cache_key, cache_data, cache_timeout)
 
     return cache_data['content_length'], cache_data['content_items']
 
 
+def get_compiled_prompt_template(template_string):
+    """
+    Return the compiled Jinja template for the template string.
+
+    Compiled templates are cached in the process, keyed by a hash of the template string, so that the prompt template
+    is only parsed and compiled the first time it is rendered.
+    """
+    key = hashlib.sha256(template_string.encode('utf-8')).hexdigest()
+
+    template = _compiled_prompt_templates.get(key)
+    if template is None:
+        template = _prompt_template_environment.from_string(template_string)
+
+        with _compiled_prompt_templates_lock:
+            # There are only ever a handful of prompt templates, so the cache is simply emptied if it ever fills up.
+            if len(_compiled_prompt_templates) >= COMPILED_PROMPT_TEMPLATES_MAX_SIZE:
+                _compiled_prompt_templates.clear()
+            _compiled_prompt_templates[key] = template
+
+    return template
+
+
+def _truncate_unit_content(content_items, max_tokens):
+    """
+    Return the unit content items, keeping the text of the items in order until it adds up to max_tokens tokens.
+
+    The text of the last item kept is truncated to the tokens that remain, and the items after it are left out.
+    """
+    token_counter = get_token_counter()
+    remaining_tokens = max_tokens
+    truncated_items = []
+
+    for item in content_items:
+        if remaining_tokens <= 0:
+            break
+
+        text = token_counter.truncate(item['content_text'], remaining_tokens)
+        truncated_items.append({**item, 'content_text': text})
+        remaining_tokens -= token_counter.count(text)
+
+    return truncated_items
+
+
 def render_prompt_template(request, user_id, course_run_id, unit_usage_key, course_id, template_string):
     """
     Return a rendered prompt template.
@@ -135,11 +512,17 @@ def render_prompt_template(request, user_id, course_run_id, unit_usage_key, cour
     UNIT_CONTENT_MAX_CHAR_LENGTH = getattr(settings, 'CHAT_COMPLETION_UNIT_CONTENT_MAX_CHAR_LENGTH', 11750)
     unit_content = unit_content[0:UNIT_CONTENT_MAX_CHAR_LENGTH]
 
+    # When set, the text of the unit content is also truncated to a number of tokens, as counted by the token counter.
+    # Unlike the character limit, this holds regardless of how many characters each token of the unit content takes.
+    UNIT_CONTENT_MAX_TOKENS = getattr(settings, 'CHAT_COMPLETION_UNIT_CONTENT_MAX_TOKENS', None)
+    if UNIT_CONTENT_MAX_TOKENS is not None:
+        unit_content = _truncate_unit_content(unit_content, UNIT_CONTENT_MAX_TOKENS)
+
     course_data = get_cache_course_data(course_id, ['skill_names', 'title'])
     skill_names = course_data['skill_names']
     title = course_data['title']
 
-    template = Environment(loader=BaseLoader).from_string(template_string)
+    template = get_compiled_prompt_template(template_string)
     data = template.render(unit_content=unit_content, skill_names=skill_names, title=title)
 
     return data
@@ -152,6 +535,25 @@ def learning_assistant_available():
     return getattr(settings, 'LEARNING_ASSISTANT_AVAILABLE', False)
 
 
+def _course_enabled_cache_key(course_key):
+    """
+    Return the key under which whether the Learning Assistant is enabled in a course is cached.
+    """
+    return get_cache_key(resource='learning_assistant_course_enabled', course_id=str(course_key))
+
+
+def invalidate_learning_assistant_enabled_cache(course_key):
+    """
+    Remove the cached value of whether the Learning Assistant is enabled in the course represented by the course_key.
+
+    The cached value is removed immediately and again when the current transaction is committed, so that a value read
+    from the database before the commit is not kept in the cache.
+    """
+    cache_key = _course_enabled_cache_key(course_key)
+    cache.delete(cache_key)
+    transaction.on_commit(lambda: cache.delete(cache_key))
+
+
 def learning_assistant_enabled(course_key):
     """
     Return whether the Learning Assistant is enabled in the course represented by the course_key.
@@ -160,20 +562,55 @@ def learning_assistant_enabled(course_key):
     either there is no override in the LearningAssistantCourseEnabled table or there is an enabled value in the
     LearningAssistantCourseEnabled table.
 
+    The override is cached, including its absence, since most courses have none, and the cached value is removed
+    whenever the override changes.
+
     Arguments:
         * course_key: (CourseKey): the course's key
 
     Returns:
         * bool: whether the Learning Assistant is enabled
     """
-    try:
-        obj = LearningAssistantCourseEnabled.objects.get(course_id=course_key)
-        enabled = obj.enabled
-    except LearningAssistantCourseEnabled.DoesNotExist:
+    return learning_assistant_enabled_many([course_key])[course_key]
+
+
+def learning_assistant_enabled_many(course_keys):
+    """
+    Return whether the Learning Assistant is enabled in each of the courses represented by the course_keys.
+
+    This is the bulk version of learning_assistant_enabled, for pages that list many courses. The overrides are read
+    from the cache, and the ones that are not cached are read from the LearningAssistantCourseEnabled table with a
+    single query, and then cached.
+
+    Arguments:
+        * course_keys: (iterable of CourseKey): the courses' keys
+
+    Returns:
+        * dict: whether the Learning Assistant is enabled, by course key
+    """
+    course_keys = list(course_keys)
+    if not learning_assistant_available():
+        return {course_key: False for course_key in course_keys}
+
+    cache_keys = {_course_enabled_cache_key(course_key): course_key for course_key in course_keys}
+    enabled = {cache_keys[cache_key]: value for cache_key, value in cache.get_many(cache_keys).items()}
+
+    missing_course_keys = [course_key for course_key in course_keys if course_key not in enabled]
+    if missing_course_keys:
+        overrides = dict(
+            LearningAssistantCourseEnabled.objects.filter(
+                course_id__in=missing_course_keys
+            ).values_list('course_id', 'enabled')
+        )
         # Currently, the Learning Assistant defaults to enabled if there is no override.
-        enabled = True
+        missing_enabled = {course_key: overrides.get(course_key, True) for course_key in missing_course_keys}
+        cache.set_many(
+            {_course_enabled_cache_key(course_key): value for course_key, value in missing_enabled.items()},
+            getattr(settings, 'LEARNING_ASSISTANT_COURSE_ENABLED_CACHE_TIMEOUT', 3600),
+        )
+        enabled.update(missing_enabled)
 
-    return learning_assistant_available() and enabled
+    return {course_key: enabled[course_key] for course_key in course_keys}
 
 
 def set_learning_assistant_enabled(course_key, enabled):
@@ -191,6 +628,7 @@ def set_learning_assistant_enabled(course_key, enabled):
         course_id=course_key,
         defaults={'enabled': enabled}
     )
+    invalidate_learning_assistant_enabled_cache(course_key)
 
     return LearningAssistantCourseEnabledData(
         course_key=obj.course_id,
@@ -198,6 +636,45 @@ def set_learning_assistant_enabled(course_key, enabled):
     )
 
 
+def _eligibility_cache_key(user_id, course_key):
+    """
+    Return the key under which the eligibility of a user in a course run is cached.
+    """
+    return get_cache_key(resource='learning_assistant_eligibility', user_id=user_id, course_id=str(course_key))
+
+
+def get_cached_eligibility(user_id, course_key, get_eligibility):
+    """
+    Return the eligibility of a user in a course run, calling get_eligibility only if it is not cached.
+
+    The role and enrollment of a user rarely change during a chat session, so they are cached for a short time, set by
+    the LEARNING_ASSISTANT_ELIGIBILITY_CACHE_TIMEOUT setting, instead of being looked up on every chat turn.
+
+    Arguments:
+        * user_id (int): the user's ID
+        * course_key (CourseKey): the course run's key
+        * get_eligibility (function): a function returning the LearningAssistantEligibilityData of the user
+
+    Returns:
+        * LearningAssistantEligibilityData: the eligibility of the user in the course run
+    """
+    cache_key = _eligibility_cache_key(user_id, course_key)
+    eligibility = cache.get(cache_key)
+
+    if eligibility is None:
+        eligibility = get_eligibility()
+        cache.set(cache_key, eligibility, getattr(settings, 'LEARNING_ASSISTANT_ELIGIBILITY_CACHE_TIMEOUT', 60))
+
+    return eligibility
+
+
+def invalidate_eligibility_cache(user_id, course_key):
+    """
+    Remove the cached eligibility of a user in a course run, for example when their enrollment changes.
+    """
+    cache.delete(_eligibility_cache_key(user_id, course_key))
+
+
 def get_course_id(course_run_id):
     """
     Given a course run id (str), return the associated course key.
@@ -207,24 +684,61 @@ def get_course_id(course_run_id):
     return course_key
 
 
-def save_chat_message(courserun_key, user_id, chat_role, message):
+def save_chat_turn(courserun_key, user, user_message, assistant_message=None):
+    """
+    Given a courserun key (CourseKey), user (User), user message (str) and assistant message (str), save both messages.
+
+    Both messages are written with a single query, in a single transaction. If the assistant message is None, only the
+    user message is saved. The assistant message is created a microsecond after the user message, so that the chat
+    history is always read back in the order in which the chat turn happened.
+
+    When the LEARNING_ASSISTANT_CHAT_HISTORY_WRITE_BEHIND setting is True, the messages are added to the write-behind
+    buffer instead, and written shortly after by a background thread.
     """
-    Save the chat message to the database.
+    created = timezone.now()
+    messages = [
+        LearningAssistantMessage(
+            course_id=courserun_key,
+            user=user,
+            role=LearningAssistantMessage.USER_ROLE,
+            content=user_message,
+            created=created,
+        ),
+    ]
+
+    if assistant_message is not None:
+        messages.append(LearningAssistantMessage(
+            course_id=courserun_key,
+            user=user,
+            role=LearningAssistantMessage.ASSISTANT_ROLE,
+            content=assistant_message,
+            created=created + timedelta(microseconds=1),
+        ))
+
+    if getattr(settings, 'LEARNING_ASSISTANT_CHAT_HISTORY_WRITE_BEHIND', False):
+        get_chat_message_buffer().add(messages)
+        return
+
+    with transaction.atomic():
+        LearningAssistantMessage.objects.bulk_create(messages)
+
+
+def _unexpired_messages(courserun_key, user):
     """
-    user = None
-    try:
-        user = User.objects.get(id=user_id)
-    except User.DoesNotExist as exc:
-        raise Exception("User does not exists.") from exc
+    Return the messages of a user in a course, leaving out the expired ones if they are hidden.
 
-    # Save the user message to the database.
-    LearningAssistantMessage.objects.create(
-        course_id=courserun_key,
-        user=user,
-        role=chat_role,
-        content=message,
+    Expired messages are removed by the retire_user_messages management command, but only when it runs. When the
+    LEARNING_ASSISTANT_HIDE_EXPIRED_MESSAGES setting is True, they are left out of the history, so that history queries
+    only read the retention window of LEARNING_ASSISTANT_MESSAGES_EXPIRY days, however many expired messages are still
+    to be removed.
+    """
+    messages = LearningAssistantMessage.objects.filter(course_id=courserun_key, user=user)
 
-    )
+    if getattr(settings, 'LEARNING_ASSISTANT_HIDE_EXPIRED_MESSAGES', False):
+        expiry_date = timezone.now() - timedelta(days=getattr(settings, 'LEARNING_ASSISTANT_MESSAGES_EXPIRY', 30))
+        messages = messages.filter(created__gt=expiry_date)
+
+    return messages
 
 
 def get_message_history(courserun_key, user, message_count):
@@ -237,11 +751,77 @@ def get_message_history(courserun_key, user, message_count):
     # Slicing the list in the model is an equivalent of adding LIMIT on the query.
     # The result is the last chat messages for that user and course but in inversed order, so in order to flip them
     # its first turn into a list and then reversed.
-    message_history = list(LearningAssistantMessage.objects.filter(
-        course_id=courserun_key, user=user).order_by('-created')[:message_count])[::-1]
+    #
+    # Only the fields used to display the chat history are fetched, and the composite (user, course_id, created) index
+    # lets the database read the last messages without sorting all the messages of the user in the course.
+    message_history = list(_unexpired_messages(courserun_key, user).only(
+        'role', 'content', 'created').order_by('-created')[:message_count])
+    message_history.reverse()
+
+    # The course and user of the messages are known from the filter, so they are set rather than fetched.
+    for message in message_history:
+        message.course_id = courserun_key
+        message.user = user
+
     return message_history
 
 
+def encode_message_history_cursor(message):
+    """
+    Given a message (LearningAssistantMessage), return an opaque cursor pointing to the messages sent before it.
+    """
+    position = f'{message.created.isoformat()}|{message.id}'
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_message_history_cursor(cursor):
+    """
+    Given a cursor (str) returned by encode_message_history_cursor, return the (created, id) position it points to.
+
+    A ValueError is raised if the cursor is malformed.
+    """
+    try:
+        created, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        created = datetime.fromisoformat(created)
+        message_id = int(message_id)
+    except (TypeError, ValueError, UnicodeError, binascii.Error) as exc:
+        raise ValueError(f'Invalid message history cursor: {cursor}') from exc
+
+    if timezone.is_naive(created):
+        raise ValueError(f'Invalid message history cursor: {cursor}')
+
+    return created, message_id
+
+
+def get_message_history_page(courserun_key, user, page_size, cursor=None):
+    """
+    Given a courserun key (CourseKey), user (User), page size (int) and cursor (str), return a page of message history.
+
+    Messages are paginated from the most recent one backwards, using their (created, id) position as a keyset, so every
+    page costs the same index range scan regardless of how long the history is. The first page is returned when the
+    cursor is None, and the cursor of the next page is returned along with the messages, or None if there are no older
+    messages. The messages of a page are in creation order.
+
+    A ValueError is raised if the cursor is malformed.
+    """
+    messages = _unexpired_messages(courserun_key, user)
+    if cursor is not None:
+        created, message_id = decode_message_history_cursor(cursor)
+        messages = messages.filter(Q(created__lt=created) | Q(created=created, id__lt=message_id))
+
+    # One more message than the page size is fetched to know whether there is a next page.
+    page = list(messages.only('role', 'content', 'created').order_by('-created', '-id')[:page_size + 1])
+    next_cursor = encode_message_history_cursor(page[page_size - 1]) if len(page) > page_size else None
+    page = page[:page_size]
+    page.reverse()
+
+    for message in page:
+        message.course_id = courserun_key
+        message.user = user
+
+    return page, next_cursor
+
+
 def get_audit_trial_expiration_date_from_start_date(start_date):
     """
     Given a start date of an audit trial, return the expiration date of the audit trial.
@@ -262,10 +842,32 @@ def get_audit_trial_expiration_date_from_start_date(start_date):
     return expiration_datetime
 
 
+def _audit_trial_cache_key(user_id):
+    """
+    Return the key under which the audit trial of a user is cached.
+    """
+    return get_cache_key(resource='learning_assistant_audit_trial', user_id=user_id)
+
+
+def invalidate_audit_trial_cache(user_id):
+    """
+    Remove the cached audit trial of a user.
+
+    The cached value is removed immediately and again when the current transaction is committed, so that a value read
+    from the database before the commit is not kept in the cache.
+    """
+    cache_key = _audit_trial_cache_key(user_id)
+    cache.delete(cache_key)
+    transaction.on_commit(lambda: cache.delete(cache_key))
+
+
 def get_audit_trial(user):
     """
     Given a user, return the associated audit trial data.
 
+    Audit trials do not change once they are created, so the audit trial data is cached, and so is the absence of an
+    audit trial. The cached value is removed whenever the audit trial of the user is saved or deleted.
+
     Arguments:
     * user (User): the user
 
@@ -276,22 +878,34 @@ def get_audit_trial(user):
         * expiration_date (datetime): the expiration date of the audit trial
     * None: if no audit trial exists for the user
     """
-    try:
-        audit_trial = LearningAssistantAuditTrial.objects.get(user=user)
-    except LearningAssistantAuditTrial.DoesNotExist:
-        return None
+    cache_key = _audit_trial_cache_key(user.id)
+    audit_trial_data = cache.get(cache_key)
 
-    return LearningAssistantAuditTrialData(
-        user_id=user.id,
-        start_date=audit_trial.start_date,
-        expiration_date=audit_trial.expiration_date,
-    )
+    if audit_trial_data is None:
+        try:
+            audit_trial = LearningAssistantAuditTrial.objects.get(user=user)
+        except LearningAssistantAuditTrial.DoesNotExist:
+            # The absence of an audit trial is cached as False, since None cannot be told apart from a cache miss.
+            audit_trial_data = False
+        else:
+            audit_trial_data = LearningAssistantAuditTrialData(
+                user_id=user.id,
+                start_date=audit_trial.start_date,
+                expiration_date=audit_trial.expiration_date,
+            )
+
+        cache.set(cache_key, audit_trial_data, getattr(settings, 'LEARNING_ASSISTANT_AUDIT_TRIAL_CACHE_TIMEOUT', 3600))
+
+    return audit_trial_data or None
 
 
 def get_or_create_audit_trial(user):
     """
     Given a user, return the associated audit trial data, creating a new audit trial for the user if one does not exist.
 
+    The audit trial is read through the cache of get_audit_trial first, so that the audit trial is only looked up in
+    the database, and created, when it is not known to exist.
+
     Arguments:
     * user (User): the user
 
@@ -301,6 +915,10 @@ def get_or_create_audit_trial(user):
         * start_date (datetime): the start date of the audit trial
         * expiration_date (datetime): the expiration date of the audit trial
     """
+    audit_trial_data = get_audit_trial(user)
+    if audit_trial_data is not None:
+        return audit_trial_data
+
     start_date = timezone.now()
     expiration_date = get_audit_trial_expiration_date_from_start_date(start_date)
 
@@ -324,7 +942,7 @@ def audit_trial_is_expired(enrollment, audit_trial_data):
     Given an enrollment and audit_trial_data, return whether the audit trial is expired as a boolean.
 
     Arguments:
-    * enrollment (CourseEnrollment): the user course enrollment
+    * enrollment (CourseEnrollment or LearningAssistantEligibilityData): the user course enrollment, or its eligibility
     * audit_trial_data (LearningAssistantAuditTrialData): the data related to the audit trial
 
     Returns:
@@ -21,3 +21,11 @@ class LearningAssistantConfig(AppConfig):
             },
         }
     }
+
+    def ready(self):
+        """
+        Connect the signal handlers.
+        """
+        # pylint: disable=import-outside-toplevel
+        from learning_assistant.signals import connect_signal_handlers
+        connect_signal_handlers()
@@ -15,6 +15,23 @@ CATEGORY_TYPE_MAP = {
     "video": "VIDEO",
 }
 
+# Blocks of these categories choose which of their children to show to each user, such as content experiments and
+# randomized library content.
+USER_VARYING_CATEGORY_TYPES = ['conditional', 'itembank', 'library_content', 'randomize', 'split_test']
+
+# Subsections with any of these fields set are shown to each user depending on their progress or exam attempts: timed
+# and proctored exams, and subsections hidden once they are due.
+USER_VARYING_SUBSECTION_FIELDS = [
+    'is_time_limited',
+    'is_proctored_enabled',
+    'is_practice_exam',
+    'is_onboarding_exam',
+    'hide_after_due',
+]
+
 AUDIT_TRIAL_MAX_DAYS = 14
 
+MESSAGE_HISTORY_PAGE_SIZE = 20
+MESSAGE_HISTORY_MAX_PAGE_SIZE = 100
+
 LMS_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
@@ -26,3 +26,14 @@ class LearningAssistantAuditTrialData:
     user_id: int = field(validator=validators.instance_of(int))
     start_date: datetime = field(validator=validators.optional(validators.instance_of(datetime)))
     expiration_date: datetime = field(validator=validators.optional(validators.instance_of(datetime)))
+
+
+@frozen
+class LearningAssistantEligibilityData:
+    """
+    Data class representing the role and enrollment of a user in a course run, which decide their access.
+    """
+
+    is_staff: bool = field(validator=validators.instance_of(bool))
+    enrollment_mode: str = field(validator=validators.optional(validators.instance_of(str)))
+    upgrade_deadline: datetime = field(validator=validators.optional(validators.instance_of(datetime)))
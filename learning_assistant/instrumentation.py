@@ -0,0 +1,236 @@
+"""
+Timing instrumentation of the stages of a chat turn.
+
+Each stage of a chat turn, such as the access checks, the extraction of the unit content or the request to the chat
+completion endpoint, is wrapped in a span, which measures how long the stage took and reports it to the
+instrumentation sinks.
+
+The sinks are selected with the LEARNING_ASSISTANT_INSTRUMENTATION_SINKS setting, which is a list of dotted paths to
+InstrumentationSink subclasses. The instrumentation is disabled when the setting is empty, which is the default; spans
+then do nothing but look up the setting.
+"""
+import logging
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from edx_django_utils.monitoring import accumulate, set_custom_attribute
+
+log = logging.getLogger(__name__)
+
+
+class InstrumentationSink:
+    """
+    Base class for instrumentation sinks.
+
+    Subclasses implement record, which is called once for each completed span. A single instance of each sink is shared
+    within the process, so record may be called from several threads at once.
+    """
+
+    def record(self, stage, duration, tags):
+        """
+        Record that the stage took duration seconds.
+
+        Args:
+            stage (str): The name of the stage.
+            duration (float): The time taken by the stage, in seconds.
+            tags (dict): Attributes of this run of the stage, such as whether a cache was hit.
+        """
+        raise NotImplementedError
+
+
+class LogSink(InstrumentationSink):
+    """
+    Instrumentation sink that logs the duration of each stage.
+    """
+
+    def record(self, stage, duration, tags):
+        """
+        Log the duration of the stage.
+        """
+        log.info(
+            'learning_assistant stage=%(stage)s duration_ms=%(duration_ms).2f tags=%(tags)s',
+            {'stage': stage, 'duration_ms': duration * 1000, 'tags': tags}
+        )
+
+
+class MonitoringSink(InstrumentationSink):
+    """
+    Instrumentation sink that reports the duration of each stage as custom attributes of the monitored transaction.
+
+    The attributes are sent to the monitoring backends configured for edx-django-utils, such as New Relic or Datadog.
+    The durations of a stage that runs several times in a request, such as the extraction of each block of a unit, are
+    added up.
+    """
+
+    def record(self, stage, duration, tags):
+        """
+        Add the duration of the stage to the custom attributes of the current transaction.
+        """
+        accumulate(f'learning_assistant.{stage}.duration_ms', duration * 1000)
+        for name, value in tags.items():
+            set_custom_attribute(f'learning_assistant.{stage}.{name}', value)
+
+
+class MemorySink(InstrumentationSink):
+    """
+    Instrumentation sink that keeps the recorded spans in memory, for tests.
+    """
+
+    def __init__(self):
+        """
+        Create the empty list of records.
+        """
+        self.records = []
+        self._lock = threading.Lock()
+
+    def record(self, stage, duration, tags):
+        """
+        Append the stage, its duration and its tags to the records.
+        """
+        with self._lock:
+            self.records.append((stage, duration, tags))
+
+    def stages(self):
+        """
+        Return the names of the recorded stages, in the order they completed.
+        """
+        with self._lock:
+            return [stage for stage, _, _ in self.records]
+
+    def clear(self):
+        """
+        Remove all the records.
+        """
+        with self._lock:
+            self.records = []
+
+
+@lru_cache(maxsize=None)
+def _load_sinks(paths):
+    """
+    Return an instance of each of the sink classes at the dotted paths.
+    """
+    return tuple(import_string(path)() for path in paths)
+
+
+def get_instrumentation_sinks():
+    """
+    Return the sinks selected by the LEARNING_ASSISTANT_INSTRUMENTATION_SINKS setting.
+
+    A single instance of each sink is shared within the process.
+    """
+    paths = getattr(settings, 'LEARNING_ASSISTANT_INSTRUMENTATION_SINKS', None)
+    if not paths:
+        return ()
+
+    return _load_sinks(tuple(paths))
+
+
+def _emit(sinks, stage, duration, tags):
+    """
+    Report the span to each sink, so that a failing sink never fails the chat turn.
+    """
+    for sink in sinks:
+        try:
+            sink.record(stage, duration, tags)
+        except Exception:  # pylint: disable=broad-exception-caught
+            log.exception('Failed to record the learning_assistant stage=%(stage)s', {'stage': stage})
+
+
+class Span:
+    """
+    Context manager that measures how long its body takes and reports it to the sinks when it exits.
+
+    If the body raises an exception, the span is reported with an error tag set to the name of the exception.
+    """
+
+    def __init__(self, stage, sinks, tags):
+        """
+        Initialize the span.
+
+        Args:
+            stage (str): The name of the stage.
+            sinks (tuple): The sinks the span is reported to.
+            tags (dict): The initial tags of the span.
+        """
+        self.stage = stage
+        self.sinks = sinks
+        self.tags = tags
+        self._start = None
+
+    def set_tag(self, name, value):
+        """
+        Set a tag of the span, such as the outcome of the stage, once it is known.
+        """
+        self.tags[name] = value
+
+    def __enter__(self):
+        """
+        Start measuring the stage.
+        """
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Report the time taken by the stage to the sinks.
+        """
+        duration = time.perf_counter() - self._start
+        if exc_type is not None:
+            self.tags['error'] = exc_type.__name__
+        _emit(self.sinks, self.stage, duration, self.tags)
+        return False
+
+
+class _DisabledSpan:
+    """
+    Span used when there are no sinks, which measures nothing.
+    """
+
+    def set_tag(self, name, value):
+        """
+        Ignore the tag.
+        """
+
+    def __enter__(self):
+        """
+        Return the span itself, so that tags can be set on it.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Report nothing.
+        """
+        return False
+
+
+_DISABLED_SPAN = _DisabledSpan()
+
+
+def span(stage, **tags):
+    """
+    Return a context manager measuring how long its body takes, as a run of the stage.
+
+    Usage:
+        with span('get_block_content') as block_content_span:
+            ...
+            block_content_span.set_tag('cache', 'hit')
+    """
+    sinks = get_instrumentation_sinks()
+    if not sinks:
+        return _DISABLED_SPAN
+
+    return Span(stage, sinks, tags)
+
+
+def record_timing(stage, duration, **tags):
+    """
+    Report a duration measured by the caller, for stages that cannot be wrapped in a span, such as a streamed response.
+    """
+    sinks = get_instrumentation_sinks()
+    if sinks:
+        _emit(sinks, stage, duration, tags)
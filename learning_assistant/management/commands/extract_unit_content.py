@@ -0,0 +1,50 @@
+"""
+Django management command to extract and store the content of the units of courses.
+
+The content of a course's units is also extracted when the course is published, if the
+LEARNING_ASSISTANT_EXTRACT_UNIT_CONTENT_ON_PUBLISH setting is True. This command can be used to extract the content of
+courses that were published before that, or to re-extract it.
+
+Chat requests only read the extracted content if the LEARNING_ASSISTANT_EXTRACT_UNIT_CONTENT_ON_PUBLISH setting is True,
+and only content extracted, or found unchanged, in the last LEARNING_ASSISTANT_EXTRACTED_UNIT_CONTENT_MAX_AGE seconds.
+
+The units are loaded from the published branch of the modulestore, and their content is extracted with the get_html
+and transcript functions of the platform, outside of a request. This runs in Studio or in a Studio Celery worker, and is
+only covered by tests with the platform functions mocked, so it should be tried on a course in a sandbox before it is
+enabled.
+"""
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import CourseKey
+
+from learning_assistant.api import extract_course_unit_contents
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Django Management command to extract the content of the units of courses.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'course_ids',
+            nargs='+',
+            help='Course run IDs of the courses whose unit content to extract.'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Management command entry point.
+        """
+        try:
+            course_keys = [CourseKey.from_string(course_id) for course_id in options['course_ids']]
+        except InvalidKeyError as exc:
+            raise CommandError(f'Invalid course ID: {exc}') from exc
+
+        for course_key in course_keys:
+            extracted, skipped = extract_course_unit_contents(course_key)
+            log.info(f'{course_key}: {extracted} units extracted, {skipped} units skipped.')
@@ -2,21 +2,136 @@
 Django management command to remove LearningAssistantMessage objects
 if they have reached their expiration date.
 """
+import json
 import logging
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Min
 
 from learning_assistant.models import LearningAssistantMessage
 
 log = logging.getLogger(__name__)
 
 
+class Checkpoint:
+    """
+    The progress of a run of the command, saved to a file so that an interrupted run can be resumed.
+
+    Messages are removed in ranges of IDs, which may be completed out of order when there are several workers. The
+    checkpoint records the ID below which every range has been completed, and a resumed run starts from that ID.
+    """
+
+    def __init__(self, path, expiry_date, start_id, end_id):
+        """
+        Initialize the checkpoint.
+
+        Args:
+            path (str): the file the checkpoint is saved to, or None to not save it
+            expiry_date (datetime): the date up to which messages are removed
+            start_id (int): the ID below which every message of the run has been removed
+            end_id (int): the ID of the last message of the run
+        """
+        self.path = path
+        self.expiry_date = expiry_date
+        self.start_id = start_id
+        self.end_id = end_id
+        self._completed_ranges = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        """
+        Return the checkpoint saved to the file, or None if there is none.
+        """
+        if not path or not os.path.exists(path):
+            return None
+
+        with open(path, encoding='utf-8') as checkpoint_file:
+            data = json.load(checkpoint_file)
+
+        return cls(path, datetime.fromisoformat(data['expiry_date']), data['start_id'], data['end_id'])
+
+    def complete(self, range_start, range_end):
+        """
+        Record that the messages with IDs from range_start up to, but excluding, range_end have been removed.
+        """
+        with self._lock:
+            self._completed_ranges[range_start] = range_end
+            if range_start != self.start_id:
+                return
+
+            while self.start_id in self._completed_ranges:
+                self.start_id = self._completed_ranges.pop(self.start_id)
+            self.save()
+
+    def save(self):
+        """
+        Save the checkpoint to its file, if it has one.
+        """
+        if not self.path:
+            return
+
+        # The checkpoint is written to a temporary file first, so that an interruption never leaves a partial file.
+        temporary_path = f'{self.path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as checkpoint_file:
+            json.dump({
+                'expiry_date': self.expiry_date.isoformat(),
+                'start_id': self.start_id,
+                'end_id': self.end_id,
+            }, checkpoint_file)
+        os.replace(temporary_path, self.path)
+
+    def remove(self):
+        """
+        Remove the file of the checkpoint, once the run is complete.
+        """
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class AdaptiveThrottle:
+    """
+    Pause after each batch for a time proportional to how long the batch took.
+
+    Slow deletes are a sign that the database is busy, so the command backs off as the database slows down, and speeds
+    up again as it recovers, rather than always pausing for a fixed time.
+    """
+
+    def __init__(self, factor, min_sleep_time, max_sleep_time):
+        """
+        Initialize the throttle.
+
+        Args:
+            factor (float): the ratio of the pause to the duration of the batch
+            min_sleep_time (float): the shortest pause, in seconds
+            max_sleep_time (float): the longest pause, in seconds
+        """
+        self.factor = factor
+        self.min_sleep_time = min_sleep_time
+        self.max_sleep_time = max(min_sleep_time, max_sleep_time)
+
+    def wait(self, latency):
+        """
+        Pause after a batch that took latency seconds.
+        """
+        sleep_time = min(max(latency * self.factor, self.min_sleep_time), self.max_sleep_time)
+        if sleep_time > 0:
+            time.sleep(sleep_time)
+
+
 class Command(BaseCommand):
     """
     Django Management command to remove expired messages.
+
+    The expired messages are found with the index on their creation date, and then removed by walking their IDs in
+    ranges, optionally with several workers removing disjoint ranges concurrently.
     """
 
     def add_arguments(self, parser):
@@ -25,17 +140,48 @@ class Command(BaseCommand):
             action='store',
             dest='batch_size',
             type=int,
-            default=300,
-            help='Maximum number of messages to remove. '
+            default=1000,
+            help='Number of message IDs covered by each delete. '
                  'This helps avoid overloading the database while updating large amount of data.'
         )
         parser.add_argument(
             '--sleep_time',
             action='store',
             dest='sleep_time',
-            type=int,
+            type=float,
+            default=0,
+            help='Minimum sleep time in seconds between batches of a worker'
+        )
+        parser.add_argument(
+            '--max_sleep_time',
+            action='store',
+            dest='max_sleep_time',
+            type=float,
             default=10,
-            help='Sleep time in seconds between update of batches'
+            help='Maximum sleep time in seconds between batches of a worker'
+        )
+        parser.add_argument(
+            '--throttle_factor',
+            action='store',
+            dest='throttle_factor',
+            type=float,
+            default=1.0,
+            help='Sleep time between batches of a worker, as a multiple of the time taken by the last batch'
+        )
+        parser.add_argument(
+            '--workers',
+            action='store',
+            dest='workers',
+            type=int,
+            default=1,
+            help='Number of workers removing batches concurrently'
+        )
+        parser.add_argument(
+            '--checkpoint_file',
+            action='store',
+            dest='checkpoint_file',
+            default=None,
+            help='File recording the progress of the job, from which an interrupted job is resumed'
         )
 
     def handle(self, *args, **options):
@@ -43,26 +189,81 @@ class Command(BaseCommand):
         Management command entry point.
         """
         batch_size = options['batch_size']
-        sleep_time = options['sleep_time']
+        workers = options['workers']
+        if batch_size < 1 or workers < 1:
+            raise CommandError('The batch size and the number of workers must be positive.')
 
-        expiry_date = datetime.now() - timedelta(days=getattr(settings, 'LEARNING_ASSISTANT_MESSAGES_EXPIRY', 30))
+        checkpoint = Checkpoint.load(options['checkpoint_file'])
+        if checkpoint:
+            log.info(f'Resuming job from message {checkpoint.start_id}.')
+        else:
+            expiry_date = datetime.now() - timedelta(days=getattr(settings, 'LEARNING_ASSISTANT_MESSAGES_EXPIRY', 30))
+            bounds = LearningAssistantMessage.objects.filter(
+                created__lte=expiry_date
+            ).aggregate(start_id=Min('id'), end_id=Max('id'))
 
-        total_deleted = 0
-        deleted_count = None
+            if bounds['start_id'] is None:
+                log.info('Job completed. 0 messages deleted.')
+                return
 
-        while deleted_count != 0:
-            ids_to_delete = LearningAssistantMessage.objects.filter(
-                created__lte=expiry_date
-            ).values_list('id', flat=True)[:batch_size]
+            checkpoint = Checkpoint(options['checkpoint_file'], expiry_date, bounds['start_id'], bounds['end_id'])
+            checkpoint.save()
 
-            ids_to_delete = list(ids_to_delete)
-            delete_queryset = LearningAssistantMessage.objects.filter(
-                id__in=ids_to_delete
-            )
-            deleted_count, _ = delete_queryset.delete()
+        ranges = (
+            (range_start, min(range_start + batch_size, checkpoint.end_id + 1))
+            for range_start in range(checkpoint.start_id, checkpoint.end_id + 1, batch_size)
+        )
+        ranges_lock = threading.Lock()
 
-            total_deleted += deleted_count
-            log.info(f'{deleted_count} messages deleted.')
-            time.sleep(sleep_time)
+        def next_range():
+            with ranges_lock:
+                return next(ranges, None)
+
+        def throttle():
+            return AdaptiveThrottle(options['throttle_factor'], options['sleep_time'], options['max_sleep_time'])
+
+        if workers == 1:
+            total_deleted = self._run_worker(next_range, checkpoint, throttle())
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='retire_user_messages') as executor:
+                futures = [
+                    executor.submit(self._run_worker, next_range, checkpoint, throttle(), close_connection=True)
+                    for _ in range(workers)
+                ]
+                total_deleted = sum(future.result() for future in futures)
 
+        checkpoint.remove()
         log.info(f'Job completed. {total_deleted} messages deleted.')
+
+    def _run_worker(self, next_range, checkpoint, throttle, close_connection=False):
+        """
+        Remove the expired messages of each range returned by next_range, until there are none left.
+
+        Returns the number of messages removed.
+        """
+        total_deleted = 0
+        try:
+            while True:
+                id_range = next_range()
+                if id_range is None:
+                    break
+                range_start, range_end = id_range
+
+                start = time.monotonic()
+                deleted_count, _ = LearningAssistantMessage.objects.filter(
+                    id__gte=range_start,
+                    id__lt=range_end,
+                    created__lte=checkpoint.expiry_date,
+                ).delete()
+                latency = time.monotonic() - start
+
+                checkpoint.complete(range_start, range_end)
+                total_deleted += deleted_count
+                log.info(f'{deleted_count} messages deleted.')
+                throttle.wait(latency)
+        finally:
+            # Each worker thread has its own database connection, which is closed when the worker is done.
+            if close_connection:
+                connection.close()
+
+        return total_deleted
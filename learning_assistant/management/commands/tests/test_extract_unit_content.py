@@ -0,0 +1,33 @@
+"""
+Tests for the extract_unit_content management command
+"""
+from unittest.mock import call, patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from opaque_keys.edx.keys import CourseKey
+
+
+class ExtractUnitContentTests(TestCase):
+    """
+    Tests for the extract_unit_content command.
+    """
+
+    @patch('learning_assistant.management.commands.extract_unit_content.extract_course_unit_contents')
+    def test_run_command(self, mock_extract):
+        mock_extract.return_value = (2, 1)
+
+        call_command('extract_unit_content', 'course-v1:edx+test+23', 'course-v1:edx+test+24')
+
+        mock_extract.assert_has_calls([
+            call(CourseKey.from_string('course-v1:edx+test+23')),
+            call(CourseKey.from_string('course-v1:edx+test+24')),
+        ])
+
+    @patch('learning_assistant.management.commands.extract_unit_content.extract_course_unit_contents')
+    def test_invalid_course_id(self, mock_extract):
+        with self.assertRaises(CommandError):
+            call_command('extract_unit_content', 'course-v1:edx+test+23', 'not a course')
+
+        mock_extract.assert_not_called()
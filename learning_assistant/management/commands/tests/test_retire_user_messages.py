@@ -1,12 +1,20 @@
 """
 Tests for the retire_user_messages management command
 """
+import json
+import os
+import tempfile
+import threading
 from datetime import datetime, timedelta
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
 from django.core.management import call_command
-from django.test import TestCase
+from django.core.management.base import CommandError
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase
 
+from learning_assistant.management.commands.retire_user_messages import AdaptiveThrottle, Checkpoint
 from learning_assistant.models import LearningAssistantMessage
 
 User = get_user_model()
@@ -66,3 +74,145 @@ class RetireUserMessagesTests(TestCase):
 
         current_messages = LearningAssistantMessage.objects.filter()
         self.assertEqual(len(current_messages), 2)
+
+    def test_run_command_id_ranges(self):
+        """
+        Run the management command on expired messages spread over several ranges of IDs
+        """
+        for days in (90, 1, 45, 3, 31):
+            LearningAssistantMessage.objects.create(
+                user=self.user,
+                course_id=self.course_id,
+                role='user',
+                content='Hello',
+                created=datetime.now() - timedelta(days=days)
+            )
+
+        call_command('retire_user_messages', batch_size=2, throttle_factor=0)
+
+        self.assertEqual(
+            sorted(message.created.date() for message in LearningAssistantMessage.objects.all()),
+            sorted((datetime.now() - timedelta(days=days)).date() for days in (1, 2, 3, 4)),
+        )
+
+    def test_no_expired_messages(self):
+        """
+        Run the management command when no message is expired
+        """
+        LearningAssistantMessage.objects.filter(created__lte=datetime.now() - timedelta(days=30)).delete()
+
+        call_command('retire_user_messages', batch_size=2)
+
+        self.assertEqual(LearningAssistantMessage.objects.count(), 2)
+
+    def test_invalid_arguments(self):
+        """
+        Run the management command with a batch size or a number of workers that is not positive
+        """
+        with self.assertRaises(CommandError):
+            call_command('retire_user_messages', batch_size=0)
+        with self.assertRaises(CommandError):
+            call_command('retire_user_messages', workers=0)
+
+    def test_checkpoint(self):
+        """
+        Run the management command with a checkpoint file, resuming an interrupted job
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint_file = os.path.join(directory, 'checkpoint.json')
+            message_ids = list(LearningAssistantMessage.objects.order_by('id').values_list('id', flat=True))
+
+            # An interrupted job removed the messages up to the second one, so the first one is kept.
+            with open(checkpoint_file, 'w', encoding='utf-8') as checkpoint:
+                json.dump({
+                    'expiry_date': datetime.now().isoformat(),
+                    'start_id': message_ids[1],
+                    'end_id': message_ids[-1],
+                }, checkpoint)
+
+            call_command('retire_user_messages', batch_size=1, throttle_factor=0, checkpoint_file=checkpoint_file)
+
+            self.assertEqual(list(LearningAssistantMessage.objects.values_list('id', flat=True)), message_ids[:1])
+            self.assertFalse(os.path.exists(checkpoint_file))
+
+
+class RetireUserMessagesWorkersTests(TransactionTestCase):
+    """
+    Tests for the retire_user_messages command with several workers.
+    """
+
+    def test_run_command_workers(self):
+        """
+        Run the management command with several workers
+        """
+        user = User.objects.create(username='tester', email='tester@test.com')
+        for days in range(20, 60):
+            LearningAssistantMessage.objects.create(
+                user=user,
+                course_id='course-v1:edx+test+23',
+                role='user',
+                content='Hello',
+                created=datetime.now() - timedelta(days=days)
+            )
+
+        # The test database is SQLite, which fails concurrent writes with "database table is locked" instead of waiting
+        # for them, so the deletes of the workers are serialized. The workers still pick their ranges concurrently.
+        delete_lock = threading.Lock()
+        delete = QuerySet.delete
+
+        def serialized_delete(queryset):
+            with delete_lock:
+                return delete(queryset)
+
+        with patch.object(QuerySet, 'delete', serialized_delete):
+            call_command('retire_user_messages', batch_size=3, throttle_factor=0, workers=3)
+
+        self.assertEqual(LearningAssistantMessage.objects.count(), 10)
+
+
+class CheckpointTests(TestCase):
+    """
+    Tests for the Checkpoint of the retire_user_messages command.
+    """
+
+    def test_complete_out_of_order(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint_file = os.path.join(directory, 'checkpoint.json')
+            checkpoint = Checkpoint(checkpoint_file, datetime(2024, 1, 1), 1, 9)
+
+            checkpoint.complete(4, 7)
+            self.assertEqual(checkpoint.start_id, 1)
+            self.assertIsNone(Checkpoint.load(checkpoint_file))
+
+            checkpoint.complete(1, 4)
+            self.assertEqual(checkpoint.start_id, 7)
+
+            loaded = Checkpoint.load(checkpoint_file)
+            self.assertEqual(
+                (loaded.expiry_date, loaded.start_id, loaded.end_id),
+                (datetime(2024, 1, 1), 7, 9),
+            )
+
+            checkpoint.remove()
+            self.assertIsNone(Checkpoint.load(checkpoint_file))
+
+
+class AdaptiveThrottleTests(TestCase):
+    """
+    Tests for the AdaptiveThrottle of the retire_user_messages command.
+    """
+
+    @patch('learning_assistant.management.commands.retire_user_messages.time.sleep')
+    def test_wait(self, mock_sleep):
+        throttle = AdaptiveThrottle(factor=2, min_sleep_time=0.1, max_sleep_time=5)
+
+        for latency in (0.01, 1, 10):
+            throttle.wait(latency)
+
+        self.assertEqual([call.args[0] for call in mock_sleep.call_args_list], [0.1, 2, 5])
+
+    @patch('learning_assistant.management.commands.retire_user_messages.time.sleep')
+    def test_no_wait(self, mock_sleep):
+        AdaptiveThrottle(factor=0, min_sleep_time=0, max_sleep_time=5).wait(1)
+
+        mock_sleep.assert_not_called()
@@ -0,0 +1,194 @@
+"""
+Write-behind buffer for chat history messages.
+
+When the LEARNING_ASSISTANT_CHAT_HISTORY_WRITE_BEHIND setting is True, the messages of each chat turn are added to an
+in-process buffer instead of being written while the learner waits. A background thread writes the buffered messages
+with bulk_create, in batches of up to LEARNING_ASSISTANT_CHAT_HISTORY_BATCH_SIZE messages, at least every
+LEARNING_ASSISTANT_CHAT_HISTORY_FLUSH_INTERVAL seconds. The buffer is drained when the process exits.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from learning_assistant.models import LearningAssistantMessage
+
+log = logging.getLogger(__name__)
+
+
+class ChatMessageBuffer:
+    """
+    Buffer of unsaved LearningAssistantMessage instances, written in batches by a background thread.
+    """
+
+    def __init__(self, batch_size=100, flush_interval=1.0, max_size=10000):
+        """
+        Create an empty buffer. The background thread is started when the first messages are added.
+
+        Args:
+            batch_size (int): The number of buffered messages that triggers a write, and the most written at once.
+            flush_interval (float): The most time, in seconds, that a message stays in the buffer.
+            max_size (int): The most messages held in the buffer. Messages added beyond it are written right away.
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+
+        self._messages = []
+        self._condition = threading.Condition()
+        # held while a batch is written, so that flush can wait for a batch that the thread has taken
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def add(self, messages):
+        """
+        Add unsaved messages to the buffer, to be written by the background thread.
+        """
+        with self._condition:
+            if self._closed or len(self._messages) + len(messages) > self.max_size:
+                overflow = True
+            else:
+                overflow = False
+                was_empty = not self._messages
+                self._messages.extend(messages)
+                self._start_thread()
+                # the thread waits for the first message, then for a full batch or the end of the flush interval
+                if was_empty or len(self._messages) >= self.batch_size:
+                    self._condition.notify()
+
+        if overflow:
+            with self._write_lock:
+                self._write(messages)
+
+    def flush(self):
+        """
+        Write all the buffered messages, and wait for any batch that is being written.
+        """
+        while True:
+            with self._condition:
+                batch = self._messages[:self.batch_size]
+                del self._messages[:self.batch_size]
+
+            # Taking the write lock also waits for a batch that the background thread took before the buffer was
+            # emptied.
+            with self._write_lock:
+                if batch:
+                    self._write(batch)
+
+            if not batch:
+                break
+
+    def close(self):
+        """
+        Stop the background thread and write all the buffered messages.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def __len__(self):
+        """
+        Return the number of buffered messages.
+        """
+        with self._condition:
+            return len(self._messages)
+
+    def _start_thread(self):
+        """
+        Start the background thread if it is not running. Must be called with the condition held.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name='learning_assistant_message_buffer', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        """
+        Write batches of buffered messages until the buffer is closed.
+        """
+        while True:
+            with self._condition:
+                while not self._closed and not self._messages:
+                    self._condition.wait()
+
+                deadline = time.monotonic() + self.flush_interval
+                while not self._closed and len(self._messages) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                if self._closed:
+                    return
+
+                batch = self._messages[:self.batch_size]
+                del self._messages[:self.batch_size]
+                # take the write lock before releasing the condition, so that flush always waits for this batch
+                self._write_lock.acquire()  # pylint: disable=consider-using-with
+
+            try:
+                if batch:
+                    close_old_connections()
+                    self._write(batch)
+                    close_old_connections()
+            finally:
+                self._write_lock.release()
+
+    def _write(self, messages):
+        """
+        Write the messages with a single query. Failures are logged, as there is no request to report them to.
+        """
+        try:
+            with transaction.atomic():
+                LearningAssistantMessage.objects.bulk_create(messages)
+        except Exception:  # pylint: disable=broad-exception-caught
+            log.exception('Failed to write %(count)s chat history messages', {'count': len(messages)})
+
+
+_chat_message_buffer = None
+_chat_message_buffer_pid = None
+_chat_message_buffer_lock = threading.Lock()
+
+
+def get_chat_message_buffer():
+    """
+    Return the process-wide ChatMessageBuffer, creating it on first use.
+    """
+    global _chat_message_buffer, _chat_message_buffer_pid  # pylint: disable=global-statement
+
+    pid = os.getpid()
+    if _chat_message_buffer is None or _chat_message_buffer_pid != pid:
+        with _chat_message_buffer_lock:
+            if _chat_message_buffer is None or _chat_message_buffer_pid != pid:
+                _chat_message_buffer = ChatMessageBuffer(
+                    batch_size=getattr(settings, 'LEARNING_ASSISTANT_CHAT_HISTORY_BATCH_SIZE', 100),
+                    flush_interval=getattr(settings, 'LEARNING_ASSISTANT_CHAT_HISTORY_FLUSH_INTERVAL', 1.0),
+                    max_size=getattr(settings, 'LEARNING_ASSISTANT_CHAT_HISTORY_BUFFER_MAX_SIZE', 10000),
+                )
+                _chat_message_buffer_pid = pid
+
+    return _chat_message_buffer
+
+
+@atexit.register
+def close_chat_message_buffer():
+    """
+    Drain and discard the process-wide ChatMessageBuffer. This runs when the process exits.
+    """
+    global _chat_message_buffer, _chat_message_buffer_pid  # pylint: disable=global-statement
+
+    with _chat_message_buffer_lock:
+        if _chat_message_buffer is not None and _chat_message_buffer_pid == os.getpid():
+            _chat_message_buffer.close()
+        _chat_message_buffer = None
+        _chat_message_buffer_pid = None
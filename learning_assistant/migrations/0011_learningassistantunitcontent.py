@@ -0,0 +1,32 @@
+# Generated by Django 4.2.24 on 2026-10-18 02:41
+
+from django.db import migrations, models
+import django.utils.timezone
+import model_utils.fields
+import opaque_keys.edx.django.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning_assistant', '0010_learningassistantaudittrial_expiration_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LearningAssistantUnitContent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('course_id', opaque_keys.edx.django.models.CourseKeyField(db_index=True, max_length=255)),
+                ('unit_usage_key', opaque_keys.edx.django.models.UsageKeyField(max_length=255, unique=True)),
+                ('content_version', models.CharField(blank=True, max_length=255)),
+                ('content_length', models.PositiveIntegerField()),
+                ('content_items', models.JSONField()),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.24 on 2026-10-18 02:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning_assistant', '0011_learningassistantunitcontent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='learningassistantmessage',
+            index=models.Index(fields=['user', 'course_id', 'created'], name='la_message_user_course_created'),
+        ),
+    ]
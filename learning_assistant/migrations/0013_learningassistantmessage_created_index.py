@@ -0,0 +1,17 @@
+# Generated by Django 4.2.24 on 2026-10-18 03:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning_assistant', '0012_learningassistantmessage_user_course_created_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='learningassistantmessage',
+            index=models.Index(fields=['created'], name='la_message_created'),
+        ),
+    ]
@@ -6,7 +6,7 @@ from datetime import datetime
 from django.contrib.auth import get_user_model
 from django.db import models
 from model_utils.models import TimeStampedModel
-from opaque_keys.edx.django.models import CourseKeyField
+from opaque_keys.edx.django.models import CourseKeyField, UsageKeyField
 
 USER_MODEL = get_user_model()
 
@@ -50,6 +50,18 @@ class LearningAssistantMessage(TimeStampedModel):
     role = models.CharField(choices=Roles, max_length=64)
     content = models.TextField()
 
+    class Meta:
+        """
+        Model metadata.
+        """
+
+        indexes = [
+            # the chat history of a user in a course is read in order of creation
+            models.Index(fields=['user', 'course_id', 'created'], name='la_message_user_course_created'),
+            # expired messages are found by their creation date when they are retired
+            models.Index(fields=['created'], name='la_message_created'),
+        ]
+
 
 class LearningAssistantAuditTrial(TimeStampedModel):
     """
@@ -68,3 +80,22 @@ class LearningAssistantAuditTrial(TimeStampedModel):
     # This field was added prior to the full release of the audit trial feature, so the default was selected
     # to be a date that would be well after any existing audit trials.
     expiration_date = models.DateTimeField(default=datetime(2025, 2, 1))
+
+
+class LearningAssistantUnitContent(TimeStampedModel):
+    """
+    This model stores the text content of a course unit, extracted when the course is published.
+
+    Units whose content varies by user are not stored, because their content must be extracted for each user.
+
+    .. no_pii: This model has no PII.
+    """
+
+    course_id = CourseKeyField(max_length=255, db_index=True)
+    unit_usage_key = UsageKeyField(max_length=255, unique=True)
+
+    # the version of the unit the content was extracted from, used to skip units that have not changed
+    content_version = models.CharField(max_length=255, blank=True)
+
+    content_length = models.PositiveIntegerField()
+    content_items = models.JSONField()
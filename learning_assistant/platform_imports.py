@@ -26,6 +26,24 @@ def get_single_block(request, user_id, course_id, usage_key_string, course=None)
     return load_single_xblock(request, user_id, course_id, usage_key_string, course)
 
 
+def get_published_units(course_key):
+    """Return the published units of a course, loaded from the modulestore."""
+    # pylint: disable=import-outside-toplevel
+    from xmodule.modulestore import ModuleStoreEnum
+    from xmodule.modulestore.django import modulestore
+    store = modulestore()
+    with store.branch_setting(ModuleStoreEnum.Branch.published_only, course_key):
+        return store.get_items(course_key, qualifiers={'category': 'vertical'})
+
+
+def get_required_content(course_key, usage_key):
+    """Return the key of the prerequisite of a gated subsection, or None if the subsection is not gated."""
+    # pylint: disable=import-outside-toplevel
+    from openedx.core.lib.gating.api import get_required_content as platform_get_required_content
+    prerequisite_key, _, _ = platform_get_required_content(course_key, usage_key)
+    return prerequisite_key
+
+
 def traverse_block_pre_order(start_node, get_children, filter_func=None):
     """Traverse a DAG or tree in pre-order."""
     # pylint: disable=import-outside-toplevel
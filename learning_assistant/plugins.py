@@ -51,6 +51,20 @@ class LearningAssistantCourseApp(CourseApp):
         """
         return plugins_api.is_enabled(course_key)
 
+    @classmethod
+    def is_enabled_many(cls, course_keys):
+        """
+        Return if this course app is enabled for each of the provided courses.
+
+        Args:
+            course_keys (iterable of CourseKey): The course keys for the courses you
+                want to check the status of.
+
+        Returns:
+            dict: The status of the course app, by course key.
+        """
+        return plugins_api.is_enabled_many(course_keys)
+
     @classmethod
     def set_enabled(cls, course_key, enabled, user):
         """
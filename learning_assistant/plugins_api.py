@@ -10,6 +10,7 @@ imported into and used by the LearningAssistantCourseApp. This way, these implem
 from learning_assistant.api import (
     learning_assistant_available,
     learning_assistant_enabled,
+    learning_assistant_enabled_many,
     set_learning_assistant_enabled,
 )
 from learning_assistant.platform_imports import get_user_role
@@ -47,6 +48,22 @@ def is_enabled(course_key):
     return learning_assistant_enabled(course_key)
 
 
+def is_enabled_many(course_keys):
+    """
+    Return if this course app is enabled for each of the provided courses.
+
+    The courses are checked together, so that listing many courses does not query each of them separately.
+
+    Args:
+        course_keys (iterable of CourseKey): The course keys for the courses you
+            want to check the status of.
+
+    Returns:
+        dict: The status of the course app, by course key.
+    """
+    return learning_assistant_enabled_many(course_keys)
+
+
 # pylint: disable=unused-argument
 def set_enabled(course_key, enabled, user):
     """
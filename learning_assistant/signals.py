@@ -0,0 +1,121 @@
+"""
+Signal handlers for the learning_assistant app.
+"""
+import logging
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+
+from learning_assistant.api import (
+    invalidate_audit_trial_cache,
+    invalidate_eligibility_cache,
+    invalidate_learning_assistant_enabled_cache,
+    learning_assistant_enabled,
+)
+from learning_assistant.models import LearningAssistantAuditTrial, LearningAssistantCourseEnabled
+from learning_assistant.tasks import extract_course_unit_contents_task
+
+log = logging.getLogger(__name__)
+
+
+def extract_unit_contents_on_course_published(sender, course_key, **kwargs):  # pylint: disable=unused-argument
+    """
+    Extract the content of the units of a course when it is published.
+
+    This runs in Studio, where courses are published. The extraction is queued as a Celery task, so that it does not
+    slow down the publish request. Failures to queue it are logged rather than raised, so that they never prevent a
+    course from being published.
+    """
+    if not getattr(settings, 'LEARNING_ASSISTANT_EXTRACT_UNIT_CONTENT_ON_PUBLISH', False):
+        return
+
+    if not learning_assistant_enabled(course_key):
+        return
+
+    try:
+        extract_course_unit_contents_task.delay(str(course_key))
+    except Exception:  # pylint: disable=broad-exception-caught
+        log.exception(
+            'Failed to queue the extraction of the unit contents of course_key=%(course_key)s',
+            {'course_key': course_key}
+        )
+
+
+def invalidate_enabled_cache_on_change(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Remove the cached value of whether the Learning Assistant is enabled in a course when its override changes.
+    """
+    invalidate_learning_assistant_enabled_cache(instance.course_id)
+
+
+def invalidate_audit_trial_cache_on_change(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Remove the cached audit trial of a user when it changes.
+    """
+    invalidate_audit_trial_cache(instance.user_id)
+
+
+def invalidate_eligibility_cache_on_enrollment_change(
+    sender, user=None, course_id=None, course_key=None, **kwargs
+):  # pylint: disable=unused-argument
+    """
+    Remove the cached eligibility of a user in a course run when they enroll, unenroll or change enrollment mode.
+
+    The platform's enrollment signals name the course run either course_id or course_key.
+    """
+    course_key = course_key or course_id
+    if user is None or course_key is None:
+        return
+
+    invalidate_eligibility_cache(user.id, course_key)
+
+
+def connect_signal_handlers():
+    """
+    Connect the signal handlers to the platform's signals, if the platform is available.
+    """
+    post_save.connect(
+        invalidate_enabled_cache_on_change,
+        sender=LearningAssistantCourseEnabled,
+        dispatch_uid='learning_assistant.invalidate_learning_assistant_enabled_cache_on_save',
+    )
+    post_delete.connect(
+        invalidate_enabled_cache_on_change,
+        sender=LearningAssistantCourseEnabled,
+        dispatch_uid='learning_assistant.invalidate_learning_assistant_enabled_cache_on_delete',
+    )
+    post_save.connect(
+        invalidate_audit_trial_cache_on_change,
+        sender=LearningAssistantAuditTrial,
+        dispatch_uid='learning_assistant.invalidate_audit_trial_cache_on_save',
+    )
+    post_delete.connect(
+        invalidate_audit_trial_cache_on_change,
+        sender=LearningAssistantAuditTrial,
+        dispatch_uid='learning_assistant.invalidate_audit_trial_cache_on_delete',
+    )
+
+    # pylint: disable=import-outside-toplevel
+    try:
+        from common.djangoapps.student.signals import ENROLL_STATUS_CHANGE, ENROLLMENT_TRACK_UPDATED
+    except ImportError:
+        pass
+    else:
+        ENROLL_STATUS_CHANGE.connect(
+            invalidate_eligibility_cache_on_enrollment_change,
+            dispatch_uid='learning_assistant.invalidate_eligibility_cache_on_enroll_status_change',
+        )
+        ENROLLMENT_TRACK_UPDATED.connect(
+            invalidate_eligibility_cache_on_enrollment_change,
+            dispatch_uid='learning_assistant.invalidate_eligibility_cache_on_enrollment_track_updated',
+        )
+
+    try:
+        from xmodule.modulestore.django import SignalHandler
+    except ImportError:
+        return
+
+    SignalHandler.course_published.connect(
+        extract_unit_contents_on_course_published,
+        dispatch_uid='learning_assistant.extract_unit_contents_on_course_published',
+    )
@@ -0,0 +1,29 @@
+"""
+Celery tasks for the learning_assistant app.
+"""
+import logging
+
+from celery import shared_task
+from edx_django_utils.monitoring import set_code_owner_attribute
+from opaque_keys.edx.keys import CourseKey
+
+from learning_assistant.api import extract_course_unit_contents
+
+log = logging.getLogger(__name__)
+
+
+@shared_task
+@set_code_owner_attribute
+def extract_course_unit_contents_task(course_key_string):
+    """
+    Extract and store the content of the units of a course, after it was published.
+
+    The extraction loads every unit of the course, so it runs in a Celery worker rather than in the publish request.
+    """
+    course_key = CourseKey.from_string(course_key_string)
+    extracted, skipped = extract_course_unit_contents(course_key)
+
+    log.info(
+        'Extracted the contents of %(extracted)s units and skipped %(skipped)s units of course_key=%(course_key)s',
+        {'extracted': extracted, 'skipped': skipped, 'course_key': course_key},
+    )
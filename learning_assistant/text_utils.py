@@ -2,22 +2,40 @@
 Text manipulation utils. This has been copied from the ai-aside repository.
 """
 
+import re
 from html.parser import HTMLParser
-from re import sub
 
 from django.conf import settings
 
+# Matches leading whitespace, and every run of whitespace other than a single space, which is left as it is.
+_WHITESPACE_PATTERN = re.compile(r'^\s+|\s{2,}|[^\S ]')
+_SPACES_PATTERN = re.compile(r'[^\S\r\n]+')
+
+
+def _cleanup_whitespace(match):
+    """
+    Return the replacement for a run of whitespace matched by _WHITESPACE_PATTERN.
+    """
+    whitespace = match.group()
+
+    # Leading whitespace, and trailing whitespace that contains a new line, is trimmed.
+    if match.start() == 0:
+        return ''
+
+    if '\n' in whitespace:
+        return '' if match.end() == len(match.string) else '\n'
+
+    return _SPACES_PATTERN.sub(' ', whitespace)
+
 
 def cleanup_text(text):
     """
     Remove litter from replacing or manipulating text.
-    """
-    stripped = sub(r'[^\S\r\n]+', ' ', text)  # Removing extra spaces
-    stripped = sub(r'\n{2,}', '\n', stripped)  # Removing extra new lines
-    stripped = sub(r'(\s+)?\n(\s+)?', '\n', stripped)  # Removing starting extra spacesbetween new lines
-    stripped = sub(r'(^(\s+)\n?)|(\n(\s+)?$)', '', stripped)  # Trim
 
-    return stripped
+    Extra spaces are collapsed into one, whitespace that contains new lines is collapsed into a single new line, and
+    the text is trimmed, all in a single pass over the text.
+    """
+    return _WHITESPACE_PATTERN.sub(_cleanup_whitespace, text)
 
 
 class _HTMLToTextHelper(HTMLParser):  # lint-amnesty
@@ -31,11 +49,15 @@ class _HTMLToTextHelper(HTMLParser):  # lint-amnesty
         HTMLParser.__init__(self)
         self.reset()
         self.fed = []
+        self.tags_to_filter = frozenset(getattr(settings, 'LEARNING_ASSISTANT_HTML_TAGS_TO_REMOVE', None) or ())
+
+    def updatepos(self, i, j):
+        """Skip tracking the line and offset of the parser, which is only used to report parsing errors."""
+        return j
 
     def handle_starttag(self, tag, _):
         """On each tag, check whether this is a tag we think is content."""
-        tags_to_filter = getattr(settings, 'LEARNING_ASSISTANT_HTML_TAGS_TO_REMOVE', None)
-        self._is_content = not (tags_to_filter and tag in tags_to_filter)
+        self._is_content = tag not in self.tags_to_filter
 
     def handle_data(self, data):
         """Handle tag data by appending text we think is content."""
@@ -1,6 +1,10 @@
 """
 Toggles for learning-assistant app.
 """
+from functools import lru_cache
+
+from crum import get_current_request
+from edx_django_utils.cache import RequestCache
 
 WAFFLE_NAMESPACE = 'learning_assistant'
 
@@ -24,17 +28,46 @@ ENABLE_CHAT_HISTORY = 'enable_chat_history'
 ENABLE_V2_ENDPOINT = 'enable_v2_endpoint'
 
 
-def _is_learning_assistant_waffle_flag_enabled(flag_name, course_key=None):
+@lru_cache(maxsize=None)
+def _get_learning_assistant_waffle_flag(flag_name):
     """
-    Import and return Waffle flag for enabling the summary hook.
+    Import and return the Waffle flag with the given name, creating it only once per process.
+
+    Returns None if the Waffle flags of the platform cannot be imported.
     """
     # pylint: disable=import-outside-toplevel
     try:
         from openedx.core.djangoapps.waffle_utils import CourseWaffleFlag
-        return CourseWaffleFlag(f'{WAFFLE_NAMESPACE}.{flag_name}', __name__).is_enabled(course_key)
     except ImportError:
+        return None
+
+    return CourseWaffleFlag(f'{WAFFLE_NAMESPACE}.{flag_name}', __name__)
+
+
+def _is_learning_assistant_waffle_flag_enabled(flag_name, course_key=None):
+    """
+    Return whether the Waffle flag with the given name is enabled for the course.
+
+    Within a request, the flag is evaluated once per course, and the result is reused by the later checks of the
+    request. Outside of a request, there is nothing that would clear the cached result, so the flag is always evaluated.
+    """
+    waffle_flag = _get_learning_assistant_waffle_flag(flag_name)
+    if waffle_flag is None:
         return False
 
+    if get_current_request() is None:
+        return waffle_flag.is_enabled(course_key)
+
+    request_cache = RequestCache(f'{WAFFLE_NAMESPACE}.toggles')
+    cache_key = f'{flag_name}.{course_key}'
+    cached_response = request_cache.get_cached_response(cache_key)
+    if cached_response.is_found:
+        return cached_response.value
+
+    enabled = waffle_flag.is_enabled(course_key)
+    request_cache.set(cache_key, enabled)
+    return enabled
+
 
 def chat_history_enabled(course_key):
     """
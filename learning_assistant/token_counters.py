@@ -0,0 +1,181 @@
+"""
+Token counters, used to fit the prompt and the chat history within the chat completion token budget.
+
+The token counter is selected with the CHAT_COMPLETION_TOKEN_COUNTER setting, which is the dotted path to a
+TokenCounter subclass. Options for the token counter can be passed with the CHAT_COMPLETION_TOKEN_COUNTER_OPTIONS
+setting.
+"""
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from math import ceil
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULT_TOKEN_COUNTER = 'learning_assistant.token_counters.EstimatedTokenCounter'
+
+# The chat completion API wraps each message in a JSON object, which costs tokens on top of its content.
+MESSAGE_TOKEN_PADDING = 8
+
+
+class TokenCounter:
+    """
+    Base class for token counters.
+
+    Subclasses implement count. Message token counts are cached in an LRU, keyed by a hash of the message content, so
+    that the chat history, which is resent on every turn, is only counted once.
+    """
+
+    def __init__(self, cache_size=1024):
+        """
+        Create the token count cache.
+
+        Args:
+            cache_size (int): The maximum number of message token counts to cache, or 0 to disable the cache.
+        """
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def count(self, text):
+        """
+        Return the number of tokens in the text.
+        """
+        raise NotImplementedError
+
+    def count_message(self, content):
+        """
+        Return the number of tokens taken by a chat message with the given content.
+        """
+        if not self.cache_size:
+            return self.count(content) + MESSAGE_TOKEN_PADDING
+
+        # The content itself is not used as the key, so that the cache does not hold on to large messages.
+        key = (hash(content), len(content))
+        with self._cache_lock:
+            tokens = self._cache.get(key)
+            if tokens is not None:
+                self._cache.move_to_end(key)
+                return tokens
+
+        tokens = self.count(content) + MESSAGE_TOKEN_PADDING
+
+        with self._cache_lock:
+            self._cache[key] = tokens
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return tokens
+
+    def truncate(self, text, max_tokens):
+        """
+        Return the longest prefix of the text that has at most max_tokens tokens.
+        """
+        if self.count(text) <= max_tokens:
+            return text
+
+        # Token counts only grow as the prefix grows, so the longest fitting prefix can be found by bisection.
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+
+        return text[:low]
+
+
+class EstimatedTokenCounter(TokenCounter):
+    """
+    Token counter that estimates 3.5 non-space characters per token.
+
+    This is cheap to compute, but underestimates the number of tokens in code and non-Latin text, and overestimates it
+    in English prose.
+    """
+
+    chars_per_token = 3.5
+
+    def count(self, text):
+        """
+        Return the estimated number of tokens in the text.
+        """
+        return int((len(text) - text.count(' ')) / self.chars_per_token)
+
+
+class RegexTokenCounter(TokenCounter):
+    """
+    Token counter that approximates a byte pair encoding (BPE) tokenizer without its vocabulary.
+
+    The text is split with the same kind of pre-tokenization pattern that the BPE tokenizers of chat completion models
+    use, which splits words, numbers of up to three digits, punctuation and whitespace into separate pieces. The number
+    of tokens in each piece is then estimated from the merges those tokenizers typically learn: common words are a
+    single token, longer words are split every few characters, non-ASCII characters are roughly one token each and
+    punctuation is merged in pairs.
+    """
+
+    _pretoken_pattern = re.compile(
+        r"(?P<contraction>'(?:[sdmtSDMT]|ll|ve|re|LL|VE|RE))"
+        r"|(?P<word> ?[^\W\d_]+)"
+        r"|(?P<number> ?\d{1,3})"
+        r"|(?P<symbol> ?(?:[^\s\w]|_)+)"
+        r"|(?P<space>\s+)"
+    )
+
+    def __init__(self, cache_size=1024, chars_per_word_token=7, chars_per_symbol_token=2):
+        """
+        Configure the token estimates for each kind of piece.
+
+        Args:
+            cache_size (int): The maximum number of message token counts to cache, or 0 to disable the cache.
+            chars_per_word_token (int): The number of ASCII letters merged into each token of a word.
+            chars_per_symbol_token (int): The number of punctuation characters merged into each token.
+        """
+        super().__init__(cache_size=cache_size)
+        self.chars_per_word_token = chars_per_word_token
+        self.chars_per_symbol_token = chars_per_symbol_token
+
+    def count(self, text):
+        """
+        Return the approximate number of tokens in the text.
+        """
+        tokens = 0
+
+        for match in self._pretoken_pattern.finditer(text):
+            kind = match.lastgroup
+            piece = match.group()
+
+            if kind == 'word':
+                piece = piece.lstrip(' ')
+                ascii_length = len(piece.encode('ascii', 'ignore'))
+                tokens += ceil(ascii_length / self.chars_per_word_token) + len(piece) - ascii_length
+            elif kind == 'symbol':
+                tokens += ceil(len(piece.lstrip(' ')) / self.chars_per_symbol_token)
+            else:
+                tokens += 1
+
+        return tokens
+
+
+@lru_cache(maxsize=None)
+def _load_token_counter(path, options):
+    """
+    Return an instance of the token counter class at the dotted path, created with the given options.
+    """
+    return import_string(path)(**dict(options))
+
+
+def get_token_counter():
+    """
+    Return the token counter selected by the CHAT_COMPLETION_TOKEN_COUNTER setting.
+
+    A single instance is shared within the process for each token counter and set of options, so that its cache is
+    shared between requests.
+    """
+    path = getattr(settings, 'CHAT_COMPLETION_TOKEN_COUNTER', DEFAULT_TOKEN_COUNTER)
+    options = dict(getattr(settings, 'CHAT_COMPLETION_TOKEN_COUNTER_OPTIONS', {}))
+    options.setdefault('cache_size', getattr(settings, 'CHAT_COMPLETION_TOKEN_COUNT_CACHE_SIZE', 1024))
+
+    return _load_token_counter(path, tuple(sorted(options.items())))
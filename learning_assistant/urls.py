@@ -1,17 +1,26 @@
 """
 URLs for learning_assistant.
 """
+from django.conf import settings
 from django.urls import re_path
 
 from learning_assistant.constants import COURSE_ID_PATTERN
-from learning_assistant.views import CourseChatView, LearningAssistantChatSummaryView
+from learning_assistant.views import (
+    AsyncCourseChatView,
+    CourseChatView,
+    LearningAssistantChatSummaryView,
+    LearningAssistantMessageHistoryView,
+)
 
 app_name = 'learning_assistant'
 
+# The asynchronous chat view only benefits deployments served by ASGI.
+chat_view = AsyncCourseChatView if getattr(settings, 'LEARNING_ASSISTANT_ASYNC_CHAT_VIEW', False) else CourseChatView
+
 urlpatterns = [
     re_path(
         fr'learning_assistant/v1/course_id/{COURSE_ID_PATTERN}$',
-        CourseChatView.as_view(),
+        chat_view.as_view(),
         name='chat'
     ),
     re_path(
@@ -19,4 +28,9 @@ urlpatterns = [
         LearningAssistantChatSummaryView.as_view(),
         name='chat-summary',
     ),
+    re_path(
+        fr'learning_assistant/v1/course_id/{COURSE_ID_PATTERN}/history',
+        LearningAssistantMessageHistoryView.as_view(),
+        name='message-history',
+    ),
 ]
@@ -1,20 +1,37 @@
 """
 Utils file for learning-assistant.
 """
-import copy
+import asyncio
 import json
 import logging
+import os
+import threading
+import weakref
 from datetime import datetime
 
 import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.cache import cache
 from django.utils.translation import get_language
+from edx_django_utils.cache import get_cache_key
 from optimizely import optimizely
+from optimizely.config_manager import PollingConfigManager
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError
 from requests.exceptions import ConnectTimeout
 from rest_framework import status as http_status
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
 
 from learning_assistant.constants import LMS_DATETIME_FORMAT
+from learning_assistant.instrumentation import span
 from learning_assistant.toggles import v2_endpoint_enabled
+from learning_assistant.token_counters import EstimatedTokenCounter, get_token_counter
 
 log = logging.getLogger(__name__)
 
@@ -23,44 +40,45 @@ def estimated_message_tokens(message):
     """
     Estimates how many tokens are in a given message.
     """
-    chars_per_token = 3.5
-    json_padding = 8
-
-    return int((len(message) - message.count(' ')) / chars_per_token) + json_padding
+    return EstimatedTokenCounter(cache_size=0).count_message(message)
 
 
 def get_reduced_message_list(prompt_template, message_list):
     """
     If messages are larger than allotted token amount, return a smaller list of messages.
+
+    The most recent messages that fit within the token budget are kept. Tokens are counted with the token counter
+    selected by the CHAT_COMPLETION_TOKEN_COUNTER setting, which caches the count of each message, because clients
+    resend the whole chat history on every turn.
     """
-    total_system_tokens = estimated_message_tokens(prompt_template)
+    message_tokens = get_token_counter().count_message
+    total_system_tokens = message_tokens(prompt_template)
 
     max_tokens = getattr(settings, 'CHAT_COMPLETION_MAX_TOKENS', 16385)
     response_tokens = getattr(settings, 'CHAT_COMPLETION_RESPONSE_TOKENS', 1000)
     remaining_tokens = max_tokens - response_tokens - total_system_tokens
 
-    new_message_list = []
-    # use copy of list, as it is modified as part of the reduction
-    message_list_copy = copy.deepcopy(message_list)
+    # traverse the message list from most recent to oldest, finding the oldest message that still fits
+    first_kept_index = len(message_list)
     total_message_tokens = 0
 
-    while total_message_tokens < remaining_tokens and len(message_list_copy) != 0:
-        new_message = message_list_copy.pop()
-        total_message_tokens += estimated_message_tokens(new_message['content'])
+    for index in range(len(message_list) - 1, -1, -1):
+        total_message_tokens += message_tokens(message_list[index]['content'])
         if total_message_tokens >= remaining_tokens:
             break
 
-        # insert message at beginning of list, because we are traversing the message list from most recent to oldest
-        new_message_list.insert(0, new_message)
+        first_kept_index = index
 
-    return new_message_list
+    # copy only the kept messages, so that the caller's message list is never modified through the result
+    return [dict(message) for message in message_list[first_kept_index:]]
 
 
 def create_request_body(prompt_template, message_list):
     """
     Form request body to be passed to the chat endpoint.
     """
-    messages = get_reduced_message_list(prompt_template, message_list)
+    with span('token_trimming'):
+        messages = get_reduced_message_list(prompt_template, message_list)
 
     response_body = {
         'message_list': [{'role': 'system', 'content': prompt_template}] + messages,
@@ -76,12 +94,167 @@ def create_request_body(prompt_template, message_list):
     return response_body
 
 
+class ChatCompletionClient:
+    """
+    HTTP client for the chat completion endpoint.
+
+    Requests are sent through a single requests.Session, so that connections to the completion endpoint are pooled and
+    kept alive between chat turns instead of paying a new TCP and TLS handshake on every request. Failures to connect
+    are retried with exponential backoff; requests that reached the endpoint are never retried.
+    """
+
+    def __init__(self, pool_size=10, keep_alive=True, connect_retries=2, retry_backoff=0.1):
+        """
+        Create the session and mount a pooled adapter for both http and https endpoints.
+
+        Args:
+            pool_size (int): The maximum number of connections kept open to the completion endpoint.
+            keep_alive (bool): Whether connections are kept open between requests.
+            connect_retries (int): The number of times a failed connection is retried.
+            retry_backoff (float): The backoff factor, in seconds, between connection retries.
+        """
+        self.keep_alive = keep_alive
+        self.session = requests.Session()
+
+        retry = Retry(
+            total=connect_retries,
+            connect=connect_retries,
+            read=False,
+            status=False,
+            other=0,
+            backoff_factor=retry_backoff,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def post(self, url, headers=None, **kwargs):
+        """
+        Send a POST request to the given url through the pooled session.
+        """
+        headers = dict(headers or {})
+        if not self.keep_alive:
+            headers['Connection'] = 'close'
+        return self.session.post(url, headers=headers, **kwargs)
+
+    def close(self):
+        """
+        Close all pooled connections.
+        """
+        self.session.close()
+
+
+_chat_completion_client = None
+_chat_completion_client_pid = None
+_chat_completion_client_lock = threading.Lock()
+
+
+def get_chat_completion_client():
+    """
+    Return the process-wide ChatCompletionClient, creating it on first use.
+
+    The client is recreated in forked worker processes, as pooled connections must not be shared across processes.
+    """
+    global _chat_completion_client, _chat_completion_client_pid  # pylint: disable=global-statement
+
+    pid = os.getpid()
+    if _chat_completion_client is None or _chat_completion_client_pid != pid:
+        with _chat_completion_client_lock:
+            if _chat_completion_client is None or _chat_completion_client_pid != pid:
+                _chat_completion_client = ChatCompletionClient(
+                    pool_size=getattr(settings, 'CHAT_COMPLETION_API_POOL_SIZE', 10),
+                    keep_alive=getattr(settings, 'CHAT_COMPLETION_API_KEEP_ALIVE', True),
+                    connect_retries=getattr(settings, 'CHAT_COMPLETION_API_CONNECT_RETRIES', 2),
+                    retry_backoff=getattr(settings, 'CHAT_COMPLETION_API_RETRY_BACKOFF', 0.1),
+                )
+                _chat_completion_client_pid = pid
+
+    return _chat_completion_client
+
+
+def reset_chat_completion_client():
+    """
+    Close and discard the process-wide ChatCompletionClient, so that it is recreated with current settings.
+    """
+    global _chat_completion_client, _chat_completion_client_pid  # pylint: disable=global-statement
+
+    with _chat_completion_client_lock:
+        if _chat_completion_client is not None:
+            _chat_completion_client.close()
+        _chat_completion_client = None
+        _chat_completion_client_pid = None
+
+
+_async_chat_completion_clients = weakref.WeakKeyDictionary()
+
+
+def create_async_chat_completion_client():
+    """
+    Return a new httpx.AsyncClient for requests to the chat completion endpoint.
+
+    It is configured from the same settings as the ChatCompletionClient.
+    """
+    pool_size = getattr(settings, 'CHAT_COMPLETION_API_POOL_SIZE', 10)
+    keep_alive = getattr(settings, 'CHAT_COMPLETION_API_KEEP_ALIVE', True)
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size if keep_alive else 0,
+        ),
+        # httpx only retries failures to connect, never requests that reached the endpoint.
+        transport=httpx.AsyncHTTPTransport(retries=getattr(settings, 'CHAT_COMPLETION_API_CONNECT_RETRIES', 2)),
+    )
+
+
+async def _close_on_loop_shutdown(client):
+    """
+    Close the client when the event loop it runs in shuts down.
+
+    This is an async generator that is started and never resumed. An event loop closes the async generators started in
+    it when it shuts down, as asyncio.run does, which runs the finally clause.
+    """
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+async def get_async_chat_completion_client():
+    """
+    Return the httpx.AsyncClient for the running event loop, creating it on first use.
+
+    An AsyncClient is bound to the event loop it is first used in, so one client is kept per loop, and closed when the
+    loop shuts down. Under ASGI, the requests share the loop of the server, so they share a client and its pooled
+    connections. Under WSGI, async_to_sync runs each request in a new loop, which shuts down at the end of the request,
+    so each request gets a client that is closed once it is done.
+    """
+    loop = asyncio.get_running_loop()
+    client, _ = _async_chat_completion_clients.get(loop, (None, None))
+
+    if client is None:
+        client = create_async_chat_completion_client()
+        closer = _close_on_loop_shutdown(client)
+        # The generator is kept with the client, so that it is only closed when the loop shuts down.
+        _async_chat_completion_clients[loop] = (client, closer)
+        await closer.asend(None)
+
+    return client
+
+
+def get_completion_endpoint():
+    """
+    Return the chat completion endpoint, as defined by the CHAT_COMPLETION_API or CHAT_COMPLETION_API_V2 setting.
+    """
+    return getattr(settings, 'CHAT_COMPLETION_API_V2', None) if v2_endpoint_enabled() \
+        else getattr(settings, 'CHAT_COMPLETION_API', None)
+
+
 def get_chat_response(prompt_template, message_list):
     """
     Pass message list to chat endpoint, as defined by the CHAT_COMPLETION_API setting.
     """
-    completion_endpoint = getattr(settings, 'CHAT_COMPLETION_API_V2', None) if v2_endpoint_enabled() \
-        else getattr(settings, 'CHAT_COMPLETION_API', None)
+    completion_endpoint = get_completion_endpoint()
     if completion_endpoint:
         headers = {'Content-Type': 'application/json'}
         connect_timeout = getattr(settings, 'CHAT_COMPLETION_API_CONNECT_TIMEOUT', 1)
@@ -90,15 +263,17 @@ def get_chat_response(prompt_template, message_list):
         body = create_request_body(prompt_template, message_list)
 
         try:
-            response = requests.post(
-                completion_endpoint,
-                headers=headers,
-                data=json.dumps(body),
-                timeout=(connect_timeout, read_timeout)
-            )
-            chat = response.json()
+            with span('chat_completion') as completion_span:
+                response = get_chat_completion_client().post(
+                    completion_endpoint,
+                    headers=headers,
+                    data=json.dumps(body),
+                    timeout=(connect_timeout, read_timeout)
+                )
+                chat = response.json()
+                completion_span.set_tag('status_code', response.status_code)
             response_status = response.status_code
-        except (ConnectTimeout, ConnectionError) as e:
+        except (ConnectTimeout, ConnectionError, RequestsConnectionError) as e:
             error_message = str(e)
             connection_message = 'Failed to connect to chat completion API.'
             log.error(
@@ -114,6 +289,124 @@ def get_chat_response(prompt_template, message_list):
     return response_status, chat
 
 
+async def aget_chat_response(prompt_template, message_list):
+    """
+    Asynchronous variant of get_chat_response.
+
+    The request to the chat completion endpoint is made with httpx, if it is installed. Otherwise, get_chat_response
+    is run in a worker thread.
+    """
+    if httpx is None:
+        return await sync_to_async(get_chat_response, thread_sensitive=False)(prompt_template, message_list)
+
+    # Both the endpoint and the request body depend on waffle flags, which may query the database.
+    completion_endpoint = await sync_to_async(get_completion_endpoint)()
+    if not completion_endpoint:
+        return http_status.HTTP_404_NOT_FOUND, 'Completion endpoint is not defined.'
+
+    headers = {'Content-Type': 'application/json'}
+    connect_timeout = getattr(settings, 'CHAT_COMPLETION_API_CONNECT_TIMEOUT', 1)
+    read_timeout = getattr(settings, 'CHAT_COMPLETION_API_READ_TIMEOUT', 15)
+
+    body = await sync_to_async(create_request_body)(prompt_template, message_list)
+
+    client = await get_async_chat_completion_client()
+    try:
+        with span('chat_completion') as completion_span:
+            response = await client.post(
+                completion_endpoint,
+                headers=headers,
+                content=json.dumps(body),
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            )
+            completion_span.set_tag('status_code', response.status_code)
+    except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+        connection_message = 'Failed to connect to chat completion API.'
+        log.error(
+            '%(connection_message)s %(error)s',
+            {'connection_message': connection_message, 'error': str(e)}
+        )
+        return http_status.HTTP_502_BAD_GATEWAY, connection_message
+
+    return response.status_code, response.json()
+
+
+def get_chat_response_stream(prompt_template, message_list):
+    """
+    Pass message list to chat endpoint and stream the completion back as it is generated.
+
+    The request body is the same as the one sent by get_chat_response, with the addition of a stream flag. An endpoint
+    that supports the stream flag responds with the text of the completion, in plain text, as it is generated; the
+    returned chunks are then an iterator over that text. An endpoint that ignores the stream flag responds with the
+    complete message as JSON, in the v1 or v2 format; the returned chunks are then the content of that message, as a
+    single chunk. Otherwise, the returned chunks are the error response, as returned by get_chat_response, or a
+    generic error message if the error response is not JSON.
+
+    Iterating over the chunks raises a requests.exceptions.RequestException if the stream is interrupted, for instance
+    if the endpoint stops sending chunks for longer than the read timeout.
+
+    Returns:
+    * response_status (int): the status code of the completion endpoint response
+    * chunks (iterator or object): the completion text chunks, or the error response
+    """
+    completion_endpoint = get_completion_endpoint()
+    if not completion_endpoint:
+        return http_status.HTTP_404_NOT_FOUND, 'Completion endpoint is not defined.'
+
+    headers = {'Content-Type': 'application/json'}
+    connect_timeout = getattr(settings, 'CHAT_COMPLETION_API_CONNECT_TIMEOUT', 1)
+    read_timeout = getattr(settings, 'CHAT_COMPLETION_API_READ_TIMEOUT', 15)
+
+    body = create_request_body(prompt_template, message_list)
+    body['stream'] = True
+
+    # The span only covers the time until the response headers are received; the time taken by the rest of the stream
+    # is reported by the caller, as it is consumed.
+    try:
+        with span('chat_completion', stream=True) as completion_span:
+            response = get_chat_completion_client().post(
+                completion_endpoint,
+                headers=headers,
+                data=json.dumps(body),
+                timeout=(connect_timeout, read_timeout),
+                stream=True,
+            )
+            completion_span.set_tag('status_code', response.status_code)
+    except (ConnectTimeout, ConnectionError, RequestsConnectionError) as e:
+        connection_message = 'Failed to connect to chat completion API.'
+        log.error(
+            '%(connection_message)s %(error)s',
+            {'connection_message': connection_message, 'error': str(e)}
+        )
+        return http_status.HTTP_502_BAD_GATEWAY, connection_message
+
+    if response.status_code != http_status.HTTP_200_OK:
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            log.error(
+                'The chat completion API responded with status_code=%(status_code)s and a body that is not JSON.',
+                {'status_code': response.status_code}
+            )
+            return response.status_code, 'The chat completion API returned an error.'
+
+    if response.headers.get('Content-Type', '').startswith('application/json'):
+        with response:
+            return response.status_code, iter([extract_message_content(response.json())])
+
+    # Without an explicit charset, requests would yield undecoded bytes.
+    response.encoding = response.encoding or 'utf-8'
+
+    def _iter_chunks():
+        # The read timeout applies to the gap between chunks, so a stalled stream is still bounded.
+        with response:
+            for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                if chunk:
+                    yield chunk
+
+    return response.status_code, _iter_chunks()
+
+
 def user_role_is_staff(role):
     """
     Return whether the user role parameter represents that of a staff member.
@@ -127,10 +420,63 @@ def user_role_is_staff(role):
     return role in ('staff', 'instructor')
 
 
+_optimizely_client = None
+_optimizely_client_pid = None
+_optimizely_client_lock = threading.Lock()
+
+
+def get_optimizely_client():
+    """
+    Return the process-wide Optimizely client, creating it on first use.
+
+    If the OPTIMIZELY_FULLSTACK_DATAFILE_PATH setting is set, the client makes its decisions from that local datafile.
+    Otherwise, the client fetches the datafile of the OPTIMIZELY_FULLSTACK_SDK_KEY project, keeps it, and polls for
+    updates every OPTIMIZELY_FULLSTACK_DATAFILE_UPDATE_INTERVAL seconds in a background thread. The client is recreated
+    in forked worker processes, as the polling thread does not survive a fork.
+    """
+    global _optimizely_client, _optimizely_client_pid  # pylint: disable=global-statement
+
+    pid = os.getpid()
+    if _optimizely_client is None or _optimizely_client_pid != pid:
+        with _optimizely_client_lock:
+            if _optimizely_client is None or _optimizely_client_pid != pid:
+                datafile_path = getattr(settings, 'OPTIMIZELY_FULLSTACK_DATAFILE_PATH', None)
+                if datafile_path:
+                    with open(datafile_path, encoding='utf-8') as datafile:
+                        _optimizely_client = optimizely.Optimizely(datafile=datafile.read())
+                else:
+                    _optimizely_client = optimizely.Optimizely(
+                        config_manager=PollingConfigManager(
+                            sdk_key=settings.OPTIMIZELY_FULLSTACK_SDK_KEY,
+                            update_interval=getattr(settings, 'OPTIMIZELY_FULLSTACK_DATAFILE_UPDATE_INTERVAL', 300),
+                        ),
+                    )
+                _optimizely_client_pid = pid
+
+    return _optimizely_client
+
+
+def reset_optimizely_client():
+    """
+    Close and discard the process-wide Optimizely client, so that it is recreated with current settings.
+    """
+    global _optimizely_client, _optimizely_client_pid  # pylint: disable=global-statement
+
+    with _optimizely_client_lock:
+        if _optimizely_client is not None:
+            _optimizely_client.close()
+        _optimizely_client = None
+        _optimizely_client_pid = None
+
+
 def get_optimizely_variation(user_id, enrollment_mode):
     """
     Return whether or not optimizely experiment is enabled, and which variation a user belongs to.
 
+    The decision of a user is cached for OPTIMIZELY_DECISION_CACHE_TIMEOUT seconds, keyed by their enrollment mode and
+    language, which are the attributes the decision depends on. Decisions that Optimizely could not make, for instance
+    because the datafile has not been fetched yet, are not cached.
+
     Arguments:
     * user_id
     * enrollment_mode
@@ -141,19 +487,36 @@ def get_optimizely_variation(user_id, enrollment_mode):
         'variation_key': what variation a user is assigned to
       }
     """
-    if not getattr(settings, 'OPTIMIZELY_FULLSTACK_SDK_KEY', None):
-        enabled = False
-        variation_key = None
-    else:
-        optimizely_client = optimizely.Optimizely(sdk_key=settings.OPTIMIZELY_FULLSTACK_SDK_KEY)
-        user = optimizely_client.create_user_context(str(user_id),
-                                                     {'lms_language_preference': get_language(),
-                                                      'lms_enrollment_mode': enrollment_mode})
-        decision = user.decide(getattr(settings, 'OPTIMIZELY_LEARNING_ASSISTANT_TRIAL_EXPERIMENT_KEY', ''))
-        enabled = decision.enabled
-        variation_key = decision.variation_key
-
-    return {'enabled': enabled, 'variation_key': variation_key}
+    if not (
+        getattr(settings, 'OPTIMIZELY_FULLSTACK_SDK_KEY', None)
+        or getattr(settings, 'OPTIMIZELY_FULLSTACK_DATAFILE_PATH', None)
+    ):
+        return {'enabled': False, 'variation_key': None}
+
+    experiment_key = getattr(settings, 'OPTIMIZELY_LEARNING_ASSISTANT_TRIAL_EXPERIMENT_KEY', '')
+    language = get_language()
+    cache_key = get_cache_key(
+        resource='learning_assistant_optimizely_decision',
+        experiment_key=experiment_key,
+        user_id=user_id,
+        enrollment_mode=enrollment_mode,
+        language=language,
+    )
+    variation = cache.get(cache_key)
+
+    if variation is None:
+        user = get_optimizely_client().create_user_context(str(user_id),
+                                                           {'lms_language_preference': language,
+                                                            'lms_enrollment_mode': enrollment_mode})
+        decision = user.decide(experiment_key)
+        variation = {'enabled': decision.enabled, 'variation_key': decision.variation_key}
+
+        # The reasons of a decision are only errors, such as the datafile not being fetched yet, in which case the
+        # decision is the default one and is not cached, so that the user is decided again once the error is resolved.
+        if not decision.reasons:
+            cache.set(cache_key, variation, getattr(settings, 'OPTIMIZELY_DECISION_CACHE_TIMEOUT', 1800))
+
+    return variation
 
 
 def parse_lms_datetime(datetime_string):
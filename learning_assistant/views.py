@@ -1,13 +1,20 @@
 """
 V1 API Views.
 """
+import asyncio
+import json
 import logging
+import time
 from datetime import datetime
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.functional import cached_property
 from edx_rest_framework_extensions.auth.jwt.authentication import JwtAuthentication
 from opaque_keys import InvalidKeyError
 from opaque_keys.edx.keys import CourseKey
+from requests.exceptions import RequestException
 from rest_framework import status as http_status
 from rest_framework.authentication import SessionAuthentication
 from rest_framework.permissions import IsAuthenticated
@@ -26,23 +33,193 @@ except ImportError:
 from learning_assistant.api import (
     audit_trial_is_expired,
     get_audit_trial,
+    get_cached_eligibility,
     get_course_id,
     get_message_history,
+    get_message_history_page,
     get_or_create_audit_trial,
     learning_assistant_enabled,
     render_prompt_template,
-    save_chat_message,
+    save_chat_turn,
 )
-from learning_assistant.constants import AUDIT_TRIAL_MAX_DAYS
+from learning_assistant.constants import AUDIT_TRIAL_MAX_DAYS, MESSAGE_HISTORY_MAX_PAGE_SIZE, MESSAGE_HISTORY_PAGE_SIZE
+from learning_assistant.data import LearningAssistantEligibilityData
+from learning_assistant.instrumentation import record_timing, span
 from learning_assistant.models import LearningAssistantMessage
 from learning_assistant.platform_imports import get_cache_course_run_data
 from learning_assistant.serializers import MessageSerializer
 from learning_assistant.toggles import chat_history_enabled
-from learning_assistant.utils import extract_message_content, get_chat_response, parse_lms_datetime, user_role_is_staff
+from learning_assistant.utils import (
+    aget_chat_response,
+    extract_message_content,
+    get_chat_response,
+    get_chat_response_stream,
+    parse_lms_datetime,
+    user_role_is_staff,
+)
 
 log = logging.getLogger(__name__)
 
 
+def _format_server_sent_event(data, event=None):
+    """
+    Format data as a single server-sent event.
+    """
+    event_line = f'event: {event}\n' if event else ''
+    return f'{event_line}data: {json.dumps(data)}\n\n'
+
+
+class LearningAssistantAccess:
+    """
+    The facts that decide whether a user may use the Learning Assistant in a course, and see their message history.
+
+    Each fact is looked up the first time it is needed, and the component is memoized on the request with
+    for_request, so that a fact is never looked up twice while handling a request.
+    """
+
+    def __init__(self, user, courserun_key, course_run_id):
+        """
+        Initialize the access component.
+
+        Args:
+            user (User): the user using the Learning Assistant
+            courserun_key (CourseKey): the key of the course run
+            course_run_id (str): the ID of the course run
+        """
+        self.user = user
+        self.courserun_key = courserun_key
+        self.course_run_id = course_run_id
+
+    @classmethod
+    def for_request(cls, request, courserun_key, course_run_id):
+        """
+        Return the access component of the user of the request in the course run, creating it on first use.
+        """
+        accesses = request.__dict__.setdefault('_learning_assistant_access', {})
+        if course_run_id not in accesses:
+            accesses[course_run_id] = cls(request.user, courserun_key, course_run_id)
+        return accesses[course_run_id]
+
+    @cached_property
+    def valid_dates(self):
+        """
+        Whether the current date is between the start and end dates of the course run.
+        """
+        course_data = get_cache_course_run_data(self.course_run_id, ['start', 'end'])
+        today = datetime.now()
+        course_start = parse_lms_datetime(course_data.get('start', None))
+        course_end = parse_lms_datetime(course_data.get('end', None))
+        return (
+            (course_start <= today if course_start else True)
+            and (course_end >= today if course_end else True)
+        )
+
+    @cached_property
+    def enabled(self):
+        """
+        Whether the Learning Assistant is enabled in the course run, and the course run is running.
+        """
+        return self.valid_dates and learning_assistant_enabled(self.courserun_key)
+
+    @cached_property
+    def eligibility(self):
+        """
+        The role and enrollment of the user in the course run, which are cached for a short time between requests.
+        """
+        return get_cached_eligibility(self.user.id, self.courserun_key, self._get_eligibility)
+
+    def _get_eligibility(self):
+        """
+        Look up the role and enrollment of the user in the course run.
+        """
+        user_role = get_user_role(self.user, self.courserun_key)
+        enrollment = CourseEnrollment.get_enrollment(self.user, self.courserun_key)
+        return LearningAssistantEligibilityData(
+            is_staff=user_role_is_staff(user_role),
+            enrollment_mode=enrollment.mode if enrollment else None,
+            upgrade_deadline=enrollment.upgrade_deadline if enrollment else None,
+        )
+
+    @property
+    def is_staff(self):
+        """
+        Whether the user is a member of the course staff.
+        """
+        return self.eligibility.is_staff
+
+    @property
+    def enrollment_mode(self):
+        """
+        The mode of the enrollment of the user in the course run, or None.
+        """
+        return self.eligibility.enrollment_mode
+
+    @property
+    def has_full_access_mode(self):
+        """
+        Whether the user is enrolled in a mode that gives full access to the Learning Assistant.
+        """
+        # Here we include CREDIT_MODES and NO_ID_PROFESSIONAL_MODE, as CourseMode.VERIFIED_MODES on its own
+        # doesn't match what we count as "verified modes" in the frontend component.
+        return self.enrollment_mode in (
+            CourseMode.VERIFIED_MODES +
+            CourseMode.CREDIT_MODES +
+            [CourseMode.NO_ID_PROFESSIONAL_MODE]
+        )
+
+    @property
+    def has_trial_access_mode(self):
+        """
+        Whether the user is enrolled in a mode that gives access to the Learning Assistant during an audit trial.
+        """
+        return self.enrollment_mode in CourseMode.UPSELL_TO_VERIFIED_MODES  # AUDIT, HONOR
+
+    @cached_property
+    def audit_trial(self):
+        """
+        The audit trial of the user, or None. Note that looking it up does not create an audit trial.
+        """
+        return get_audit_trial(self.user)
+
+    def get_or_create_audit_trial(self):
+        """
+        Return the audit trial of the user, creating it if it does not exist.
+        """
+        if self.audit_trial is None:
+            # Replace the cached value of the audit_trial property.
+            self.__dict__['audit_trial'] = get_or_create_audit_trial(self.user)
+        return self.audit_trial
+
+    @property
+    def audit_trial_is_expired(self):
+        """
+        Whether the audit trial of the user has expired.
+        """
+        # The eligibility holds the upgrade deadline of the enrollment, which is all that is needed of it.
+        return audit_trial_is_expired(self.eligibility, self.audit_trial)
+
+    @cached_property
+    def has_message_history_access(self):
+        """
+        Whether the user may see their message history.
+
+        If user does not have a verified enrollment record or is does not have an active audit trial, or is not staff,
+        then they should not have access to the message history. AUDIT and HONOR learners see their message history
+        if their trial is not expired.
+        """
+        has_trial_access = (
+            self.valid_dates
+            and self.has_trial_access_mode
+            and self.audit_trial
+            and not self.audit_trial_is_expired
+        )
+
+        return bool(
+            (self.has_full_access_mode or has_trial_access or self.is_staff)
+            and chat_history_enabled(self.courserun_key)
+        )
+
+
 class CourseChatView(APIView):
     """
     View to retrieve chat response.
@@ -54,6 +231,12 @@ class CourseChatView(APIView):
     Parameters:
         * course_run_id: the ID of the course
 
+    Query Parameters:
+        * unit_id: the ID of the unit the learner is viewing
+        * stream: if "true", the response is streamed back as server-sent events, each containing a chunk of the
+                  completion in the format {"content": "..."}, followed by a final "done" event, or by an "error"
+                  event in the format {"detail": "..."} if the stream is interrupted
+
     Responses:
         * 200: OK
         * 400: Malformed Request - Course ID is not a valid course ID.
@@ -64,9 +247,90 @@ class CourseChatView(APIView):
     authentication_classes = (SessionAuthentication, JwtAuthentication,)
     permission_classes = (IsAuthenticated,)
 
-    def _get_next_message(self, request, courserun_key, course_run_id):
+    def _stream_next_message(self, courserun_key, user, prompt_template, message_list):
         """
-        Generate the next message to be returned by the learning assistant.
+        Stream the next message to be returned by the learning assistant as server-sent events.
+
+        The chat turn is saved once the completion has been fully streamed. If the stream is interrupted, an "error"
+        event is sent instead of the "done" event, and the user message is saved with the part of the completion that
+        was streamed, if any.
+        """
+        start = time.perf_counter()
+        status_code, chunks = get_chat_response_stream(prompt_template, message_list)
+
+        if status_code != http_status.HTTP_200_OK:
+            self._save_chat_turn(courserun_key, user, message_list)
+            return Response(status=status_code, data=chunks)
+
+        def event_stream():
+            content = []
+            try:
+                for chunk in chunks:
+                    content.append(chunk)
+                    yield _format_server_sent_event({'content': chunk})
+            except RequestException as e:
+                log.error(
+                    'The chat completion stream was interrupted. %(error)s',
+                    {'error': str(e)}
+                )
+                record_timing('chat_completion_stream', time.perf_counter() - start, error=type(e).__name__)
+                self._save_chat_turn(courserun_key, user, message_list, ''.join(content) or None)
+                yield _format_server_sent_event(
+                    {'detail': 'The chat completion stream was interrupted.'}, event='error'
+                )
+                return
+
+            record_timing('chat_completion_stream', time.perf_counter() - start)
+            self._save_chat_turn(courserun_key, user, message_list, ''.join(content))
+            yield _format_server_sent_event({}, event='done')
+
+        response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+        # Prevent intermediate proxies from buffering the stream or caching it.
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def _check_access(self, request, courserun_key, course_run_id):
+        """
+        Return a 403 response if the user may not use the learning assistant in the course, or None if they may.
+        """
+        access = LearningAssistantAccess.for_request(request, courserun_key, course_run_id)
+
+        if not access.enabled:
+            return Response(
+                status=http_status.HTTP_403_FORBIDDEN,
+                data={'detail': 'Learning assistant not enabled for course.'}
+            )
+
+        # If the user is in a verified course mode or is staff, they have access
+        if access.has_full_access_mode or access.is_staff:
+            return None
+
+        # If user has an audit enrollment record, get or create their trial. If the trial is not expired, they have
+        # access. Otherwise, return 403
+        elif access.has_trial_access_mode:
+            access.get_or_create_audit_trial()
+            if access.audit_trial_is_expired:
+                return Response(
+                    status=http_status.HTTP_403_FORBIDDEN,
+                    data={'detail': 'The audit trial for this user has expired.'}
+                )
+            else:
+                return None
+
+        # If user has a course mode that is not verified & not meant to access to the learning assistant, return 403
+        # This covers the other course modes: UNPAID_EXECUTIVE_EDUCATION & UNPAID_BOOTCAMP
+        else:
+            return Response(
+                status=http_status.HTTP_403_FORBIDDEN,
+                data={'detail': 'Must be staff or have valid enrollment.'}
+            )
+
+    def _prepare_next_message(self, request, course_run_id):
+        """
+        Validate the message list and render the prompt template for the next message.
+
+        Returns a tuple of an error response, if the message list is not valid, and the rendered prompt template.
         """
         message_list = request.data
 
@@ -76,12 +340,7 @@ class CourseChatView(APIView):
             return Response(
                 status=http_status.HTTP_400_BAD_REQUEST,
                 data={'detail': "Expects user role on last message."}
-            )
-
-        user_id = request.user.id
-
-        if chat_history_enabled(courserun_key):
-            save_chat_message(courserun_key, user_id, LearningAssistantMessage.USER_ROLE, new_user_message['content'])
+            ), None
 
         serializer = MessageSerializer(data=message_list, many=True)
 
@@ -91,7 +350,7 @@ class CourseChatView(APIView):
             return Response(
                 status=http_status.HTTP_400_BAD_REQUEST,
                 data={'detail': 'Invalid data', 'errors': serializer.errors}
-            )
+            ), None
 
         log.info(
             'Attempting to retrieve chat response for user_id=%(user_id)s in course_id=%(course_id)s',
@@ -101,18 +360,46 @@ class CourseChatView(APIView):
             }
         )
 
-        course_id = get_course_id(course_run_id)
+        with span('get_course_id'):
+            course_id = get_course_id(course_run_id)
         template_string = getattr(settings, 'LEARNING_ASSISTANT_PROMPT_TEMPLATE', '')
         unit_id = request.query_params.get('unit_id')
 
-        prompt_template = render_prompt_template(
-            request, request.user.id, course_run_id, unit_id, course_id, template_string
-        )
-        status_code, message = get_chat_response(prompt_template, message_list)
+        with span('render_prompt_template'):
+            prompt_template = render_prompt_template(
+                request, request.user.id, course_run_id, unit_id, course_id, template_string
+            )
 
+        return None, prompt_template
+
+    def _save_chat_turn(self, courserun_key, user, message_list, message=None):
+        """
+        Save the new user message and the assistant message, if chat history is enabled.
+
+        The assistant message is the one returned by the chat completion endpoint. Both messages are written together
+        once the chat completion has returned. If there is no assistant message, only the user message is saved.
+        """
         if chat_history_enabled(courserun_key):
-            content = extract_message_content(message)
-            save_chat_message(courserun_key, user_id, LearningAssistantMessage.ASSISTANT_ROLE, content)
+            content = extract_message_content(message) if message is not None else None
+            with span('save_chat_turn'):
+                save_chat_turn(courserun_key, user, message_list[-1]['content'], content)
+
+    def _get_next_message(self, request, courserun_key, course_run_id):
+        """
+        Generate the next message to be returned by the learning assistant.
+        """
+        error_response, prompt_template = self._prepare_next_message(request, course_run_id)
+        if error_response is not None:
+            return error_response
+
+        message_list = request.data
+
+        if request.query_params.get('stream', '').lower() == 'true':
+            return self._stream_next_message(courserun_key, request.user, prompt_template, message_list)
+
+        status_code, message = get_chat_response(prompt_template, message_list)
+
+        self._save_chat_turn(courserun_key, request.user, message_list, message)
 
         return Response(status=status_code, data=message)
 
@@ -135,62 +422,89 @@ class CourseChatView(APIView):
                 data={'detail': 'Course ID is not a valid course ID.'}
             )
 
-        course_data = get_cache_course_run_data(course_run_id, ['start', 'end'])
-        today = datetime.now()
+        with span('check_access'):
+            error_response = self._check_access(request, courserun_key, course_run_id)
+        if error_response is not None:
+            return error_response
 
-        course_start = parse_lms_datetime(course_data.get('start', None))
-        course_end = parse_lms_datetime(course_data.get('end', None))
+        return self._get_next_message(request, courserun_key, course_run_id)
 
-        valid_dates = (
-            (course_start <= today if course_start else True)
-            and (course_end >= today if course_end else True)
-        )
 
-        if (
-            not valid_dates
-            or not learning_assistant_enabled(courserun_key)
-        ):
-            return Response(
-                status=http_status.HTTP_403_FORBIDDEN,
-                data={'detail': 'Learning assistant not enabled for course.'}
-            )
+class AsyncCourseChatView(CourseChatView):
+    """
+    Asynchronous variant of CourseChatView, for deployments served by ASGI.
 
-        # If user does not have a verified enrollment record, or is not staff, they should not have full access
-        user_role = get_user_role(request.user, courserun_key)
-        enrollment_object = CourseEnrollment.get_enrollment(request.user, courserun_key)
-        enrollment_mode = enrollment_object.mode if enrollment_object else None
-
-        # If the user is in a verified course mode or is staff, return the next message
-        if (
-            # Here we include CREDIT_MODES and NO_ID_PROFESSIONAL_MODE, as CourseMode.VERIFIED_MODES on its own
-            # doesn't match what we count as "verified modes" in the frontend component.
-            enrollment_mode in CourseMode.VERIFIED_MODES + CourseMode.CREDIT_MODES
-            + [CourseMode.NO_ID_PROFESSIONAL_MODE]
-            or user_role_is_staff(user_role)
-        ):
-            return self._get_next_message(request, courserun_key, course_run_id)
-
-        # If user has an audit enrollment record, get or create their trial. If the trial is not expired, return the
-        # next message. Otherwise, return 403
-        elif enrollment_mode in CourseMode.UPSELL_TO_VERIFIED_MODES:  # AUDIT, HONOR
-            audit_trial = get_or_create_audit_trial(request.user)
-            is_user_audit_trial_expired = audit_trial_is_expired(enrollment_object, audit_trial)
-            if is_user_audit_trial_expired:
-                return Response(
-                    status=http_status.HTTP_403_FORBIDDEN,
-                    data={'detail': 'The audit trial for this user has expired.'}
-                )
+    The request to the chat completion endpoint is awaited instead of blocking a worker for its duration, so that one
+    worker can serve many chat turns at once. Access checks, prompt rendering and chat history writes still query the
+    database and the platform, so they are run in a worker thread. This view does not stream responses; the stream
+    query parameter is ignored.
+
+    This view is served in place of CourseChatView when the LEARNING_ASSISTANT_ASYNC_CHAT_VIEW setting is True.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):  # pylint: disable=invalid-overridden-method
+        """
+        Asynchronous version of APIView.dispatch.
+        """
+        # pylint: disable=attribute-defined-outside-init
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            # Authentication and permission checks may query the database.
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
             else:
-                return self._get_next_message(request, courserun_key, course_run_id)
+                handler = self.http_method_not_allowed
 
-        # If user has a course mode that is not verified & not meant to access to the learning assistant, return 403
-        # This covers the other course modes: UNPAID_EXECUTIVE_EDUCATION & UNPAID_BOOTCAMP
-        else:
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def post(self, request, course_run_id):  # pylint: disable=invalid-overridden-method
+        """
+        Given a course run ID, retrieve a chat response for that course.
+
+        Expected POST data: {
+            [
+                {'role': 'user', 'content': 'What is 2+2?'},
+                {'role': 'assistant', 'content': '4'}
+            ]
+        }
+        """
+        try:
+            courserun_key = CourseKey.from_string(course_run_id)
+        except InvalidKeyError:
             return Response(
-                status=http_status.HTTP_403_FORBIDDEN,
-                data={'detail': 'Must be staff or have valid enrollment.'}
+                status=http_status.HTTP_400_BAD_REQUEST,
+                data={'detail': 'Course ID is not a valid course ID.'}
             )
 
+        with span('check_access'):
+            error_response = await sync_to_async(self._check_access)(request, courserun_key, course_run_id)
+        if error_response is not None:
+            return error_response
+
+        error_response, prompt_template = await sync_to_async(self._prepare_next_message)(request, course_run_id)
+        if error_response is not None:
+            return error_response
+
+        status_code, message = await aget_chat_response(prompt_template, request.data)
+
+        await sync_to_async(self._save_chat_turn)(courserun_key, request.user, request.data, message)
+
+        return Response(status=status_code, data=message)
+
 
 class LearningAssistantChatSummaryView(APIView):
     """
@@ -259,69 +573,28 @@ class LearningAssistantChatSummaryView(APIView):
             'audit_trial_length_days': 0,
         }
         user = request.user
-
-        course_data = get_cache_course_run_data(course_run_id, ['start', 'end'])
-        today = datetime.now()
-        course_start = parse_lms_datetime(course_data.get('start', None))
-        course_end = parse_lms_datetime(course_data.get('end', None))
-        valid_dates = (
-            (course_start <= today if course_start else True)
-            and (course_end >= today if course_end else True)
-        )
+        access = LearningAssistantAccess.for_request(request, courserun_key, course_run_id)
 
         # Get whether the Learning Assistant is enabled.
-        data['enabled'] = learning_assistant_enabled(courserun_key) and valid_dates
+        data['enabled'] = access.enabled
 
         if not data['enabled']:
             return Response(status=http_status.HTTP_200_OK, data=data)
 
         # Get message history.
-        # If user does not have a verified enrollment record or is does not have an active audit trial, or is not staff,
-        # then they should not have access to the message history.
-        user_role = get_user_role(user, courserun_key)
-        enrollment_object = CourseEnrollment.get_enrollment(request.user, courserun_key)
-        enrollment_mode = enrollment_object.mode if enrollment_object else None
-
-        # Here we include CREDIT_MODES and NO_ID_PROFESSIONAL_MODE, as CourseMode.VERIFIED_MODES on its own
-        # doesn't match what we count as "verified modes" in the frontend component. We also include AUDIT and HONOR to
-        # ensure learners with audit trials see message history if the trial is non-expired.
-        valid_full_access_modes = (
-            CourseMode.VERIFIED_MODES +
-            CourseMode.CREDIT_MODES +
-            [CourseMode.NO_ID_PROFESSIONAL_MODE]
-        )
-        valid_trial_access_modes = CourseMode.UPSELL_TO_VERIFIED_MODES
-
-        # Get audit trial. Note that we do not want to create an audit trial when calling this endpoint.
-        audit_trial = get_audit_trial(request.user)
-
         # If the learner doesn't meet criteria to use the Learning Assistant, or if the chat history is disabled, we
         # return no messages in the response.
         message_history_data = []
 
-        has_trial_access = (
-            valid_dates
-            and enrollment_mode in valid_trial_access_modes
-            and audit_trial
-            and not audit_trial_is_expired(enrollment_object, audit_trial)
-        )
-
-        if (
-            (
-                enrollment_mode in valid_full_access_modes
-                or has_trial_access
-                or user_role_is_staff(user_role)
-            )
-            and chat_history_enabled(courserun_key)
-        ):
+        if access.has_message_history_access:
             message_count = int(request.GET.get('message_count', 50))
             message_history = get_message_history(courserun_key, user, message_count)
             message_history_data = MessageSerializer(message_history, many=True).data
 
         data['message_history'] = message_history_data
 
-        # Get audit trial.
-        trial = get_audit_trial(user)
+        # Get audit trial. Note that we do not want to create an audit trial when calling this endpoint.
+        trial = access.audit_trial
 
         trial_data = {}
         if trial:
@@ -334,3 +607,97 @@ class LearningAssistantChatSummaryView(APIView):
         data['audit_trial_length_days'] = AUDIT_TRIAL_MAX_DAYS
 
         return Response(status=http_status.HTTP_200_OK, data=data)
+
+
+class LearningAssistantMessageHistoryView(APIView):
+    """
+    View to retrieve a learner's message history with the Learning Assistant, one page at a time.
+
+    Pages are returned from the most recent messages backwards, so that older messages can be loaded as the learner
+    scrolls up the chat.
+
+    Accepts: [GET]
+
+    Path: /learning_assistant/v1/course_id/{course_run_id}/history
+
+    Parameters:
+        * course_run_id: the ID of the course
+        * page_size: the number of messages to return, capped by the server
+        * cursor: the next_cursor value of the previous page, or nothing for the most recent messages
+
+    Responses:
+        * 200: OK
+        * 400: Malformed Request - Course ID is not a valid course ID, or the page size or the cursor is invalid.
+    """
+
+    authentication_classes = (SessionAuthentication, JwtAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, course_run_id):
+        """
+        Given a course run ID, return a page of the message history of the user.
+
+        The response will be in the following format. The next_cursor is null when there are no older messages.
+
+        {
+            "message_history": [
+                {
+                    "role": "user",
+                    "content": "test message from user",
+                    "timestamp": "2024-12-02T15:04:17.495928Z"
+                },
+                {
+                    "role": "assistant",
+                    "content": "test message from assistant",
+                    "timestamp": "2024-12-02T15:04:40.084584Z"
+                }
+            ],
+            "next_cursor": "MjAyNC0xMi0wMlQxNTowNDoxNy40OTU5MjgrMDA6MDB8MTI="
+        }
+        """
+        try:
+            courserun_key = CourseKey.from_string(course_run_id)
+        except InvalidKeyError:
+            return Response(
+                status=http_status.HTTP_400_BAD_REQUEST,
+                data={'detail': 'Course ID is not a valid course ID.'}
+            )
+
+        max_page_size = getattr(
+            settings, 'LEARNING_ASSISTANT_MESSAGE_HISTORY_MAX_PAGE_SIZE', MESSAGE_HISTORY_MAX_PAGE_SIZE
+        )
+        page_size = getattr(settings, 'LEARNING_ASSISTANT_MESSAGE_HISTORY_PAGE_SIZE', MESSAGE_HISTORY_PAGE_SIZE)
+        try:
+            page_size = int(request.GET.get('page_size', page_size))
+        except ValueError:
+            page_size = 0
+        if page_size < 1:
+            return Response(
+                status=http_status.HTTP_400_BAD_REQUEST,
+                data={'detail': 'Page size must be a positive integer.'}
+            )
+        page_size = min(page_size, max_page_size)
+
+        data = {
+            'message_history': [],
+            'next_cursor': None,
+        }
+
+        access = LearningAssistantAccess.for_request(request, courserun_key, course_run_id)
+        if not (access.enabled and access.has_message_history_access):
+            return Response(status=http_status.HTTP_200_OK, data=data)
+
+        try:
+            message_history, next_cursor = get_message_history_page(
+                courserun_key, request.user, page_size, request.GET.get('cursor')
+            )
+        except ValueError:
+            return Response(
+                status=http_status.HTTP_400_BAD_REQUEST,
+                data={'detail': 'Cursor is not a valid message history cursor.'}
+            )
+
+        data['message_history'] = MessageSerializer(message_history, many=True).data
+        data['next_cursor'] = next_cursor
+
+        return Response(status=http_status.HTTP_200_OK, data=data)
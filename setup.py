@@ -146,6 +146,9 @@ setup(
     ),
     include_package_data=True,
     install_requires=load_requirements('requirements/base.in'),
+    extras_require={
+        'async': load_requirements('requirements/async.in'),
+    },
     python_requires=">=3.8",
     license="AGPL 3.0",
     zip_safe=False,
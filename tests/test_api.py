@@ -4,6 +4,8 @@ Test cases for the learning-assistant api module.
 import itertools
 import random
 import string
+import threading
+import time
 from datetime import datetime, timedelta
 from unittest.mock import MagicMock, patch
 
@@ -14,31 +16,52 @@ from django.core.cache import cache
 from django.test import TestCase, override_settings
 from django.utils import timezone
 from freezegun import freeze_time
+from jinja2.exceptions import SecurityError
 from opaque_keys import InvalidKeyError
 from opaque_keys.edx.keys import CourseKey, UsageKey
 
 from learning_assistant.api import (
+    _block_varies_by_user,
+    _compiled_prompt_templates,
     _extract_block_contents,
     _get_children_contents,
     _leaf_filter,
+    _prompt_template_environment,
+    _shared_block_content_cache_key,
     audit_trial_is_expired,
+    decode_message_history_cursor,
+    encode_message_history_cursor,
+    extract_course_unit_contents,
     get_audit_trial,
     get_audit_trial_expiration_date_from_start_date,
     get_block_content,
+    get_cached_eligibility,
+    get_compiled_prompt_template,
+    get_extracted_unit_content,
     get_message_history,
+    get_message_history_page,
     get_or_create_audit_trial,
+    invalidate_eligibility_cache,
     learning_assistant_available,
     learning_assistant_enabled,
+    learning_assistant_enabled_many,
     render_prompt_template,
-    save_chat_message,
+    reset_content_extraction_executor,
+    save_chat_turn,
     set_learning_assistant_enabled,
 )
-from learning_assistant.data import LearningAssistantAuditTrialData, LearningAssistantCourseEnabledData
+from learning_assistant.data import (
+    LearningAssistantAuditTrialData,
+    LearningAssistantCourseEnabledData,
+    LearningAssistantEligibilityData,
+)
+from learning_assistant.instrumentation import get_instrumentation_sinks
 from learning_assistant.models import (
     LearningAssistantAuditTrial,
     LearningAssistantCourseEnabled,
     LearningAssistantMessage,
 )
+from learning_assistant.token_counters import get_token_counter
 
 fake_transcript = 'This is the text version from the transcript'
 User = get_user_model()
@@ -54,6 +77,7 @@ class FakeChild:
         self.edited_on = 'edited-on-{}'.format(test_id)
         self.scope_ids = lambda: None
         self.scope_ids.def_id = 'def-id-{}'.format(test_id)
+        self.scope_ids.usage_id = 'usage-id-{}'.format(test_id)
         self.html = test_html
         self.transcript = fake_transcript
 
@@ -76,6 +100,17 @@ class FakeBlock:
         return self.children
 
 
+class FakeUnit(FakeBlock):
+    """Fake published unit for testing"""
+
+    def __init__(self, usage_key, subtree_edited_on):
+        super().__init__([])
+        self.scope_ids.usage_id = usage_key
+        self.subtree_edited_on = subtree_edited_on
+        self.category = 'vertical'
+        self.start = None
+
+
 @ddt.ddt
 class GetBlockContentAPITests(TestCase):
     """
@@ -149,7 +184,7 @@ class GetBlockContentAPITests(TestCase):
         mock_html.return_value = block_content
         mock_transcript.return_value = block_content
 
-        length, items = _get_children_contents(self.block)
+        length, items, partial = _get_children_contents(self.block)
 
         expected_items = [
             {'content_type': 'TEXT', 'content_text': block_content},
@@ -162,15 +197,107 @@ class GetBlockContentAPITests(TestCase):
         self.assertEqual(length, len(block_content) * 3)
         self.assertEqual(len(items), 3)
         self.assertEqual(items, expected_items)
+        self.assertFalse(partial)
+
+    @ddt.data(
+        (4, True),
+        (1, False),
+    )
+    @ddt.unpack
+    @patch('learning_assistant.api.traverse_block_pre_order')
+    @patch('learning_assistant.api.get_text_transcript')
+    def test_get_children_contents_transcripts_concurrent(
+        self, max_workers, expected_concurrent, mock_transcript, mock_traversal
+    ):
+        children = [FakeChild('video', '01'), FakeChild('html', '02'), FakeChild('video', '03')]
+        mock_traversal.return_value = children
+        transcript_threads = []
+
+        def get_transcript(block):
+            transcript_threads.append(threading.current_thread())
+            return f'Transcript of {block.scope_ids.usage_id}'
+
+        mock_transcript.side_effect = get_transcript
+
+        reset_content_extraction_executor()
+        with override_settings(LEARNING_ASSISTANT_CONTENT_EXTRACTION_MAX_WORKERS=max_workers):
+            _, items, partial = _get_children_contents(self.block)
+        reset_content_extraction_executor()
+
+        # The contents are returned in pre-order, regardless of when each transcript was fetched.
+        self.assertEqual([item['content_text'] for item in items], [
+            'Transcript of usage-id-01',
+            'This is a test',
+            'Transcript of usage-id-03',
+        ])
+        self.assertFalse(partial)
+        self.assertEqual(
+            all(thread is not threading.current_thread() for thread in transcript_threads), expected_concurrent
+        )
+
+    @override_settings(LEARNING_ASSISTANT_CONTENT_EXTRACTION_TIMEOUT=0.01)
+    @patch('learning_assistant.api.traverse_block_pre_order')
+    @patch('learning_assistant.api.get_text_transcript')
+    def test_get_children_contents_transcript_timeout(self, mock_transcript, mock_traversal):
+        mock_traversal.return_value = [FakeChild('video', '01'), FakeChild('video', '02')]
+        release = threading.Event()
+
+        def get_transcript(block):
+            if block.scope_ids.usage_id == 'usage-id-01':
+                release.wait()
+            return f'Transcript of {block.scope_ids.usage_id}'
+
+        mock_transcript.side_effect = get_transcript
+
+        reset_content_extraction_executor()
+        try:
+            with self.assertLogs('learning_assistant.api', level='WARNING'):
+                length, items, partial = _get_children_contents(self.block)
+        finally:
+            release.set()
+            reset_content_extraction_executor()
+
+        # The transcript that timed out is left out.
+        self.assertEqual(items, [{'content_type': 'VIDEO', 'content_text': 'Transcript of usage-id-02'}])
+        self.assertEqual(length, len('Transcript of usage-id-02'))
+        self.assertTrue(partial)
+
+    @override_settings(
+        LEARNING_ASSISTANT_CONTENT_EXTRACTION_TIMEOUT=0.2,
+        LEARNING_ASSISTANT_CONTENT_EXTRACTION_MAX_WORKERS=2,
+    )
+    @patch('learning_assistant.api.traverse_block_pre_order')
+    @patch('learning_assistant.api.get_text_transcript')
+    def test_get_children_contents_transcripts_stalled(self, mock_transcript, mock_traversal):
+        mock_traversal.return_value = [FakeChild('video', f'0{i}') for i in range(4)]
+        release = threading.Event()
+        mock_transcript.side_effect = lambda block: release.wait()
+
+        reset_content_extraction_executor()
+        try:
+            with self.assertLogs('learning_assistant.api', level='WARNING'):
+                start = time.monotonic()
+                length, items, partial = _get_children_contents(self.block)
+                elapsed = time.monotonic() - start
+        finally:
+            release.set()
+            reset_content_extraction_executor()
+
+        # All the transcripts share a single timeout, instead of each waiting for the full timeout in turn.
+        self.assertLess(elapsed, 0.4)
+        self.assertEqual((length, items, partial), (0, [], True))
+        # The fetches that were still queued when the time ran out were cancelled, and never started.
+        self.assertEqual(mock_transcript.call_count, 2)
 
     @patch('learning_assistant.api.get_single_block')
     @patch('learning_assistant.api._get_children_contents')
-    def test_get_block_content(self, mock_get_children_contents, mock_get_single_block):
+    @patch('learning_assistant.api._block_varies_by_user', return_value=False)
+    def test_get_block_content(self, _mock_varies_by_user, mock_get_children_contents, mock_get_single_block):
         mock_get_single_block.return_value = self.block
 
         block_content = 'This is the block content'
         content_items = [{'content_type': 'TEXT', 'content_text': block_content}]
-        mock_get_children_contents.return_value = (len(block_content), content_items)
+        mock_get_children_contents.return_value = (len(block_content), content_items, False)
 
         # mock arguments that are passed through to `get_single_block` function. the value of these
         # args does not matter for this test right now, as the `get_single_block` function is entirely mocked.
@@ -196,6 +323,97 @@ class GetBlockContentAPITests(TestCase):
         self.assertEqual(length, len(block_content))
         self.assertEqual(items, content_items)
 
+    @patch('learning_assistant.api.get_single_block')
+    @patch('learning_assistant.api._get_children_contents')
+    @patch('learning_assistant.api._block_varies_by_user', return_value=False)
+    @override_settings(LEARNING_ASSISTANT_INSTRUMENTATION_SINKS=['learning_assistant.instrumentation.MemorySink'])
+    def test_get_block_content_instrumented(
+        self, _mock_varies_by_user, mock_get_children_contents, mock_get_single_block
+    ):
+        mock_get_single_block.return_value = self.block
+        mock_get_children_contents.return_value = (0, [], False)
+        sink = get_instrumentation_sinks()[0]
+        sink.clear()
+        unit_usage_key = 'block-v1:edX+A+B+type@vertical+block@verticalD'
+
+        get_block_content(MagicMock(), 1, self.course_run_id, unit_usage_key)
+        get_block_content(MagicMock(), 1, self.course_run_id, unit_usage_key)
+
+        self.assertEqual(
+            [(stage, tags) for stage, _, tags in sink.records],
+            [('get_block_content', {'cache': 'miss'}), ('get_block_content', {'cache': 'hit'})],
+        )
+
+    @ddt.data(
+        (False, True, False),
+        (True, True, True),
+        (False, False, True),
+    )
+    @ddt.unpack
+    @patch('learning_assistant.api.get_single_block')
+    @patch('learning_assistant.api._get_children_contents')
+    @patch('learning_assistant.api._block_varies_by_user')
+    def test_get_block_content_cache_per_user(
+        self, varies_by_user, shared_cache_setting, expected_per_user, mock_varies_by_user,
+        mock_get_children_contents, mock_get_single_block
+    ):
+        mock_varies_by_user.return_value = varies_by_user
+        mock_get_single_block.return_value = self.block
+        content_items = [{'content_type': 'TEXT', 'content_text': 'This is the block content'}]
+        mock_get_children_contents.return_value = (25, content_items, False)
+        unit_usage_key = 'block-v1:edX+A+B+type@vertical+block@verticalD'
+
+        with override_settings(LEARNING_ASSISTANT_SHARED_BLOCK_CONTENT_CACHE=shared_cache_setting):
+            for user_id in (1, 2, 1):
+                length, items = get_block_content(MagicMock(), user_id, self.course_run_id, unit_usage_key)
+                self.assertEqual((length, items), (25, content_items))
+
+        # The content is loaded once for each user if it is cached per user, and only once otherwise.
+        expected_call_count = 2 if expected_per_user else 1
+        self.assertEqual(mock_get_children_contents.call_count, expected_call_count)
+
+    @patch('learning_assistant.api.get_extracted_unit_content')
+    @patch('learning_assistant.api.get_single_block')
+    @patch('learning_assistant.api._get_children_contents')
+    @patch('learning_assistant.api._block_varies_by_user', return_value=False)
+    @override_settings(LEARNING_ASSISTANT_SHARED_BLOCK_CONTENT_CACHE=False)
+    def test_get_block_content_shared_content_not_read(
+        self, _mock_varies_by_user, mock_get_children_contents, mock_get_single_block, mock_get_extracted_unit_content
+    ):
+        mock_get_single_block.return_value = self.block
+        mock_get_children_contents.return_value = (3, [], False)
+        unit_usage_key = 'block-v1:edX+A+B+type@vertical+block@verticalD'
+        cache.set(_shared_block_content_cache_key(self.course_run_id, unit_usage_key), {
+            'content_length': 24, 'content_items': [{'content_type': 'TEXT', 'content_text': 'Shared content'}],
+        })
+
+        # Neither the shared cache nor the extracted content is read, so the unit is loaded with the access checks of
+        # the platform.
+        self.assertEqual(get_block_content(MagicMock(), 1, self.course_run_id, unit_usage_key), (3, []))
+        mock_get_single_block.assert_called_once()
+        mock_get_extracted_unit_content.assert_not_called()
+
+    @patch('learning_assistant.api.get_single_block')
+    @patch('learning_assistant.api._get_children_contents')
+    @patch('learning_assistant.api._block_varies_by_user', return_value=False)
+    @patch('learning_assistant.api.cache.set')
+    def test_get_block_content_partial_cached_per_user(
+        self, mock_cache_set, _mock_varies_by_user, mock_get_children_contents, mock_get_single_block
+    ):
+        mock_get_single_block.return_value = self.block
+        content_items = [{'content_type': 'TEXT', 'content_text': 'This is the block content'}]
+        mock_get_children_contents.return_value = (25, content_items, True)
+        unit_usage_key = 'block-v1:edX+A+B+type@vertical+block@verticalD'
+
+        with override_settings(LEARNING_ASSISTANT_PARTIAL_CONTENT_CACHE_TIMEOUT=5):
+            length, items = get_block_content(MagicMock(), 1, self.course_run_id, unit_usage_key)
+
+        self.assertEqual((length, items), (25, content_items))
+        cache_key, cache_data, cache_timeout = mock_cache_set.call_args.args
+        self.assertNotEqual(cache_key, _shared_block_content_cache_key(self.course_run_id, unit_usage_key))
+        self.assertEqual(cache_data, {'content_length': 25, 'content_items': content_items})
+        self.assertEqual(cache_timeout, 5)
+
     @ddt.data(
         'This is content.',
         ''
@@ -284,32 +502,445 @@ class GetBlockContentAPITests(TestCase):
         self.assertIn(str(skills_content), prompt_text)
         self.assertIn(title, prompt_text)
 
+    @ddt.data(
+        (None, ['Hello world, this is the unit content.', 'Second item text.']),
+        (3, ['Hello world,']),
+        (11, ['Hello world, this is the unit content.', 'Second item']),
+    )
+    @ddt.unpack
+    @patch('learning_assistant.api.get_cache_course_data')
+    @patch('learning_assistant.api.get_block_content')
+    def test_render_prompt_template_trim_unit_content_tokens(
+        self, max_tokens, expected_texts, mock_get_content, mock_cache
+    ):
+        mock_get_content.return_value = (55, self._content_items())
+        mock_cache.return_value = {'skill_names': ['skills'], 'title': 'title'}
+
+        with override_settings(
+            CHAT_COMPLETION_TOKEN_COUNTER='learning_assistant.token_counters.RegexTokenCounter',
+            CHAT_COMPLETION_UNIT_CONTENT_MAX_TOKENS=max_tokens,
+        ):
+            prompt_text = self._render_content_texts()
+
+        self.assertEqual(prompt_text, ''.join(f'[{text}]' for text in expected_texts))
+
+    @ddt.data(
+        ('learning_assistant.token_counters.EstimatedTokenCounter', 5),
+        ('learning_assistant.token_counters.EstimatedTokenCounter', 12),
+        ('learning_assistant.token_counters.RegexTokenCounter', 5),
+        ('learning_assistant.token_counters.RegexTokenCounter', 12),
+    )
+    @ddt.unpack
+    @patch('learning_assistant.api.get_cache_course_data')
+    @patch('learning_assistant.api.get_block_content')
+    def test_render_prompt_template_trim_unit_content_tokens_counters(
+        self, token_counter, max_tokens, mock_get_content, mock_cache
+    ):
+        content_items = self._content_items()
+        mock_get_content.return_value = (55, content_items)
+        mock_cache.return_value = {'skill_names': ['skills'], 'title': 'title'}
+
+        with override_settings(
+            CHAT_COMPLETION_TOKEN_COUNTER=token_counter,
+            CHAT_COMPLETION_UNIT_CONTENT_MAX_TOKENS=max_tokens,
+        ):
+            texts = self._render_content_texts()[1:-1].split('][')
+            token_count = sum(get_token_counter().count(text) for text in texts)
+
+        self.assertLessEqual(token_count, max_tokens)
+        self.assertLess(len(''.join(texts)), sum(len(item['content_text']) for item in content_items))
+        for text, item in zip(texts, content_items):
+            self.assertTrue(item['content_text'].startswith(text))
+
+    def _content_items(self):
+        """
+        Return unit content items, in the shape returned by get_block_content.
+        """
+        return [
+            {'content_type': 'TEXT', 'content_text': 'Hello world, this is the unit content.'},
+            {'content_type': 'VIDEO', 'content_text': 'Second item text.'},
+        ]
+
+    def _render_content_texts(self):
+        """
+        Render a prompt template made of the text of each unit content item, in brackets.
+        """
+        return render_prompt_template(
+            MagicMock(), 1, self.course_run_id, 'block-v1:edX+A+B+type@vertical+block@verticalD', 'edx+test',
+            '{% for item in unit_content %}[{{ item.content_text }}]{% endfor %}'
+        )
+
 
 @ddt.ddt
-class TestLearningAssistantCourseEnabledApi(TestCase):
+@override_settings(LEARNING_ASSISTANT_EXTRACT_UNIT_CONTENT_ON_PUBLISH=True)
+class ExtractCourseUnitContentsTests(TestCase):
     """
-    Test suite for save_chat_message.
+    Tests for extracting the content of the units of a course when it is published
     """
 
     def setUp(self):
         super().setUp()
+        cache.clear()
+        self.course_key = CourseKey.from_string('course-v1:edx+test+23')
+        self.content_items = [{'content_type': 'TEXT', 'content_text': 'This is the unit content'}]
 
-        self.test_user = User.objects.create(username='username', password='password')
-        self.course_run_key = CourseKey.from_string('course-v1:edx+test+23')
+    def _unit(self, block_id, version='version-1', course_key=None):
+        """
+        Return a fake published unit.
+        """
+        return FakeUnit((course_key or self.course_key).make_usage_key('vertical', block_id), version)
+
+    def _extract(self, units, varies_by_user=False, partial=False):
+        """
+        Extract the contents of the given published units, and return the mock for _get_children_contents.
+        """
+        with patch('learning_assistant.api.get_published_units', return_value=units), \
+                patch('learning_assistant.api._block_varies_by_user', return_value=varies_by_user), \
+                patch('learning_assistant.api._get_children_contents') as mock_get_children_contents:
+            mock_get_children_contents.return_value = (24, self.content_items, partial)
+            result = extract_course_unit_contents(self.course_key)
+
+        return result, mock_get_children_contents
+
+    def test_extract(self):
+        units = [self._unit('unit1'), self._unit('unit2')]
+
+        result, _ = self._extract(units)
+
+        self.assertEqual(result, (2, 0))
+        self.assertEqual(
+            get_extracted_unit_content(self.course_key, str(units[0].scope_ids.usage_id)),
+            {'content_length': 24, 'content_items': self.content_items},
+        )
+
+    @ddt.data(
+        ('version-1', (0, 1), 0),
+        ('version-2', (1, 0), 1),
+        ('', (1, 0), 1),
+    )
+    @ddt.unpack
+    def test_extract_unchanged_units_skipped(self, version, expected_result, expected_call_count):
+        self._extract([self._unit('unit1', version='version-1')])
+
+        result, mock_get_children_contents = self._extract([self._unit('unit1', version=version)])
+
+        self.assertEqual(result, expected_result)
+        self.assertEqual(mock_get_children_contents.call_count, expected_call_count)
+
+    def test_extract_varies_by_user(self):
+        unit = self._unit('unit1')
+        self._extract([unit])
+
+        result, mock_get_children_contents = self._extract([self._unit('unit1', 'version-2')], varies_by_user=True)
+
+        self.assertEqual(result, (0, 1))
+        mock_get_children_contents.assert_not_called()
+        self.assertIsNone(get_extracted_unit_content(self.course_key, unit.scope_ids.usage_id))
+
+    def test_extract_partial_not_stored(self):
+        unit = self._unit('unit1')
+        self._extract([unit])
+
+        with self.assertLogs('learning_assistant.api', level='WARNING'):
+            result, _ = self._extract([self._unit('unit1', 'version-2')], partial=True)
+
+        self.assertEqual(result, (0, 1))
+        self.assertIsNone(get_extracted_unit_content(self.course_key, unit.scope_ids.usage_id))
+
+        # As no version was stored, the unit is extracted again the next time, even if it has not changed.
+        result, mock_get_children_contents = self._extract([self._unit('unit1', 'version-2')])
+
+        self.assertEqual(result, (1, 0))
+        mock_get_children_contents.assert_called_once()
+
+    def test_extract_removed_units_deleted(self):
+        units = [self._unit('unit1'), self._unit('unit2')]
+        self._extract(units)
+
+        self._extract(units[:1])
+
+        self.assertIsNotNone(get_extracted_unit_content(self.course_key, units[0].scope_ids.usage_id))
+        self.assertIsNone(get_extracted_unit_content(self.course_key, units[1].scope_ids.usage_id))
+
+    @patch('learning_assistant.api.block_get_children', return_value=[])
+    @patch('learning_assistant.api.traverse_block_pre_order', side_effect=lambda block, *args: [block])
+    def test_extract_unreleased_unit_not_stored(self, _mock_traverse, _mock_get_children):
+        unit = self._unit('unit1')
+        unit.start = timezone.now() + timedelta(days=1)
+
+        with patch('learning_assistant.api.get_published_units', return_value=[unit]), \
+                patch('learning_assistant.api._get_children_contents') as mock_get_children_contents:
+            result = extract_course_unit_contents(self.course_key)
+
+        self.assertEqual(result, (0, 1))
+        mock_get_children_contents.assert_not_called()
+        self.assertIsNone(get_extracted_unit_content(self.course_key, unit.scope_ids.usage_id))
+
+    @patch('learning_assistant.api.get_single_block')
+    @patch('learning_assistant.api._get_children_contents', return_value=(0, [], False))
+    @patch('learning_assistant.api._block_varies_by_user', return_value=False)
+    def test_get_block_content_extracted_other_course(
+        self, _mock_varies_by_user, _mock_get_children_contents, mock_get_single_block
+    ):
+        other_course_key = CourseKey.from_string('course-v1:edx+other+23')
+        unit = self._unit('unit1', course_key=other_course_key)
+        unit_usage_key = str(unit.scope_ids.usage_id)
+        with patch('learning_assistant.api.get_published_units', return_value=[unit]), \
+                patch('learning_assistant.api._get_children_contents', return_value=(24, self.content_items, False)):
+            extract_course_unit_contents(other_course_key)
+
+        # The unit of the other course is loaded through the platform, which checks access, instead of being read
+        # from the content extracted for the other course.
+        length, items = get_block_content(MagicMock(), 1, str(self.course_key), unit_usage_key)
+
+        self.assertEqual((length, items), (0, []))
+        mock_get_single_block.assert_called_once()
+
+    @patch('learning_assistant.api.get_single_block')
+    def test_get_block_content_extracted(self, mock_get_single_block):
+        unit = self._unit('unit1')
+        unit_usage_key = str(unit.scope_ids.usage_id)
+        self._extract([unit])
+
+        length, items = get_block_content(MagicMock(), 1, str(self.course_key), unit_usage_key)
+
+        self.assertEqual((length, items), (24, self.content_items))
+        mock_get_single_block.assert_not_called()
+
+    @override_settings(LEARNING_ASSISTANT_EXTRACT_UNIT_CONTENT_ON_PUBLISH=False)
+    @patch('learning_assistant.api.get_single_block')
+    @patch('learning_assistant.api._get_children_contents', return_value=(3, [], False))
+    @patch('learning_assistant.api._block_varies_by_user', return_value=False)
+    def test_get_block_content_extracted_not_read_without_extraction_on_publish(
+        self, _mock_varies_by_user, _mock_get_children_contents, mock_get_single_block
+    ):
+        unit = self._unit('unit1')
+        self._extract([unit])
+
+        length, items = get_block_content(MagicMock(), 1, str(self.course_key), str(unit.scope_ids.usage_id))
+
+        self.assertEqual((length, items), (3, []))
+        mock_get_single_block.assert_called_once()
+
+    @override_settings(LEARNING_ASSISTANT_EXTRACTED_UNIT_CONTENT_MAX_AGE=60)
+    def test_extracted_content_expires(self):
+        unit = self._unit('unit1')
+        with freeze_time('2026-01-01 00:00:00'):
+            self._extract([unit])
+
+        with freeze_time('2026-01-01 00:00:59'):
+            self.assertIsNotNone(get_extracted_unit_content(self.course_key, unit.scope_ids.usage_id))
+
+        with freeze_time('2026-01-01 00:01:01'):
+            self.assertIsNone(get_extracted_unit_content(self.course_key, unit.scope_ids.usage_id))
+
+            # Extracting the course again marks the stored content of the unchanged unit as up to date.
+            result, mock_get_children_contents = self._extract([unit])
+            self.assertEqual(result, (0, 1))
+            mock_get_children_contents.assert_not_called()
+            self.assertIsNotNone(get_extracted_unit_content(self.course_key, unit.scope_ids.usage_id))
+
+    @patch('learning_assistant.api.get_single_block')
+    @patch('learning_assistant.api._block_varies_by_user', return_value=False)
+    def test_extract_invalidates_cached_content(self, _mock_varies_by_user, mock_get_single_block):
+        unit = self._unit('unit1')
+        unit_usage_key = str(unit.scope_ids.usage_id)
+        mock_get_single_block.return_value = unit
+
+        with patch('learning_assistant.api._get_children_contents', return_value=(3, [], False)):
+            get_block_content(MagicMock(), 1, str(self.course_key), unit_usage_key)
+
+        self._extract([unit])
+
+        self.assertEqual(
+            get_block_content(MagicMock(), 1, str(self.course_key), unit_usage_key), (24, self.content_items)
+        )
+
+
+@ddt.ddt
+class BlockVariesByUserTests(TestCase):
+    """
+    Tests for the _block_varies_by_user helper function
+    """
+
+    def _block(self, category='vertical', children=None, parent=None, **attributes):
+        """
+        Return a fake block with the given category, children, parent and attributes.
+        """
+        block = MagicMock(spec=[
+            'category', 'children', 'get_parent', 'group_access', 'visible_to_staff_only', 'start', 'scope_ids',
+        ])
+        block.category = category
+        block.children = children or []
+        block.get_parent.return_value = parent
+        block.group_access = {}
+        block.visible_to_staff_only = False
+        block.start = timezone.make_aware(datetime(2020, 1, 1))
+        block.scope_ids.usage_id = UsageKey.from_string(f'block-v1:edX+A+B+type@{category}+block@{id(block)}')
+        for name, value in attributes.items():
+            setattr(block, name, value)
+        return block
+
+    def _varies_by_user(self, block, descendants, visible_children=None):
+        """
+        Return the result of _block_varies_by_user, given the blocks traversed and the children visible to the user.
+        """
+        with patch('learning_assistant.api.traverse_block_pre_order', return_value=[block] + descendants):
+            with patch('learning_assistant.api.block_get_children') as mock_get_children:
+                mock_get_children.side_effect = lambda node: (
+                    visible_children if visible_children is not None and node is block else node.children
+                )
+                return _block_varies_by_user(block)
+
+    def test_block_shared(self):
+        child = self._block('html')
+        self.assertFalse(self._varies_by_user(self._block(children=[child]), [child]))
 
     @ddt.data(
-        (LearningAssistantMessage.USER_ROLE, 'What is the meaning of life, the universe and everything?'),
-        (LearningAssistantMessage.ASSISTANT_ROLE, '42'),
+        {'group_access': {50: [1]}},
+        {'visible_to_staff_only': True},
+        {'start': timezone.make_aware(datetime(2100, 1, 1))},
+        {'category': 'split_test'},
+        {'category': 'library_content'},
+    )
+    def test_descendant_varies_by_user(self, attributes):
+        child = self._block(**{'category': 'html', **attributes})
+        self.assertTrue(self._varies_by_user(self._block(children=[child]), [child]))
+
+    def test_children_hidden_from_user(self):
+        children = [self._block('html'), self._block('video')]
+        block = self._block(children=children)
+
+        self.assertTrue(self._varies_by_user(block, children[:1], visible_children=children[:1]))
+
+    @patch('learning_assistant.api.get_required_content', return_value=None)
+    def test_ancestors_shared(self, mock_get_required_content):
+        subsection = self._block('sequential', parent=self._block('chapter', parent=self._block('course')))
+        block = self._block(parent=subsection)
+
+        self.assertFalse(self._varies_by_user(block, []))
+        mock_get_required_content.assert_called_once_with(
+            subsection.scope_ids.usage_id.course_key, subsection.scope_ids.usage_id
+        )
+
+    @ddt.data(
+        ('chapter', {'group_access': {50: [1]}}),
+        ('sequential', {'group_access': {50: [1]}}),
+        ('chapter', {'visible_to_staff_only': True}),
+        ('chapter', {'start': timezone.make_aware(datetime(2100, 1, 1))}),
+        ('sequential', {'is_time_limited': True}),
+        ('sequential', {'is_proctored_enabled': True}),
+        ('sequential', {'hide_after_due': True}),
     )
     @ddt.unpack
-    def test_save_chat_message(self, chat_role, message):
-        save_chat_message(self.course_run_key, self.test_user.id, chat_role, message)
+    @patch('learning_assistant.api.get_required_content', return_value=None)
+    def test_ancestor_varies_by_user(self, restricted_category, attributes, _mock_get_required_content):
+        chapter = self._block('chapter', **(attributes if restricted_category == 'chapter' else {}))
+        subsection = self._block(
+            'sequential', parent=chapter, **(attributes if restricted_category == 'sequential' else {})
+        )
+        block = self._block(parent=subsection)
+
+        # group_access is not inherited, so the unit itself has no restriction.
+        self.assertEqual(block.group_access, {})
+        self.assertTrue(self._varies_by_user(block, []))
+
+    def test_merged_group_access(self):
+        block = self._block()
+        block.merged_group_access = {50: [1]}
+
+        self.assertTrue(self._varies_by_user(block, []))
+
+    def test_subsection_gated_by_prerequisite(self):
+        block = self._block(parent=self._block('sequential'))
+
+        prerequisite_key = 'block-v1:edX+A+B+type@sequential+block@prerequisite'
+        with patch('learning_assistant.api.get_required_content', return_value=prerequisite_key):
+            self.assertTrue(self._varies_by_user(block, []))
+
+
+class GetCompiledPromptTemplateTests(TestCase):
+    """
+    Tests for the get_compiled_prompt_template function
+    """
+
+    def setUp(self):
+        super().setUp()
+        _compiled_prompt_templates.clear()
+
+    def test_template_compiled_once(self):
+        with patch.object(
+            _prompt_template_environment, 'from_string', wraps=_prompt_template_environment.from_string
+        ) as mock_from_string:
+            first_template = get_compiled_prompt_template('Hello {{ title }}')
+            second_template = get_compiled_prompt_template('Hello {{ title }}')
+            other_template = get_compiled_prompt_template('Goodbye {{ title }}')
+
+        self.assertIs(first_template, second_template)
+        self.assertIsNot(first_template, other_template)
+        self.assertEqual(mock_from_string.call_count, 2)
+        self.assertEqual(first_template.render(title='world'), 'Hello world')
+
+    @patch('learning_assistant.api.COMPILED_PROMPT_TEMPLATES_MAX_SIZE', 2)
+    def test_cache_emptied_when_full(self):
+        for i in range(3):
+            get_compiled_prompt_template(f'Template {i}')
+
+        self.assertEqual(len(_compiled_prompt_templates), 1)
+
+    def test_template_sandboxed(self):
+        template = get_compiled_prompt_template('{{ title.__class__.__mro__ }}')
+
+        with self.assertRaises(SecurityError):
+            template.render(title='title')
 
-        row = LearningAssistantMessage.objects.all().last()
 
-        self.assertEqual(row.course_id, self.course_run_key)
-        self.assertEqual(row.role, chat_role)
-        self.assertEqual(row.content, message)
+@ddt.ddt
+class TestLearningAssistantCourseEnabledApi(TestCase):
+    """
+    Test suite for save_chat_turn.
+    """
+
+    def setUp(self):
+        super().setUp()
+
+        self.test_user = User.objects.create(username='username', password='password')
+        self.course_run_key = CourseKey.from_string('course-v1:edx+test+23')
+
+    def test_save_chat_turn(self):
+        # The user and assistant messages are written with a single query, inside a transaction.
+        with self.assertNumQueries(3):
+            save_chat_turn(self.course_run_key, self.test_user, 'What is 6 times 7?', '42')
+
+        history = get_message_history(self.course_run_key, self.test_user, 10)
+
+        self.assertEqual(
+            [(message.role, message.content) for message in history],
+            [
+                (LearningAssistantMessage.USER_ROLE, 'What is 6 times 7?'),
+                (LearningAssistantMessage.ASSISTANT_ROLE, '42'),
+            ],
+        )
+        self.assertLess(history[0].created, history[1].created)
+
+    @override_settings(LEARNING_ASSISTANT_CHAT_HISTORY_WRITE_BEHIND=True)
+    @patch('learning_assistant.api.get_chat_message_buffer')
+    def test_save_chat_turn_write_behind(self, mock_get_buffer):
+        with self.assertNumQueries(0):
+            save_chat_turn(self.course_run_key, self.test_user, 'What is 6 times 7?', '42')
+
+        messages = mock_get_buffer.return_value.add.call_args.args[0]
+        self.assertEqual([message.content for message in messages], ['What is 6 times 7?', '42'])
+        self.assertFalse(LearningAssistantMessage.objects.exists())
+
+    def test_save_chat_turn_user_message_only(self):
+        save_chat_turn(self.course_run_key, self.test_user, 'What is 6 times 7?')
+
+        row = LearningAssistantMessage.objects.get()
+
+        self.assertEqual(row.user, self.test_user)
+        self.assertEqual(row.role, LearningAssistantMessage.USER_ROLE)
+        self.assertEqual(row.content, 'What is 6 times 7?')
 
 
 @ddt.ddt
@@ -321,6 +952,7 @@ class LearningAssistantCourseEnabledApiTests(TestCase):
     def setUp(self):
         super().setUp()
         self.course_key = CourseKey.from_string('course-v1:edx+fake+1')
+        cache.clear()
 
     @ddt.data(
         (True, True, True, True),
@@ -352,6 +984,61 @@ class LearningAssistantCourseEnabledApiTests(TestCase):
             expected_value
         )
 
+    @patch('learning_assistant.api.learning_assistant_available', return_value=True)
+    def test_learning_assistant_enabled_cached(self, _):
+        with self.assertNumQueries(1):
+            self.assertTrue(learning_assistant_enabled(self.course_key))
+            self.assertTrue(learning_assistant_enabled(self.course_key))
+
+        # The cached value is removed when the override changes.
+        set_learning_assistant_enabled(self.course_key, False)
+        with self.assertNumQueries(1):
+            self.assertFalse(learning_assistant_enabled(self.course_key))
+            self.assertFalse(learning_assistant_enabled(self.course_key))
+
+        LearningAssistantCourseEnabled.objects.filter(course_id=self.course_key).update(enabled=True)
+        self.assertFalse(learning_assistant_enabled(self.course_key))
+
+        LearningAssistantCourseEnabled.objects.get(course_id=self.course_key).save()
+        self.assertTrue(learning_assistant_enabled(self.course_key))
+
+        LearningAssistantCourseEnabled.objects.get(course_id=self.course_key).delete()
+        with self.assertNumQueries(1):
+            self.assertTrue(learning_assistant_enabled(self.course_key))
+
+    @override_settings(LEARNING_ASSISTANT_COURSE_ENABLED_CACHE_TIMEOUT=0)
+    @patch('learning_assistant.api.learning_assistant_available', return_value=True)
+    def test_learning_assistant_enabled_not_cached(self, _):
+        with self.assertNumQueries(2):
+            learning_assistant_enabled(self.course_key)
+            learning_assistant_enabled(self.course_key)
+
+    @patch('learning_assistant.api.learning_assistant_available', return_value=True)
+    def test_learning_assistant_enabled_many(self, _):
+        course_keys = [CourseKey.from_string(f'course-v1:edx+fake+{i}') for i in range(1, 5)]
+        set_learning_assistant_enabled(course_keys[1], False)
+        set_learning_assistant_enabled(course_keys[2], True)
+        learning_assistant_enabled(course_keys[3])
+
+        expected_value = {
+            course_keys[0]: True,
+            course_keys[1]: False,
+            course_keys[2]: True,
+            course_keys[3]: True,
+        }
+
+        # The courses that are not cached are read with a single query.
+        with self.assertNumQueries(1):
+            self.assertEqual(learning_assistant_enabled_many(course_keys), expected_value)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(learning_assistant_enabled_many(course_keys), expected_value)
+
+    @patch('learning_assistant.api.learning_assistant_available', return_value=False)
+    def test_learning_assistant_enabled_many_not_available(self, _):
+        with self.assertNumQueries(0):
+            self.assertEqual(learning_assistant_enabled_many([self.course_key]), {self.course_key: False})
+
     @ddt.idata(itertools.product((True, False), (True, False)))
     @ddt.unpack
     def test_set_learning_assistant_enabled(self, obj_exists, obj_value):
@@ -389,6 +1076,50 @@ class LearningAssistantCourseEnabledApiTests(TestCase):
         self.assertEqual(return_value, expected_value)
 
 
+class GetCachedEligibilityTests(TestCase):
+    """
+    Test suite for get_cached_eligibility and invalidate_eligibility_cache.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.course_key = CourseKey.from_string('course-v1:edx+fake+1')
+        self.eligibility = LearningAssistantEligibilityData(
+            is_staff=False, enrollment_mode='audit', upgrade_deadline=None
+        )
+
+    def test_cached(self):
+        get_eligibility = MagicMock(return_value=self.eligibility)
+
+        self.assertEqual(get_cached_eligibility(1, self.course_key, get_eligibility), self.eligibility)
+        self.assertEqual(get_cached_eligibility(1, self.course_key, get_eligibility), self.eligibility)
+        get_eligibility.assert_called_once_with()
+
+        # The eligibility is cached per user and course run.
+        get_cached_eligibility(2, self.course_key, get_eligibility)
+        get_cached_eligibility(1, CourseKey.from_string('course-v1:edx+fake+2'), get_eligibility)
+        self.assertEqual(get_eligibility.call_count, 3)
+
+    def test_invalidate(self):
+        get_eligibility = MagicMock(return_value=self.eligibility)
+
+        get_cached_eligibility(1, self.course_key, get_eligibility)
+        invalidate_eligibility_cache(1, self.course_key)
+        get_cached_eligibility(1, self.course_key, get_eligibility)
+
+        self.assertEqual(get_eligibility.call_count, 2)
+
+    @override_settings(LEARNING_ASSISTANT_ELIGIBILITY_CACHE_TIMEOUT=0)
+    def test_not_cached(self):
+        get_eligibility = MagicMock(return_value=self.eligibility)
+
+        get_cached_eligibility(1, self.course_key, get_eligibility)
+        get_cached_eligibility(1, self.course_key, get_eligibility)
+
+        self.assertEqual(get_eligibility.call_count, 2)
+
+
 @ddt.ddt
 class GetMessageHistoryTests(TestCase):
     """
@@ -428,6 +1159,27 @@ class GetMessageHistoryTests(TestCase):
             self.assertEqual(return_value.role, expected_value[i].role)
             self.assertEqual(return_value.content, expected_value[i].content)
 
+    def test_get_message_history_num_queries(self):
+        for i in range(1, 4):
+            LearningAssistantMessage.objects.create(
+                course_id=self.course_key,
+                user=self.user,
+                role=self.role,
+                content=f'Content of message {i}',
+            )
+
+        # The history is read with a single query, including its course and user.
+        with self.assertNumQueries(1):
+            message_history = get_message_history(self.course_key, self.user, 5)
+            for message in message_history:
+                self.assertEqual(message.course_id, self.course_key)
+                self.assertEqual(message.user, self.user)
+                self.assertIsNotNone(message.created)
+
+        self.assertEqual([message.content for message in message_history], [
+            'Content of message 1', 'Content of message 2', 'Content of message 3',
+        ])
+
     @ddt.data(
         0, 1, 5, 10, 50
     )
@@ -525,6 +1277,132 @@ class GetMessageHistoryTests(TestCase):
             self.assertEqual(return_value.content, expected_value[i].content)
 
 
+@ddt.ddt
+class HideExpiredMessagesTests(TestCase):
+    """
+    Test suite for the LEARNING_ASSISTANT_HIDE_EXPIRED_MESSAGES setting of the message history.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.course_key = CourseKey.from_string('course-v1:edx+fake+1')
+        self.user = User.objects.create(username='tester', email='tester@test.com')
+
+        for days in (45, 31, 29, 1):
+            LearningAssistantMessage.objects.create(
+                course_id=self.course_key,
+                user=self.user,
+                role=LearningAssistantMessage.USER_ROLE,
+                content=f'Message of {days} days ago',
+                created=timezone.now() - timedelta(days=days),
+            )
+
+    @ddt.data(
+        (False, 30, [
+            'Message of 45 days ago', 'Message of 31 days ago', 'Message of 29 days ago', 'Message of 1 days ago',
+        ]),
+        (True, 30, ['Message of 29 days ago', 'Message of 1 days ago']),
+        (True, 40, ['Message of 31 days ago', 'Message of 29 days ago', 'Message of 1 days ago']),
+    )
+    @ddt.unpack
+    def test_message_history(self, hide_expired_messages, expiry, expected_contents):
+        with override_settings(
+            LEARNING_ASSISTANT_HIDE_EXPIRED_MESSAGES=hide_expired_messages,
+            LEARNING_ASSISTANT_MESSAGES_EXPIRY=expiry,
+        ):
+            message_history = get_message_history(self.course_key, self.user, 10)
+            message_history_page, next_cursor = get_message_history_page(self.course_key, self.user, 10)
+
+        self.assertEqual([message.content for message in message_history], expected_contents)
+        self.assertEqual([message.content for message in message_history_page], expected_contents)
+        self.assertIsNone(next_cursor)
+
+
+@ddt.ddt
+class GetMessageHistoryPageTests(TestCase):
+    """
+    Test suite for get_message_history_page.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.course_key = CourseKey.from_string('course-v1:edx+fake+1')
+        self.user = User.objects.create(username='tester', email='tester@test.com')
+        self.other_user = User.objects.create(username='other', email='other@test.com')
+
+        # Some messages share their creation time, so that the pages have to be split on the message ID.
+        created = timezone.make_aware(datetime(2024, 10, 1))
+        for i in range(1, 8):
+            LearningAssistantMessage.objects.create(
+                course_id=self.course_key,
+                user=self.user,
+                role=LearningAssistantMessage.USER_ROLE,
+                content=f'Content of message {i}',
+                created=created + timedelta(minutes=i // 2),
+            )
+        LearningAssistantMessage.objects.create(
+            course_id=self.course_key,
+            user=self.other_user,
+            role=LearningAssistantMessage.USER_ROLE,
+            content='Content of another user',
+        )
+
+    def _get_all_pages(self, page_size):
+        """
+        Return the contents of the messages of every page of the history, following the cursors.
+        """
+        pages = []
+        cursor = None
+        while True:
+            page, cursor = get_message_history_page(self.course_key, self.user, page_size, cursor)
+            pages.append([message.content for message in page])
+            if cursor is None:
+                return pages
+
+    def test_first_page(self):
+        page, next_cursor = get_message_history_page(self.course_key, self.user, 3)
+
+        self.assertEqual([message.content for message in page], [
+            'Content of message 5', 'Content of message 6', 'Content of message 7',
+        ])
+        self.assertIsNotNone(next_cursor)
+        for message in page:
+            self.assertEqual(message.course_id, self.course_key)
+            self.assertEqual(message.user, self.user)
+
+    def test_all_pages(self):
+        self.assertEqual(self._get_all_pages(3), [
+            ['Content of message 5', 'Content of message 6', 'Content of message 7'],
+            ['Content of message 2', 'Content of message 3', 'Content of message 4'],
+            ['Content of message 1'],
+        ])
+
+    def test_last_page_is_full(self):
+        pages = self._get_all_pages(7)
+
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(len(pages[0]), 7)
+
+    def test_num_queries(self):
+        _, cursor = get_message_history_page(self.course_key, self.user, 2)
+
+        with self.assertNumQueries(1):
+            get_message_history_page(self.course_key, self.user, 2, cursor)
+
+    @ddt.data('', 'not a cursor', 'MjAyNC0xMC0wMXwx', 'bm90IGEgZGF0ZXwx')
+    def test_invalid_cursor(self, cursor):
+        with self.assertRaises(ValueError):
+            get_message_history_page(self.course_key, self.user, 3, cursor)
+
+    def test_cursor_round_trip(self):
+        message = LearningAssistantMessage.objects.filter(user=self.user).first()
+
+        self.assertEqual(
+            decode_message_history_cursor(encode_message_history_cursor(message)),
+            (message.created, message.id),
+        )
+
+
 @ddt.ddt
 class GetAuditTrialExpirationDateFromStartTests(TestCase):
     """
@@ -554,6 +1432,7 @@ class GetAuditTrialTests(TestCase):
         super().setUp()
         self.user = User(username='tester', email='tester@test.com')
         self.user.save()
+        cache.clear()
 
     @freeze_time('2024-01-01')
     @ddt.data(
@@ -593,6 +1472,7 @@ class GetOrCreateAuditTrialTests(TestCase):
         super().setUp()
         self.user = User(username='tester', email='tester@test.com')
         self.user.save()
+        cache.clear()
 
     @freeze_time('2024-01-01')
     @ddt.data(
@@ -638,6 +1518,25 @@ class GetOrCreateAuditTrialTests(TestCase):
 
         self.assertEqual(expected_return, get_or_create_audit_trial(self.user))
 
+    def test_cached(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(get_audit_trial(self.user))
+            self.assertIsNone(get_audit_trial(self.user))
+
+        # The cached value is removed when the audit trial is created, and when it changes.
+        audit_trial_data = get_or_create_audit_trial(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_audit_trial(self.user), audit_trial_data)
+            self.assertEqual(get_or_create_audit_trial(self.user), audit_trial_data)
+
+        audit_trial = LearningAssistantAuditTrial.objects.get(user=self.user)
+        audit_trial.expiration_date = audit_trial.expiration_date + timedelta(days=1)
+        audit_trial.save()
+        self.assertEqual(get_audit_trial(self.user).expiration_date, audit_trial.expiration_date)
+
+        audit_trial.delete()
+        self.assertIsNone(get_audit_trial(self.user))
+
 
 @ddt.ddt
 class CheckIfAuditTrialIsExpiredTests(TestCase):
@@ -0,0 +1,141 @@
+"""
+Tests for the timing instrumentation
+"""
+from unittest.mock import call, patch
+
+import ddt
+from django.test import TestCase, override_settings
+
+from learning_assistant.instrumentation import (
+    InstrumentationSink,
+    LogSink,
+    MemorySink,
+    MonitoringSink,
+    _load_sinks,
+    get_instrumentation_sinks,
+    record_timing,
+    span,
+)
+
+MEMORY_SINK = 'learning_assistant.instrumentation.MemorySink'
+
+
+class FailingSink(InstrumentationSink):
+    """
+    Instrumentation sink that fails to record every span.
+    """
+
+    def record(self, stage, duration, tags):
+        raise ValueError('Failed to record')
+
+
+@ddt.ddt
+class SpanTests(TestCase):
+    """
+    Tests for spans and the selection of instrumentation sinks
+    """
+
+    def setUp(self):
+        super().setUp()
+        _load_sinks.cache_clear()
+        self.addCleanup(_load_sinks.cache_clear)
+
+    @ddt.data(None, [])
+    def test_disabled(self, sinks_setting):
+        with override_settings(LEARNING_ASSISTANT_INSTRUMENTATION_SINKS=sinks_setting):
+            self.assertEqual(get_instrumentation_sinks(), ())
+
+            with patch('learning_assistant.instrumentation._emit') as mock_emit:
+                with span('stage', tag='value') as disabled_span:
+                    disabled_span.set_tag('other_tag', 'value')
+                record_timing('stage', 1.0)
+
+        mock_emit.assert_not_called()
+
+    @override_settings(LEARNING_ASSISTANT_INSTRUMENTATION_SINKS=[MEMORY_SINK])
+    def test_sinks_shared(self):
+        sinks = get_instrumentation_sinks()
+
+        self.assertEqual(len(sinks), 1)
+        self.assertIsInstance(sinks[0], MemorySink)
+        self.assertIs(get_instrumentation_sinks()[0], sinks[0])
+
+    @override_settings(LEARNING_ASSISTANT_INSTRUMENTATION_SINKS=[MEMORY_SINK])
+    def test_span(self):
+        sink = get_instrumentation_sinks()[0]
+
+        with patch('learning_assistant.instrumentation.time.perf_counter', side_effect=[1.0, 1.25]):
+            with span('get_block_content', cache='hit') as block_content_span:
+                block_content_span.set_tag('cache', 'miss')
+
+        self.assertEqual(sink.records, [('get_block_content', 0.25, {'cache': 'miss'})])
+
+    @override_settings(LEARNING_ASSISTANT_INSTRUMENTATION_SINKS=[MEMORY_SINK])
+    def test_span_error(self):
+        sink = get_instrumentation_sinks()[0]
+
+        with self.assertRaises(ValueError):
+            with span('chat_completion'):
+                raise ValueError('Failed')
+
+        self.assertEqual(sink.stages(), ['chat_completion'])
+        self.assertEqual(sink.records[0][2], {'error': 'ValueError'})
+
+    @override_settings(LEARNING_ASSISTANT_INSTRUMENTATION_SINKS=[MEMORY_SINK])
+    def test_nested_spans(self):
+        sink = get_instrumentation_sinks()[0]
+
+        with span('render_prompt_template'):
+            with span('get_block_content'):
+                pass
+
+        self.assertEqual(sink.stages(), ['get_block_content', 'render_prompt_template'])
+
+    @override_settings(LEARNING_ASSISTANT_INSTRUMENTATION_SINKS=[MEMORY_SINK])
+    def test_record_timing(self):
+        sink = get_instrumentation_sinks()[0]
+
+        record_timing('chat_completion_stream', 2.5, status_code=200)
+
+        self.assertEqual(sink.records, [('chat_completion_stream', 2.5, {'status_code': 200})])
+
+        sink.clear()
+        self.assertEqual(sink.records, [])
+
+    @override_settings(LEARNING_ASSISTANT_INSTRUMENTATION_SINKS=['tests.test_instrumentation.FailingSink', MEMORY_SINK])
+    def test_failing_sink(self):
+        sink = get_instrumentation_sinks()[1]
+
+        with self.assertLogs('learning_assistant.instrumentation', level='ERROR'):
+            with span('save_chat_turn'):
+                pass
+
+        # A failing sink does not prevent the other sinks from recording the span.
+        self.assertEqual(sink.stages(), ['save_chat_turn'])
+
+
+class InstrumentationSinkTests(TestCase):
+    """
+    Tests for the instrumentation sinks
+    """
+
+    def test_record_not_implemented(self):
+        with self.assertRaises(NotImplementedError):
+            InstrumentationSink().record('stage', 1.0, {})
+
+    def test_log_sink(self):
+        with self.assertLogs('learning_assistant.instrumentation', level='INFO') as logs:
+            LogSink().record('get_course_id', 0.0125, {'cache': 'hit'})
+
+        self.assertIn("stage=get_course_id duration_ms=12.50 tags={'cache': 'hit'}", logs.output[0])
+
+    @patch('learning_assistant.instrumentation.set_custom_attribute')
+    @patch('learning_assistant.instrumentation.accumulate')
+    def test_monitoring_sink(self, mock_accumulate, mock_set_custom_attribute):
+        MonitoringSink().record('get_block_content', 0.5, {'cache': 'miss'})
+
+        mock_accumulate.assert_called_once_with('learning_assistant.get_block_content.duration_ms', 500.0)
+        self.assertEqual(
+            mock_set_custom_attribute.call_args_list,
+            [call('learning_assistant.get_block_content.cache', 'miss')],
+        )
@@ -0,0 +1,121 @@
+"""
+Tests for the chat history write-behind buffer
+"""
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from opaque_keys.edx.keys import CourseKey
+
+from learning_assistant.message_buffer import ChatMessageBuffer
+from learning_assistant.models import LearningAssistantMessage
+
+User = get_user_model()
+
+
+class ChatMessageBufferTests(TestCase):
+    """
+    Tests for the ChatMessageBuffer
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='tester', email='tester@test.com')
+        self.course_key = CourseKey.from_string('course-v1:edx+test+23')
+        self.written = []
+        self.written_event = threading.Event()
+
+    def _messages(self, count):
+        """
+        Return a number of unsaved messages.
+        """
+        return [
+            LearningAssistantMessage(
+                course_id=self.course_key, user=self.user, role=LearningAssistantMessage.USER_ROLE, content=f'{i}'
+            )
+            for i in range(count)
+        ]
+
+    def _record_write(self, messages):
+        """
+        Record a batch of messages written by the buffer, in place of writing them.
+        """
+        self.written.append((threading.current_thread(), [message.content for message in messages]))
+        self.written_event.set()
+
+    def test_flush(self):
+        buffer = ChatMessageBuffer(batch_size=2, flush_interval=60)
+
+        # The background thread may write the first batch as soon as it is added, so the write is patched beforehand.
+        with patch.object(LearningAssistantMessage.objects, 'bulk_create', side_effect=self._record_write):
+            buffer.add(self._messages(3))
+            buffer.flush()
+            buffer.close()
+
+        self.assertEqual([batch for _, batch in self.written], [['0', '1'], ['2']])
+        self.assertEqual(len(buffer), 0)
+
+    def test_flush_writes_messages(self):
+        buffer = ChatMessageBuffer(flush_interval=60)
+        buffer.add(self._messages(2))
+
+        buffer.flush()
+        buffer.close()
+
+        self.assertEqual(
+            list(LearningAssistantMessage.objects.order_by('content').values_list('content', flat=True)), ['0', '1']
+        )
+
+    def test_batch_size_written_by_thread(self):
+        buffer = ChatMessageBuffer(batch_size=2, flush_interval=60)
+
+        with patch.object(LearningAssistantMessage.objects, 'bulk_create', side_effect=self._record_write):
+            buffer.add(self._messages(1))
+            buffer.add(self._messages(1))
+            self.assertTrue(self.written_event.wait(5))
+            buffer.close()
+
+        thread, batch = self.written[0]
+        self.assertIsNot(thread, threading.current_thread())
+        self.assertEqual(batch, ['0', '0'])
+
+    def test_flush_interval_written_by_thread(self):
+        buffer = ChatMessageBuffer(batch_size=100, flush_interval=0.01)
+
+        with patch.object(LearningAssistantMessage.objects, 'bulk_create', side_effect=self._record_write):
+            buffer.add(self._messages(1))
+            self.assertTrue(self.written_event.wait(5))
+            buffer.close()
+
+        self.assertEqual([batch for _, batch in self.written], [['0']])
+
+    def test_full_buffer_written_by_caller(self):
+        buffer = ChatMessageBuffer(flush_interval=60, max_size=2)
+
+        with patch.object(LearningAssistantMessage.objects, 'bulk_create', side_effect=self._record_write):
+            buffer.add(self._messages(2))
+            buffer.add(self._messages(1))
+
+            self.assertEqual(self.written, [(threading.current_thread(), ['0'])])
+            self.assertEqual(len(buffer), 2)
+            buffer.close()
+
+    def test_closed_buffer_written_by_caller(self):
+        buffer = ChatMessageBuffer(flush_interval=60)
+        buffer.close()
+
+        with patch.object(LearningAssistantMessage.objects, 'bulk_create', side_effect=self._record_write):
+            buffer.add(self._messages(1))
+
+        self.assertEqual(self.written, [(threading.current_thread(), ['0'])])
+
+    def test_write_failure_logged(self):
+        buffer = ChatMessageBuffer(flush_interval=60)
+        buffer.add(self._messages(2))
+
+        with patch.object(LearningAssistantMessage.objects, 'bulk_create', side_effect=Exception('error')):
+            with self.assertLogs('learning_assistant.message_buffer', level='ERROR'):
+                buffer.close()
+
+        self.assertEqual(len(buffer), 0)
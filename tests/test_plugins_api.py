@@ -9,7 +9,13 @@ from django.test import TestCase
 from opaque_keys.edx.keys import CourseKey
 
 from learning_assistant.models import LearningAssistantCourseEnabled
-from learning_assistant.plugins_api import get_allowed_operations, is_available, is_enabled, set_enabled
+from learning_assistant.plugins_api import (
+    get_allowed_operations,
+    is_available,
+    is_enabled,
+    is_enabled_many,
+    set_enabled,
+)
 
 User = get_user_model()
 
@@ -43,6 +49,15 @@ class PluginApiTests(TestCase):
         learning_assistant_enabled_mock.return_value = is_enabled_value
         self.assertEqual(is_enabled(self.course_key), is_enabled_value)
 
+    @patch('learning_assistant.plugins_api.learning_assistant_enabled_many')
+    def test_is_enabled_many(self, learning_assistant_enabled_many_mock):
+        """
+        Test the is_enabled_many function of the plugins_api module.
+        """
+        learning_assistant_enabled_many_mock.return_value = {self.course_key: True}
+        self.assertEqual(is_enabled_many([self.course_key]), {self.course_key: True})
+        learning_assistant_enabled_many_mock.assert_called_once_with([self.course_key])
+
     @ddt.data(True, False)
     def test_set_enabled_create(self, enabled_value):
         """
@@ -0,0 +1,94 @@
+"""
+Tests for the learning_assistant signal handlers
+"""
+from unittest.mock import MagicMock, patch
+
+import ddt
+from django.test import TestCase, override_settings
+from opaque_keys.edx.keys import CourseKey
+
+from learning_assistant.models import LearningAssistantCourseEnabled
+from learning_assistant.signals import (
+    extract_unit_contents_on_course_published,
+    invalidate_eligibility_cache_on_enrollment_change,
+)
+
+
+@ddt.ddt
+class ExtractUnitContentsOnCoursePublishedTests(TestCase):
+    """
+    Tests for the extract_unit_contents_on_course_published signal handler
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.course_key = CourseKey.from_string('course-v1:edx+test+23')
+
+    @ddt.data(
+        (True, True, True),
+        (True, False, False),
+        (False, True, False),
+    )
+    @ddt.unpack
+    @patch('learning_assistant.signals.extract_course_unit_contents_task')
+    @patch('learning_assistant.signals.learning_assistant_enabled')
+    def test_extract(self, setting_enabled, course_enabled, expected_extracted, mock_enabled, mock_extract):
+        mock_enabled.return_value = course_enabled
+
+        with override_settings(LEARNING_ASSISTANT_EXTRACT_UNIT_CONTENT_ON_PUBLISH=setting_enabled):
+            extract_unit_contents_on_course_published(None, course_key=self.course_key)
+
+        if expected_extracted:
+            mock_extract.delay.assert_called_once_with(str(self.course_key))
+        else:
+            mock_extract.delay.assert_not_called()
+
+    @override_settings(LEARNING_ASSISTANT_EXTRACT_UNIT_CONTENT_ON_PUBLISH=True)
+    @patch('learning_assistant.signals.extract_course_unit_contents_task')
+    @patch('learning_assistant.signals.learning_assistant_enabled', return_value=True)
+    def test_extract_failure_logged(self, _mock_enabled, mock_extract):
+        mock_extract.delay.side_effect = Exception('error')
+        with self.assertLogs('learning_assistant.signals', level='ERROR'):
+            extract_unit_contents_on_course_published(None, course_key=self.course_key)
+
+
+class InvalidateEnabledCacheOnChangeTests(TestCase):
+    """
+    Tests for the invalidate_enabled_cache_on_change signal handler
+    """
+
+    @patch('learning_assistant.signals.invalidate_learning_assistant_enabled_cache')
+    def test_invalidate(self, mock_invalidate):
+        course_key = CourseKey.from_string('course-v1:edx+test+23')
+
+        obj = LearningAssistantCourseEnabled.objects.create(course_id=course_key, enabled=False)
+        mock_invalidate.assert_called_once_with(course_key)
+
+        obj.delete()
+        self.assertEqual(mock_invalidate.call_count, 2)
+
+
+@ddt.ddt
+class InvalidateEligibilityCacheOnEnrollmentChangeTests(TestCase):
+    """
+    Tests for the invalidate_eligibility_cache_on_enrollment_change signal handler
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.course_key = CourseKey.from_string('course-v1:edx+test+23')
+        self.user = MagicMock(id=7)
+
+    @ddt.data('course_id', 'course_key')
+    @patch('learning_assistant.signals.invalidate_eligibility_cache')
+    def test_invalidate(self, course_argument, mock_invalidate):
+        invalidate_eligibility_cache_on_enrollment_change(None, user=self.user, **{course_argument: self.course_key})
+
+        mock_invalidate.assert_called_once_with(7, self.course_key)
+
+    @patch('learning_assistant.signals.invalidate_eligibility_cache')
+    def test_missing_arguments(self, mock_invalidate):
+        invalidate_eligibility_cache_on_enrollment_change(None, user=self.user)
+        invalidate_eligibility_cache_on_enrollment_change(None, course_key=self.course_key)
+
+        mock_invalidate.assert_not_called()
@@ -0,0 +1,22 @@
+"""
+Tests for the learning_assistant Celery tasks
+"""
+from unittest.mock import patch
+
+from django.test import TestCase
+from opaque_keys.edx.keys import CourseKey
+
+from learning_assistant.tasks import extract_course_unit_contents_task
+
+
+class ExtractCourseUnitContentsTaskTests(TestCase):
+    """
+    Tests for the extract_course_unit_contents_task
+    """
+
+    @patch('learning_assistant.tasks.extract_course_unit_contents', return_value=(2, 1))
+    def test_extract(self, mock_extract):
+        with self.assertLogs('learning_assistant.tasks', level='INFO'):
+            extract_course_unit_contents_task('course-v1:edx+test+23')
+
+        mock_extract.assert_called_once_with(CourseKey.from_string('course-v1:edx+test+23'))
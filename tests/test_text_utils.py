@@ -1,8 +1,22 @@
 """Tests for text utils used by the blocks"""
+import random
 import unittest
+from re import sub
 from textwrap import dedent
 
-from learning_assistant.text_utils import html_to_text
+from django.test import override_settings
+
+from learning_assistant.text_utils import cleanup_text, html_to_text
+
+
+def _reference_cleanup_text(text):
+    """The multiple pass implementation of cleanup_text, which cleanup_text must stay equivalent to."""
+    stripped = sub(r'[^\S\r\n]+', ' ', text)
+    stripped = sub(r'\n{2,}', '\n', stripped)
+    stripped = sub(r'(\s+)?\n(\s+)?', '\n', stripped)
+    stripped = sub(r'(^(\s+)\n?)|(\n(\s+)?$)', '', stripped)
+
+    return stripped
 
 
 class TestSummaryHookAside(unittest.TestCase):
@@ -52,6 +66,27 @@ class TestSummaryHookAside(unittest.TestCase):
         text = html_to_text(html_content)
         self.assertEqual(text, expected_text)
 
+    @override_settings(LEARNING_ASSISTANT_HTML_TAGS_TO_REMOVE=['script', 'style'])
+    def test_html_to_text_tags_to_remove(self):
+        html_content = '<p>Lorem ipsum</p><script>alert("dolor");</script><style>p {}</style><p>sit amet</p>'
+        text = html_to_text(html_content)
+        self.assertEqual(text, 'Lorem ipsumsit amet')
+
+
+class TestCleanupText(unittest.TestCase):
+    """Tests of the whitespace cleanup of extracted text"""
+    def test_cleanup_text(self):
+        text = ' \t Lorem   ipsum\t\n\n  dolor \r\n sit\x0bamet \n '
+        self.assertEqual(cleanup_text(text), 'Lorem ipsum\ndolor\nsit amet')
+
+    def test_cleanup_text_equivalent_to_reference(self):
+        characters = ['a', 'b', ' ', ' ', '\t', '\n', '\n', '\r', '\x0b', '\x0c', '\x85', '\xa0', '\u3000']
+        generator = random.Random(42)
+
+        for _ in range(20000):
+            text = ''.join(generator.choice(characters) for _ in range(generator.randint(0, 16)))
+            self.assertEqual(cleanup_text(text), _reference_cleanup_text(text), repr(text))
+
 
 if __name__ == '__main__':
     unittest.main()
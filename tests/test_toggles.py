@@ -0,0 +1,99 @@
+"""
+Tests for the learning-assistant toggles
+"""
+from unittest.mock import MagicMock, patch
+
+import ddt
+from crum import set_current_request
+from django.test import RequestFactory, TestCase
+from edx_django_utils.cache import RequestCache
+from opaque_keys.edx.keys import CourseKey
+
+from learning_assistant.toggles import (
+    ENABLE_CHAT_HISTORY,
+    _get_learning_assistant_waffle_flag,
+    chat_history_enabled,
+    v2_endpoint_enabled,
+)
+
+
+@ddt.ddt
+class WaffleFlagTests(TestCase):
+    """
+    Tests for the evaluation of the learning-assistant Waffle flags
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.course_key = CourseKey.from_string('course-v1:edx+test+23')
+        self.waffle_flag = MagicMock()
+        self.waffle_flag.is_enabled.return_value = True
+
+        patcher = patch('learning_assistant.toggles._get_learning_assistant_waffle_flag', return_value=self.waffle_flag)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        RequestCache.clear_all_namespaces()
+        self.addCleanup(RequestCache.clear_all_namespaces)
+        self.addCleanup(set_current_request, None)
+
+    @ddt.data(True, False)
+    def test_flag_evaluated_once_per_request(self, enabled):
+        self.waffle_flag.is_enabled.return_value = enabled
+        set_current_request(RequestFactory().get('/'))
+
+        self.assertEqual(chat_history_enabled(self.course_key), enabled)
+        self.assertEqual(chat_history_enabled(self.course_key), enabled)
+        self.waffle_flag.is_enabled.assert_called_once_with(self.course_key)
+
+    def test_flag_evaluated_per_course(self):
+        other_course_key = CourseKey.from_string('course-v1:edx+test+24')
+        set_current_request(RequestFactory().get('/'))
+
+        chat_history_enabled(self.course_key)
+        chat_history_enabled(other_course_key)
+        self.assertEqual(self.waffle_flag.is_enabled.call_count, 2)
+
+    def test_flag_evaluated_again_in_next_request(self):
+        set_current_request(RequestFactory().get('/'))
+        v2_endpoint_enabled()
+
+        RequestCache.clear_all_namespaces()
+        self.waffle_flag.is_enabled.return_value = False
+        self.assertFalse(v2_endpoint_enabled())
+        self.assertEqual(self.waffle_flag.is_enabled.call_count, 2)
+
+    def test_flag_not_cached_outside_request(self):
+        chat_history_enabled(self.course_key)
+        chat_history_enabled(self.course_key)
+        self.assertEqual(self.waffle_flag.is_enabled.call_count, 2)
+
+    def test_flag_unavailable(self):
+        with patch('learning_assistant.toggles._get_learning_assistant_waffle_flag', return_value=None):
+            self.assertFalse(chat_history_enabled(self.course_key))
+        self.waffle_flag.is_enabled.assert_not_called()
+
+
+class GetWaffleFlagTests(TestCase):
+    """
+    Tests for the creation of the learning-assistant Waffle flags
+    """
+
+    def setUp(self):
+        super().setUp()
+        _get_learning_assistant_waffle_flag.cache_clear()
+        self.addCleanup(_get_learning_assistant_waffle_flag.cache_clear)
+
+    def test_flag_created_once(self):
+        waffle_utils = MagicMock()
+        with patch.dict('sys.modules', {'openedx.core.djangoapps.waffle_utils': waffle_utils}):
+            flag = _get_learning_assistant_waffle_flag(ENABLE_CHAT_HISTORY)
+            self.assertIs(_get_learning_assistant_waffle_flag(ENABLE_CHAT_HISTORY), flag)
+
+        waffle_utils.CourseWaffleFlag.assert_called_once_with(
+            'learning_assistant.enable_chat_history',
+            'learning_assistant.toggles',
+        )
+
+    def test_flag_without_platform(self):
+        self.assertIsNone(_get_learning_assistant_waffle_flag(ENABLE_CHAT_HISTORY))
@@ -0,0 +1,165 @@
+"""
+Tests for the token counters
+"""
+from unittest.mock import patch
+
+import ddt
+from django.test import TestCase, override_settings
+
+from learning_assistant.token_counters import (
+    MESSAGE_TOKEN_PADDING,
+    EstimatedTokenCounter,
+    RegexTokenCounter,
+    TokenCounter,
+    _load_token_counter,
+    get_token_counter,
+)
+
+
+class FixedTokenCounter(TokenCounter):
+    """
+    Token counter that counts each character as a token.
+    """
+
+    def __init__(self, cache_size=1024, tokens_per_char=1):
+        super().__init__(cache_size=cache_size)
+        self.tokens_per_char = tokens_per_char
+
+    def count(self, text):
+        return len(text) * self.tokens_per_char
+
+
+@ddt.ddt
+class TokenCounterTests(TestCase):
+    """
+    Tests for the TokenCounter base class
+    """
+
+    def test_count_not_implemented(self):
+        with self.assertRaises(NotImplementedError):
+            TokenCounter().count('Hello')
+
+    def test_count_message(self):
+        self.assertEqual(FixedTokenCounter().count_message('Hello'), 5 + MESSAGE_TOKEN_PADDING)
+
+    @ddt.data(
+        (1024, 2),
+        (0, 4),
+    )
+    @ddt.unpack
+    def test_count_message_cached(self, cache_size, expected_call_count):
+        token_counter = FixedTokenCounter(cache_size=cache_size)
+
+        with patch.object(token_counter, 'count', wraps=token_counter.count) as mock_count:
+            for message in ('Hello', 'World', 'Hello', 'World'):
+                token_counter.count_message(message)
+
+        self.assertEqual(mock_count.call_count, expected_call_count)
+
+    def test_count_message_cache_evicts_least_recently_used(self):
+        token_counter = FixedTokenCounter(cache_size=2)
+
+        with patch.object(token_counter, 'count', wraps=token_counter.count) as mock_count:
+            token_counter.count_message('a')
+            token_counter.count_message('b')
+            token_counter.count_message('a')
+            token_counter.count_message('c')
+            self.assertEqual(mock_count.call_count, 3)
+
+            # 'b' was the least recently used message, so it was evicted when 'c' was counted.
+            token_counter.count_message('a')
+            self.assertEqual(mock_count.call_count, 3)
+            token_counter.count_message('b')
+            self.assertEqual(mock_count.call_count, 4)
+
+    @ddt.data(
+        ('Hello world', 20, 'Hello world'),
+        ('Hello world', 11, 'Hello world'),
+        ('Hello world', 5, 'Hello'),
+        ('Hello world', 0, ''),
+    )
+    @ddt.unpack
+    def test_truncate(self, text, max_tokens, expected_text):
+        self.assertEqual(FixedTokenCounter().truncate(text, max_tokens), expected_text)
+
+    def test_truncate_multiple_tokens_per_char(self):
+        self.assertEqual(FixedTokenCounter(tokens_per_char=2).truncate('Hello world', 5), 'He')
+
+
+class EstimatedTokenCounterTests(TestCase):
+    """
+    Tests for the EstimatedTokenCounter
+    """
+
+    def test_count(self):
+        # 14 characters, excluding spaces, at 3.5 characters per token.
+        self.assertEqual(EstimatedTokenCounter().count('This is a sample text'), 4)
+
+
+@ddt.ddt
+class RegexTokenCounterTests(TestCase):
+    """
+    Tests for the RegexTokenCounter
+    """
+
+    @ddt.data(
+        ('', 0),
+        ('Hello', 1),
+        ('Hello world', 2),
+        ('internationalization', 3),
+        ("I'm", 2),
+        ('12345678', 3),
+        ('return x;', 3),
+        ('a  \n\n b', 3),
+        ('snake_case', 3),
+        ('测试', 2),
+        ('café', 2),
+    )
+    @ddt.unpack
+    def test_count(self, text, expected_tokens):
+        self.assertEqual(RegexTokenCounter().count(text), expected_tokens)
+
+    def test_count_options(self):
+        token_counter = RegexTokenCounter(chars_per_word_token=4, chars_per_symbol_token=1)
+        self.assertEqual(token_counter.count('internationalization ()'), 7)
+
+    def test_truncate(self):
+        self.assertEqual(RegexTokenCounter().truncate('Hello world, this is a test', 3), 'Hello world,')
+
+
+class GetTokenCounterTests(TestCase):
+    """
+    Tests for the get_token_counter function
+    """
+
+    def setUp(self):
+        super().setUp()
+        _load_token_counter.cache_clear()
+
+    def tearDown(self):
+        super().tearDown()
+        _load_token_counter.cache_clear()
+
+    def test_default(self):
+        self.assertIsInstance(get_token_counter(), EstimatedTokenCounter)
+
+    def test_shared_instance(self):
+        self.assertIs(get_token_counter(), get_token_counter())
+
+    @override_settings(
+        CHAT_COMPLETION_TOKEN_COUNTER='tests.test_token_counters.FixedTokenCounter',
+        CHAT_COMPLETION_TOKEN_COUNTER_OPTIONS={'tokens_per_char': 2},
+        CHAT_COMPLETION_TOKEN_COUNT_CACHE_SIZE=16,
+    )
+    def test_setting(self):
+        token_counter = get_token_counter()
+
+        self.assertIsInstance(token_counter, FixedTokenCounter)
+        self.assertEqual(token_counter.tokens_per_char, 2)
+        self.assertEqual(token_counter.cache_size, 16)
+
+    def test_options_change(self):
+        token_counter = get_token_counter()
+
+        with override_settings(CHAT_COMPLETION_TOKEN_COUNT_CACHE_SIZE=0):
+            self.assertIsNot(get_token_counter(), token_counter)
@@ -1,23 +1,37 @@
 """
 Tests for the utils functions
 """
+import asyncio
 import json
 from datetime import datetime
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import ddt
+import httpx
 import responses
+from asgiref.sync import async_to_sync
 from django.conf import settings
+from django.core.cache import cache
 from django.test import TestCase, override_settings
+from requests.exceptions import ConnectionError as RequestsConnectionError
 from requests.exceptions import ConnectTimeout
 
 from learning_assistant.constants import LMS_DATETIME_FORMAT
+from learning_assistant.token_counters import EstimatedTokenCounter, _load_token_counter
 from learning_assistant.utils import (
+    ChatCompletionClient,
+    aget_chat_response,
     extract_message_content,
+    get_async_chat_completion_client,
+    get_chat_completion_client,
     get_chat_response,
+    get_chat_response_stream,
+    get_optimizely_client,
     get_optimizely_variation,
     get_reduced_message_list,
     parse_lms_datetime,
+    reset_chat_completion_client,
+    reset_optimizely_client,
     user_role_is_staff,
 )
 
@@ -94,17 +108,18 @@ class GetChatResponseTests(TestCase):
 
     @ddt.data(
         ConnectionError,
-        ConnectTimeout
+        ConnectTimeout,
+        RequestsConnectionError,
     )
-    @patch('learning_assistant.utils.requests')
-    def test_timeout(self, exception, mock_requests):
-        mock_requests.post = MagicMock(side_effect=exception())
+    @patch('learning_assistant.utils.get_chat_completion_client')
+    def test_timeout(self, exception, mock_client):
+        mock_client.return_value.post = MagicMock(side_effect=exception())
         status_code, _ = self.get_response()
         self.assertEqual(status_code, 502)
 
-    @patch('learning_assistant.utils.requests')
-    def test_post_request_structure(self, mock_requests):
-        mock_requests.post = MagicMock()
+    @patch('learning_assistant.utils.get_chat_completion_client')
+    def test_post_request_structure(self, mock_client):
+        mock_client.return_value.post = MagicMock()
 
         completion_endpoint = settings.CHAT_COMPLETION_API
         connect_timeout = settings.CHAT_COMPLETION_API_CONNECT_TIMEOUT
@@ -116,7 +131,7 @@ class GetChatResponseTests(TestCase):
         }
 
         self.get_response()
-        mock_requests.post.assert_called_with(
+        mock_client.return_value.post.assert_called_with(
             completion_endpoint,
             headers=headers,
             data=json.dumps(response_body),
@@ -124,9 +139,9 @@ class GetChatResponseTests(TestCase):
         )
 
     @patch('learning_assistant.utils.v2_endpoint_enabled')
-    @patch('learning_assistant.utils.requests')
-    def test_post_request_structure_v2_endpoint(self, mock_requests, mock_v2_enabled):
-        mock_requests.post = MagicMock()
+    @patch('learning_assistant.utils.get_chat_completion_client')
+    def test_post_request_structure_v2_endpoint(self, mock_client, mock_v2_enabled):
+        mock_client.return_value.post = MagicMock()
         mock_v2_enabled.return_value = True
 
         completion_endpoint_v2 = settings.CHAT_COMPLETION_API_V2
@@ -141,7 +156,7 @@ class GetChatResponseTests(TestCase):
         }
 
         self.get_response()
-        mock_requests.post.assert_called_with(
+        mock_client.return_value.post.assert_called_with(
             completion_endpoint_v2,
             headers=headers,
             data=json.dumps(response_body),
@@ -174,6 +189,287 @@ class GetChatResponseTests(TestCase):
         self.assertEqual(message, response_data, f"Response mismatch for {description}")
 
 
+class ChatCompletionClientTests(TestCase):
+    """
+    Tests for the ChatCompletionClient and get_chat_completion_client.
+    """
+    def setUp(self):
+        super().setUp()
+        reset_chat_completion_client()
+        self.addCleanup(reset_chat_completion_client)
+
+    @override_settings(CHAT_COMPLETION_API_POOL_SIZE=4, CHAT_COMPLETION_API_CONNECT_RETRIES=3)
+    def test_client_configuration(self):
+        client = get_chat_completion_client()
+        adapter = client.session.get_adapter(settings.CHAT_COMPLETION_API)
+
+        self.assertEqual(adapter._pool_maxsize, 4)  # pylint: disable=protected-access
+        self.assertEqual(adapter.max_retries.connect, 3)
+        # Requests that reached the endpoint must not be retried, as the completion is not idempotent.
+        self.assertFalse(adapter.max_retries.read)
+        self.assertFalse(adapter.max_retries.status)
+
+    def test_client_reused(self):
+        self.assertIs(get_chat_completion_client(), get_chat_completion_client())
+
+    def test_client_reset(self):
+        client = get_chat_completion_client()
+        reset_chat_completion_client()
+        self.assertIsNot(client, get_chat_completion_client())
+
+    @patch('learning_assistant.utils.os.getpid')
+    def test_client_recreated_after_fork(self, mock_getpid):
+        mock_getpid.return_value = 1
+        client = get_chat_completion_client()
+        mock_getpid.return_value = 2
+        self.assertIsNot(client, get_chat_completion_client())
+
+    @responses.activate
+    def test_keep_alive_disabled(self):
+        responses.add(responses.POST, settings.CHAT_COMPLETION_API, status=200, body='{}')
+
+        ChatCompletionClient(keep_alive=False).post(settings.CHAT_COMPLETION_API, headers={'X-Test': 'test'})
+
+        request_headers = responses.calls[0].request.headers
+        self.assertEqual(request_headers['Connection'], 'close')
+        self.assertEqual(request_headers['X-Test'], 'test')
+
+
+def _mock_httpx():
+    """
+    Return a mock of the optional httpx module, with real exception classes.
+    """
+    mock_httpx = MagicMock()
+    mock_httpx.ConnectError = type('ConnectError', (Exception,), {})
+    mock_httpx.ConnectTimeout = type('ConnectTimeout', (Exception,), {})
+    mock_httpx.AsyncClient.return_value.aclose = AsyncMock()
+    return mock_httpx
+
+
+@ddt.ddt
+class AsyncGetChatResponseTests(TestCase):
+    """
+    Tests for the aget_chat_response util function
+    """
+    def setUp(self):
+        super().setUp()
+
+        self.prompt_template = 'This is a prompt.'
+        self.message_list = [{'role': 'assistant', 'content': 'Hello'}, {'role': 'user', 'content': 'Goodbye'}]
+
+    @patch('learning_assistant.utils.get_chat_response')
+    @patch('learning_assistant.utils.httpx', None)
+    async def test_without_httpx(self, mock_get_chat_response):
+        mock_get_chat_response.return_value = (200, {'role': 'assistant', 'content': 'See you later!'})
+
+        status_code, message = await aget_chat_response(self.prompt_template, self.message_list)
+
+        self.assertEqual(status_code, 200)
+        self.assertEqual(message, {'role': 'assistant', 'content': 'See you later!'})
+        mock_get_chat_response.assert_called_once_with(self.prompt_template, self.message_list)
+
+    @override_settings(CHAT_COMPLETION_API=None)
+    @patch('learning_assistant.utils.httpx', _mock_httpx())
+    async def test_no_endpoint_setting(self):
+        status_code, message = await aget_chat_response(self.prompt_template, self.message_list)
+        self.assertEqual(status_code, 404)
+        self.assertEqual(message, 'Completion endpoint is not defined.')
+
+    @patch('learning_assistant.utils.httpx', new_callable=_mock_httpx)
+    async def test_post_request_structure(self, mock_httpx):
+        message_response = {'role': 'assistant', 'content': 'See you later!'}
+        mock_client = mock_httpx.AsyncClient.return_value
+        mock_client.post = AsyncMock(return_value=MagicMock(
+            status_code=200,
+            json=MagicMock(return_value=message_response),
+        ))
+
+        status_code, message = await aget_chat_response(self.prompt_template, self.message_list)
+
+        self.assertEqual(status_code, 200)
+        self.assertEqual(message, message_response)
+        mock_client.post.assert_awaited_once_with(
+            settings.CHAT_COMPLETION_API,
+            headers={'Content-Type': 'application/json'},
+            content=json.dumps({
+                'message_list': [{'role': 'system', 'content': self.prompt_template}] + self.message_list,
+            }),
+            timeout=mock_httpx.Timeout.return_value,
+        )
+        mock_httpx.Timeout.assert_called_once_with(
+            settings.CHAT_COMPLETION_API_READ_TIMEOUT,
+            connect=settings.CHAT_COMPLETION_API_CONNECT_TIMEOUT,
+        )
+
+    @ddt.data('ConnectError', 'ConnectTimeout')
+    @patch('learning_assistant.utils.httpx', new_callable=_mock_httpx)
+    async def test_connection_error(self, exception_name, mock_httpx):
+        mock_client = mock_httpx.AsyncClient.return_value
+        mock_client.post = AsyncMock(side_effect=getattr(mock_httpx, exception_name)())
+
+        status_code, message = await aget_chat_response(self.prompt_template, self.message_list)
+
+        self.assertEqual(status_code, 502)
+        self.assertEqual(message, 'Failed to connect to chat completion API.')
+
+    @override_settings(CHAT_COMPLETION_API_POOL_SIZE=4, CHAT_COMPLETION_API_KEEP_ALIVE=False)
+    @patch('learning_assistant.utils.httpx', new_callable=_mock_httpx)
+    async def test_async_client_reused_within_loop(self, mock_httpx):
+        client = await get_async_chat_completion_client()
+
+        self.assertIs(client, await get_async_chat_completion_client())
+        mock_httpx.AsyncClient.assert_called_once()
+        mock_httpx.Limits.assert_called_once_with(max_connections=4, max_keepalive_connections=0)
+
+    def test_async_client_closed_on_loop_shutdown(self):
+        async def get_clients():
+            return await get_async_chat_completion_client(), await get_async_chat_completion_client()
+
+        first_client, second_client = asyncio.run(get_clients())
+        other_client, _ = asyncio.run(get_clients())
+
+        # Each loop has its own client, which is closed when the loop shuts down.
+        self.assertIs(first_client, second_client)
+        self.assertIsNot(first_client, other_client)
+        self.assertTrue(first_client.is_closed)
+        self.assertTrue(other_client.is_closed)
+
+    def _mock_transport_client(self):
+        """
+        Return an httpx.AsyncClient whose requests are answered with a message, without a network.
+        """
+        return httpx.AsyncClient(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, json={'role': 'assistant', 'content': 'See you later!'})
+        ))
+
+    def test_async_client_shared_by_requests_in_loop(self):
+        client = self._mock_transport_client()
+
+        async def chat_turns():
+            turns = [await aget_chat_response(self.prompt_template, self.message_list) for _ in range(2)]
+            return turns, client.is_closed
+
+        with patch('learning_assistant.utils.create_async_chat_completion_client', return_value=client) as mock_create:
+            chat_responses, closed_during_loop = asyncio.run(chat_turns())
+
+        # As under ASGI, the requests in a loop share a client, which stays open until the loop shuts down.
+        self.assertEqual(chat_responses, [(200, {'role': 'assistant', 'content': 'See you later!'})] * 2)
+        mock_create.assert_called_once()
+        self.assertFalse(closed_during_loop)
+        self.assertTrue(client.is_closed)
+
+    def test_async_client_closed_after_async_to_sync(self):
+        client = self._mock_transport_client()
+
+        with patch('learning_assistant.utils.create_async_chat_completion_client', return_value=client):
+            status_code, _ = async_to_sync(aget_chat_response)(self.prompt_template, self.message_list)
+
+        # As under WSGI, the request runs in a loop of its own, so its client is closed once the request is done.
+        self.assertEqual(status_code, 200)
+        self.assertTrue(client.is_closed)
+
+
+@ddt.ddt
+class GetChatResponseStreamTests(TestCase):
+    """
+    Tests for the get_chat_response_stream util function
+    """
+    def setUp(self):
+        super().setUp()
+
+        self.prompt_template = 'This is a prompt.'
+        self.message_list = [{'role': 'assistant', 'content': 'Hello'}, {'role': 'user', 'content': 'Goodbye'}]
+
+    @override_settings(CHAT_COMPLETION_API=None)
+    def test_no_endpoint_setting(self):
+        status_code, message = get_chat_response_stream(self.prompt_template, self.message_list)
+        self.assertEqual(status_code, 404)
+        self.assertEqual(message, 'Completion endpoint is not defined.')
+
+    @responses.activate
+    def test_200_response_streamed(self):
+        responses.add(
+            responses.POST,
+            settings.CHAT_COMPLETION_API,
+            status=200,
+            body='See you later!',
+        )
+
+        status_code, chunks = get_chat_response_stream(self.prompt_template, self.message_list)
+        self.assertEqual(status_code, 200)
+        self.assertEqual(''.join(chunks), 'See you later!')
+
+        request_body = json.loads(responses.calls[0].request.body)
+        self.assertTrue(request_body['stream'])
+        self.assertEqual(
+            request_body['message_list'],
+            [{'role': 'system', 'content': self.prompt_template}] + self.message_list,
+        )
+
+    @responses.activate
+    def test_non_200_response(self):
+        responses.add(
+            responses.POST,
+            settings.CHAT_COMPLETION_API,
+            status=500,
+            body=json.dumps('Server error'),
+        )
+
+        status_code, message = get_chat_response_stream(self.prompt_template, self.message_list)
+        self.assertEqual(status_code, 500)
+        self.assertEqual(message, 'Server error')
+
+    @responses.activate
+    def test_non_200_response_not_json(self):
+        responses.add(
+            responses.POST,
+            settings.CHAT_COMPLETION_API,
+            status=502,
+            body='<html>Bad Gateway</html>',
+            content_type='text/html',
+        )
+
+        with self.assertLogs('learning_assistant.utils', level='ERROR'):
+            status_code, message = get_chat_response_stream(self.prompt_template, self.message_list)
+        self.assertEqual(status_code, 502)
+        self.assertEqual(message, 'The chat completion API returned an error.')
+
+    @ddt.data(
+        # (v2_enabled, response_data)
+        (False, {'role': 'assistant', 'content': 'v1 response'}),
+        (True, [{'role': 'assistant', 'content': 'v2 response'}]),
+    )
+    @ddt.unpack
+    @responses.activate
+    @patch('learning_assistant.utils.v2_endpoint_enabled')
+    def test_200_response_not_streamed(self, v2_enabled, response_data, mock_v2_enabled):
+        mock_v2_enabled.return_value = v2_enabled
+        responses.add(
+            responses.POST,
+            settings.CHAT_COMPLETION_API_V2 if v2_enabled else settings.CHAT_COMPLETION_API,
+            status=200,
+            json=response_data,
+        )
+
+        status_code, chunks = get_chat_response_stream(self.prompt_template, self.message_list)
+
+        # The content of the message is returned as a single chunk, instead of the JSON of the message.
+        self.assertEqual(status_code, 200)
+        self.assertEqual(list(chunks), [response_data[-1]['content'] if v2_enabled else response_data['content']])
+
+    @ddt.data(
+        ConnectionError,
+        ConnectTimeout,
+        RequestsConnectionError,
+    )
+    @patch('learning_assistant.utils.get_chat_completion_client')
+    def test_timeout(self, exception, mock_client):
+        mock_client.return_value.post = MagicMock(side_effect=exception())
+        status_code, _ = get_chat_response_stream(self.prompt_template, self.message_list)
+        self.assertEqual(status_code, 502)
+
+
+@ddt.ddt
 class GetReducedMessageListTests(TestCase):
     """
     Tests for the _reduced_message_list helper function
@@ -208,6 +504,41 @@ class GetReducedMessageListTests(TestCase):
             self.message_list
         )
 
+    @override_settings(CHAT_COMPLETION_MAX_TOKENS=60)
+    @override_settings(CHAT_COMPLETION_RESPONSE_TOKENS=1)
+    def test_message_list_keeps_most_recent(self):
+        message_list = [{'role': 'user', 'content': f'Message number {i}'} for i in range(10)]
+
+        reduced_message_list = get_reduced_message_list(self.prompt_template, message_list)
+
+        # Each message is estimated at 12 tokens and the prompt at 12 tokens, which leaves room for 3 messages.
+        self.assertEqual(reduced_message_list, message_list[-3:])
+
+    @override_settings(CHAT_COMPLETION_MAX_TOKENS=10)
+    def test_message_list_no_room(self):
+        self.assertEqual(get_reduced_message_list(self.prompt_template, self.message_list), [])
+
+    def test_message_list_not_modified(self):
+        reduced_message_list = get_reduced_message_list(self.prompt_template, self.message_list)
+        reduced_message_list[0]['content'] = 'Changed'
+
+        self.assertEqual(self.message_list[0]['content'], 'Hello')
+
+    @ddt.data(1024, 0)
+    def test_message_tokens_cached(self, cache_size):
+        _load_token_counter.cache_clear()
+
+        with override_settings(CHAT_COMPLETION_TOKEN_COUNT_CACHE_SIZE=cache_size):
+            with patch.object(EstimatedTokenCounter, 'count', autospec=True, return_value=1) as mock_count:
+                get_reduced_message_list(self.prompt_template, self.message_list)
+                get_reduced_message_list(self.prompt_template, self.message_list)
+
+        _load_token_counter.cache_clear()
+
+        # The prompt template and the messages are only counted once if the cache is enabled.
+        expected_call_count = 3 if cache_size else 6
+        self.assertEqual(mock_count.call_count, expected_call_count)
+
 
 @ddt.ddt
 class UserRoleIsStaffTests(TestCase):
@@ -225,23 +556,100 @@ class GetOptimizelyVariationTests(TestCase):
     Tests for the get_optimizely_variation helper function.
     """
 
-    def test_no_sdk_key(self):
-        expected_value = {'enabled': False, 'variation_key': None}
-        self.assertEqual(get_optimizely_variation(1, 'verified'), expected_value)
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        reset_optimizely_client()
+        self.addCleanup(reset_optimizely_client)
 
-    @patch('learning_assistant.utils.optimizely')
-    def test_return_variation(self, mock_optimizely):
-        mock_decision = MagicMock(enabled=True, variation_key='variation')
+    def _mock_optimizely_client(self, mock_optimizely):
+        """
+        Make the mocked Optimizely module return a client deciding the user is in the variation.
+        """
+        mock_decision = MagicMock(enabled=True, variation_key='variation', reasons=[])
         mock_decide = MagicMock(return_value=mock_decision)
         mock_user = MagicMock(decide=mock_decide)
         mock_create_user_context = MagicMock(return_value=mock_user)
         mock_optimizely_client = MagicMock(create_user_context=mock_create_user_context)
         mock_optimizely.Optimizely = MagicMock(return_value=mock_optimizely_client)
+        return mock_optimizely_client
+
+    def test_no_sdk_key(self):
+        expected_value = {'enabled': False, 'variation_key': None}
+        self.assertEqual(get_optimizely_variation(1, 'verified'), expected_value)
+
+    @patch('learning_assistant.utils.PollingConfigManager')
+    @patch('learning_assistant.utils.optimizely')
+    def test_return_variation(self, mock_optimizely, mock_polling_config_manager):
+        self._mock_optimizely_client(mock_optimizely)
 
         with patch.object(settings, 'OPTIMIZELY_FULLSTACK_SDK_KEY', 'sdk_key'):
             expected_value = {'enabled': True, 'variation_key': 'variation'}
             self.assertEqual(get_optimizely_variation(1, 'verified'), expected_value)
 
+        mock_polling_config_manager.assert_called_once_with(sdk_key='sdk_key', update_interval=300)
+        mock_optimizely.Optimizely.assert_called_once_with(config_manager=mock_polling_config_manager.return_value)
+
+    @patch('learning_assistant.utils.PollingConfigManager')
+    @patch('learning_assistant.utils.optimizely')
+    def test_decision_cached(self, mock_optimizely, _):
+        mock_optimizely_client = self._mock_optimizely_client(mock_optimizely)
+
+        with patch.object(settings, 'OPTIMIZELY_FULLSTACK_SDK_KEY', 'sdk_key'):
+            for _ in range(3):
+                get_optimizely_variation(1, 'verified')
+            get_optimizely_variation(1, 'audit')
+            get_optimizely_variation(2, 'verified')
+
+        # The client is created once, and each user and enrollment mode is decided once.
+        mock_optimizely.Optimizely.assert_called_once()
+        self.assertEqual(mock_optimizely_client.create_user_context.call_count, 3)
+
+    @patch('learning_assistant.utils.PollingConfigManager')
+    @patch('learning_assistant.utils.optimizely')
+    def test_decision_not_cached_when_not_ready(self, mock_optimizely, _):
+        mock_optimizely_client = self._mock_optimizely_client(mock_optimizely)
+        mock_decide = mock_optimizely_client.create_user_context.return_value.decide
+        mock_decide.return_value = MagicMock(
+            enabled=False, variation_key=None, reasons=['Optimizely SDK not configured properly yet.']
+        )
+
+        with patch.object(settings, 'OPTIMIZELY_FULLSTACK_SDK_KEY', 'sdk_key'):
+            self.assertEqual(get_optimizely_variation(1, 'verified'), {'enabled': False, 'variation_key': None})
+
+            # Once the datafile is fetched, the user is decided again.
+            mock_decide.return_value = MagicMock(enabled=True, variation_key='variation', reasons=[])
+            self.assertEqual(get_optimizely_variation(1, 'verified'), {'enabled': True, 'variation_key': 'variation'})
+            self.assertEqual(get_optimizely_variation(1, 'verified'), {'enabled': True, 'variation_key': 'variation'})
+
+        self.assertEqual(mock_decide.call_count, 2)
+
+    @override_settings(OPTIMIZELY_FULLSTACK_DATAFILE_PATH='/path/to/datafile.json')
+    @patch('builtins.open')
+    @patch('learning_assistant.utils.optimizely')
+    def test_local_datafile(self, mock_optimizely, mock_open):
+        self._mock_optimizely_client(mock_optimizely)
+        mock_open.return_value.__enter__.return_value.read.return_value = '{"version": "4"}'
+
+        expected_value = {'enabled': True, 'variation_key': 'variation'}
+        self.assertEqual(get_optimizely_variation(1, 'verified'), expected_value)
+
+        mock_open.assert_called_once_with('/path/to/datafile.json', encoding='utf-8')
+        mock_optimizely.Optimizely.assert_called_once_with(datafile='{"version": "4"}')
+
+    @patch('learning_assistant.utils.PollingConfigManager')
+    @patch('learning_assistant.utils.optimizely')
+    def test_reset_client(self, mock_optimizely, _):
+        mock_optimizely_client = self._mock_optimizely_client(mock_optimizely)
+
+        with patch.object(settings, 'OPTIMIZELY_FULLSTACK_SDK_KEY', 'sdk_key'):
+            self.assertIs(get_optimizely_client(), mock_optimizely_client)
+            self.assertIs(get_optimizely_client(), mock_optimizely_client)
+            reset_optimizely_client()
+
+        mock_optimizely_client.close.assert_called_once_with()
+        mock_optimizely.Optimizely.assert_called_once()
+
 
 class ParseLMSDatetimeTests(TestCase):
     """
@@ -6,22 +6,26 @@ import sys
 from datetime import datetime, timedelta
 from importlib import import_module
 from itertools import product
-from unittest.mock import MagicMock, call, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from urllib.parse import urlencode
 
 import ddt
 from django.conf import settings
 from django.contrib.auth import get_user_model, login
+from django.core.cache import cache
 from django.http import HttpRequest
 from django.test import TestCase, override_settings
-from django.test.client import Client
+from django.test.client import AsyncRequestFactory, Client
 from django.urls import reverse
 from django.utils import timezone
 from freezegun import freeze_time
 from opaque_keys import InvalidKeyError
 from opaque_keys.edx.keys import CourseKey
+from requests.exceptions import ReadTimeout
+from rest_framework.test import force_authenticate
 
 from learning_assistant.constants import AUDIT_TRIAL_MAX_DAYS
+from learning_assistant.instrumentation import get_instrumentation_sinks
 from learning_assistant.models import LearningAssistantAuditTrial, LearningAssistantMessage
 
 User = get_user_model()
@@ -84,6 +88,7 @@ class LoggedInTestCase(TestCase):
         self.user = User(username='tester', email='tester@test.com', is_staff=True)
         self.user.save()
         self.client.login_user(self.user)
+        cache.clear()
 
         self.mocked_get_cache_course_run_data = patch(
             'learning_assistant.views.get_cache_course_run_data',
@@ -132,7 +137,7 @@ class CourseChatViewTests(LoggedInTestCase):
         mock_waffle.return_value = True
         mock_get_user_role.return_value = 'staff'
         mock_mode.VERIFIED_MODES = ['verified']
-        mock_enrollment.get_enrollment.return_value = MagicMock(mode='verified')
+        mock_enrollment.get_enrollment.return_value = MagicMock(mode='verified', upgrade_deadline=None)
 
         mock_render.return_value = 'This is a template'
         test_unit_id = 'test-unit-id'
@@ -149,6 +154,33 @@ class CourseChatViewTests(LoggedInTestCase):
         )
         self.assertEqual(response.status_code, 400)
 
+    @patch('learning_assistant.views.get_chat_response', return_value=(200, {'role': 'assistant', 'content': '4'}))
+    @patch('learning_assistant.views.render_prompt_template', return_value='This is a template')
+    @patch('learning_assistant.views.learning_assistant_enabled', return_value=True)
+    @patch('learning_assistant.views.get_user_role', return_value='student')
+    @patch('learning_assistant.views.CourseEnrollment')
+    @patch('learning_assistant.views.CourseMode')
+    @patch('learning_assistant.views.save_chat_turn')
+    def test_eligibility_cached_between_chat_turns(
+        self, mock_save_chat_turn, mock_mode, mock_enrollment, mock_get_user_role, *args
+    ):  # pylint: disable=unused-argument
+        mock_mode.VERIFIED_MODES = ['verified']
+        mock_mode.CREDIT_MODES = ['credit']
+        mock_mode.NO_ID_PROFESSIONAL_MODE = 'no-id'
+        mock_enrollment.get_enrollment.return_value = MagicMock(mode='verified', upgrade_deadline=None)
+        test_data = [{'role': 'user', 'content': 'What is 2+2?'}]
+
+        for _ in range(3):
+            response = self.client.post(
+                reverse('chat', kwargs={'course_run_id': self.course_id}),
+                data=json.dumps(test_data),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 200)
+
+        mock_get_user_role.assert_called_once()
+        mock_enrollment.get_enrollment.assert_called_once()
+
     @ddt.data({
         'start': '2023-01-01T01:00:00Z',  # past date
         'end': '2023-01-30T01:00:00Z',    # past date
@@ -204,7 +236,7 @@ class CourseChatViewTests(LoggedInTestCase):
         mock_mode.CREDIT_MODES = ['credit']
         mock_mode.NO_ID_PROFESSIONAL_MODE = 'no-id'
         mock_mode.UPSELL_TO_VERIFIED_MODES = ['audit']
-        mock_enrollment.get_enrollment.return_value = MagicMock(mode='staff')
+        mock_enrollment.get_enrollment.return_value = MagicMock(mode='staff', upgrade_deadline=None)
         mock_chat_response.return_value = (200, {'role': 'assistant', 'content': 'Something else'})
         mock_render.return_value = 'Rendered template mock'
         mock_trial_expired.return_value = False
@@ -245,7 +277,7 @@ class CourseChatViewTests(LoggedInTestCase):
         mock_mode.UPSELL_TO_VERIFIED_MODES = ['audit']
         mock_mode.objects.get.return_value = MagicMock()
         mock_mode.expiration_datetime.return_value = timezone.now() - timedelta(days=1)
-        mock_enrollment.return_value = MagicMock(mode='audit')
+        mock_enrollment.return_value = MagicMock(mode='audit', upgrade_deadline=None)
 
         response = self.client.post(reverse('chat', kwargs={'course_run_id': self.course_id}))
         self.assertEqual(response.status_code, 403)
@@ -270,7 +302,7 @@ class CourseChatViewTests(LoggedInTestCase):
         mock_mode.UPSELL_TO_VERIFIED_MODES = ['audit']
         mock_mode.objects.get.return_value = MagicMock()
         mock_mode.expiration_datetime.return_value = timezone.now() - timedelta(days=1)
-        mock_enrollment.return_value = MagicMock(mode='unpaid_executive_education')
+        mock_enrollment.return_value = MagicMock(mode='unpaid_executive_education', upgrade_deadline=None)
 
         response = self.client.post(reverse('chat', kwargs={'course_run_id': self.course_id}))
         self.assertEqual(response.status_code, 403)
@@ -286,7 +318,7 @@ class CourseChatViewTests(LoggedInTestCase):
     @patch('learning_assistant.views.get_user_role')
     @patch('learning_assistant.views.CourseEnrollment')
     @patch('learning_assistant.views.CourseMode')
-    @patch('learning_assistant.views.save_chat_message')
+    @patch('learning_assistant.views.save_chat_turn')
     @patch('learning_assistant.views.chat_history_enabled')
     @patch('learning_assistant.views.extract_message_content')
     @override_settings(LEARNING_ASSISTANT_PROMPT_TEMPLATE='This is the default template')
@@ -296,7 +328,7 @@ class CourseChatViewTests(LoggedInTestCase):
         enrollment_mode,
         mock_extract_message_content,
         mock_chat_history_enabled,
-        mock_save_chat_message,
+        mock_save_chat_turn,
         mock_mode,
         mock_enrollment,
         mock_get_user_role,
@@ -311,7 +343,7 @@ class CourseChatViewTests(LoggedInTestCase):
         mock_mode.CREDIT_MODES = ['credit']
         mock_mode.NO_ID_PROFESSIONAL_MODE = 'no-id'
         mock_mode.UPSELL_TO_VERIFIED_MODES = ['audit']
-        mock_enrollment.get_enrollment.return_value = MagicMock(mode=enrollment_mode)
+        mock_enrollment.get_enrollment.return_value = MagicMock(mode=enrollment_mode, upgrade_deadline=None)
         mock_chat_response.return_value = (200, {'role': 'assistant', 'content': 'Something else'})
         mock_render.return_value = 'Rendered template mock'
         mock_trial_expired.return_value = False
@@ -344,13 +376,58 @@ class CourseChatViewTests(LoggedInTestCase):
 
         if enabled_flag:
             mock_extract_message_content.assert_called_once_with({'role': 'assistant', 'content': 'Something else'})
-            mock_save_chat_message.assert_has_calls([
-                call(self.course_run_key, self.user.id, LearningAssistantMessage.USER_ROLE, test_data[-1]['content']),
-                call(self.course_run_key, self.user.id, LearningAssistantMessage.ASSISTANT_ROLE, 'Something else')
-            ])
+            mock_save_chat_turn.assert_called_once_with(
+                self.course_run_key, self.user, test_data[-1]['content'], 'Something else'
+            )
         else:
             mock_extract_message_content.assert_not_called()
-            mock_save_chat_message.assert_not_called()
+            mock_save_chat_turn.assert_not_called()
+
+    @patch('learning_assistant.views.render_prompt_template')
+    @patch('learning_assistant.views.get_chat_response')
+    @patch('learning_assistant.views.learning_assistant_enabled')
+    @patch('learning_assistant.views.get_user_role')
+    @patch('learning_assistant.views.CourseEnrollment')
+    @patch('learning_assistant.views.CourseMode')
+    @patch('learning_assistant.views.save_chat_turn')
+    @patch('learning_assistant.views.chat_history_enabled')
+    @override_settings(LEARNING_ASSISTANT_INSTRUMENTATION_SINKS=['learning_assistant.instrumentation.MemorySink'])
+    def test_chat_response_instrumented(
+        self,
+        mock_chat_history_enabled,
+        mock_save_chat_turn,
+        mock_mode,
+        mock_enrollment,
+        mock_get_user_role,
+        mock_waffle,
+        mock_chat_response,
+        mock_render,
+    ):
+        mock_waffle.return_value = True
+        mock_get_user_role.return_value = 'student'
+        mock_mode.VERIFIED_MODES = ['verified']
+        mock_mode.CREDIT_MODES = ['credit']
+        mock_mode.NO_ID_PROFESSIONAL_MODE = 'no-id'
+        mock_mode.UPSELL_TO_VERIFIED_MODES = ['audit']
+        mock_enrollment.get_enrollment.return_value = MagicMock(mode='verified', upgrade_deadline=None)
+        mock_chat_response.return_value = (200, {'role': 'assistant', 'content': 'Something else'})
+        mock_render.return_value = 'Rendered template mock'
+        mock_chat_history_enabled.return_value = True
+        sink = get_instrumentation_sinks()[0]
+        sink.clear()
+
+        response = self.client.post(
+            reverse('chat', kwargs={'course_run_id': self.course_id}),
+            data=json.dumps([{'role': 'user', 'content': 'What is 2+2?'}]),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sink.stages(),
+            ['check_access', 'get_course_id', 'render_prompt_template', 'save_chat_turn'],
+        )
+        mock_save_chat_turn.assert_called_once()
 
     @ddt.data(
         (True, True),   # v2 enabled, chat history enabled
@@ -366,7 +443,7 @@ class CourseChatViewTests(LoggedInTestCase):
     @patch('learning_assistant.views.get_user_role')
     @patch('learning_assistant.views.CourseEnrollment')
     @patch('learning_assistant.views.CourseMode')
-    @patch('learning_assistant.views.save_chat_message')
+    @patch('learning_assistant.views.save_chat_turn')
     @patch('learning_assistant.views.chat_history_enabled')
     @patch('learning_assistant.views.extract_message_content')
     @override_settings(LEARNING_ASSISTANT_PROMPT_TEMPLATE='This is the default template')
@@ -376,7 +453,7 @@ class CourseChatViewTests(LoggedInTestCase):
         history_enabled,
         mock_extract_message_content,
         mock_chat_history_enabled,
-        mock_save_chat_message,
+        mock_save_chat_turn,
         mock_mode,
         mock_enrollment,
         mock_get_user_role,
@@ -392,7 +469,7 @@ class CourseChatViewTests(LoggedInTestCase):
         mock_mode.CREDIT_MODES = ['credit']
         mock_mode.NO_ID_PROFESSIONAL_MODE = 'no-id'
         mock_mode.UPSELL_TO_VERIFIED_MODES = ['audit']
-        mock_enrollment.get_enrollment.return_value = MagicMock(mode='verified')
+        mock_enrollment.get_enrollment.return_value = MagicMock(mode='verified', upgrade_deadline=None)
         mock_render.return_value = 'Rendered template mock'
         mock_trial_expired.return_value = False
         mock_chat_history_enabled.return_value = history_enabled
@@ -426,13 +503,12 @@ class CourseChatViewTests(LoggedInTestCase):
 
         if history_enabled:
             mock_extract_message_content.assert_called_once_with(api_response)
-            mock_save_chat_message.assert_has_calls([
-                call(self.course_run_key, self.user.id, LearningAssistantMessage.USER_ROLE, test_data[-1]['content']),
-                call(self.course_run_key, self.user.id, LearningAssistantMessage.ASSISTANT_ROLE, expected_content)
-            ])
+            mock_save_chat_turn.assert_called_once_with(
+                self.course_run_key, self.user, test_data[-1]['content'], expected_content
+            )
         else:
             mock_extract_message_content.assert_not_called()
-            mock_save_chat_message.assert_not_called()
+            mock_save_chat_turn.assert_not_called()
 
     @ddt.data(True, False)
     @patch('learning_assistant.views.audit_trial_is_expired')
@@ -442,7 +518,7 @@ class CourseChatViewTests(LoggedInTestCase):
     @patch('learning_assistant.views.get_user_role')
     @patch('learning_assistant.views.CourseEnrollment')
     @patch('learning_assistant.views.CourseMode')
-    @patch('learning_assistant.views.save_chat_message')
+    @patch('learning_assistant.views.save_chat_turn')
     @patch('learning_assistant.views.chat_history_enabled')
     @patch('learning_assistant.views.extract_message_content')
     @override_settings(LEARNING_ASSISTANT_PROMPT_TEMPLATE='This is the default template')
@@ -451,7 +527,7 @@ class CourseChatViewTests(LoggedInTestCase):
         history_enabled,
         mock_extract_message_content,
         mock_chat_history_enabled,
-        mock_save_chat_message,
+        mock_save_chat_turn,
         mock_mode,
         mock_enrollment,
         mock_get_user_role,
@@ -467,7 +543,7 @@ class CourseChatViewTests(LoggedInTestCase):
         mock_mode.CREDIT_MODES = ['credit']
         mock_mode.NO_ID_PROFESSIONAL_MODE = 'no-id'
         mock_mode.UPSELL_TO_VERIFIED_MODES = ['audit']
-        mock_enrollment.get_enrollment.return_value = MagicMock(mode='verified')
+        mock_enrollment.get_enrollment.return_value = MagicMock(mode='verified', upgrade_deadline=None)
         mock_render.return_value = 'Rendered template mock'
         mock_trial_expired.return_value = False
         mock_chat_history_enabled.return_value = history_enabled
@@ -485,7 +561,7 @@ class CourseChatViewTests(LoggedInTestCase):
 
         for api_response, expected_content in test_cases:
             with self.subTest(response=api_response):
-                mock_save_chat_message.reset_mock()
+                mock_save_chat_turn.reset_mock()
                 mock_extract_message_content.reset_mock()
                 mock_chat_response.return_value = (200, api_response)
                 mock_extract_message_content.return_value = expected_content
@@ -501,23 +577,308 @@ class CourseChatViewTests(LoggedInTestCase):
 
                 if history_enabled:
                     mock_extract_message_content.assert_called_once_with(api_response)
-                    mock_save_chat_message.assert_has_calls([
-                        call(
-                            self.course_run_key,
-                            self.user.id,
-                            LearningAssistantMessage.USER_ROLE,
-                            test_data[0]['content']
-                        ),
-                        call(
-                            self.course_run_key,
-                            self.user.id,
-                            LearningAssistantMessage.ASSISTANT_ROLE,
-                            expected_content
-                        )
-                    ])
+                    mock_save_chat_turn.assert_called_once_with(
+                        self.course_run_key, self.user, test_data[0]['content'], expected_content
+                    )
                 else:
                     mock_extract_message_content.assert_not_called()
-                    mock_save_chat_message.assert_not_called()
+                    mock_save_chat_turn.assert_not_called()
+
+    @ddt.data(True, False)
+    @patch('learning_assistant.views.render_prompt_template')
+    @patch('learning_assistant.views.get_chat_response_stream')
+    @patch('learning_assistant.views.get_chat_response')
+    @patch('learning_assistant.views.learning_assistant_enabled')
+    @patch('learning_assistant.views.get_user_role')
+    @patch('learning_assistant.views.CourseEnrollment')
+    @patch('learning_assistant.views.CourseMode')
+    @patch('learning_assistant.views.save_chat_turn')
+    @patch('learning_assistant.views.chat_history_enabled')
+    @override_settings(LEARNING_ASSISTANT_PROMPT_TEMPLATE='This is the default template')
+    def test_chat_response_stream(
+        self,
+        history_enabled,
+        mock_chat_history_enabled,
+        mock_save_chat_turn,
+        mock_mode,
+        mock_enrollment,
+        mock_get_user_role,
+        mock_waffle,
+        mock_chat_response,
+        mock_chat_response_stream,
+        mock_render,
+    ):
+        mock_waffle.return_value = True
+        mock_get_user_role.return_value = 'student'
+        mock_mode.VERIFIED_MODES = ['verified']
+        mock_mode.CREDIT_MODES = ['credit']
+        mock_mode.NO_ID_PROFESSIONAL_MODE = 'no-id'
+        mock_enrollment.get_enrollment.return_value = MagicMock(mode='verified', upgrade_deadline=None)
+        mock_render.return_value = 'Rendered template mock'
+        mock_chat_history_enabled.return_value = history_enabled
+        mock_chat_response_stream.return_value = (200, iter(['Some', 'thing ', 'else']))
+
+        test_data = [{'role': 'user', 'content': 'What is 2+2?'}]
+
+        response = self.client.post(
+            reverse('chat', kwargs={'course_run_id': self.course_id}) + '?stream=true',
+            data=json.dumps(test_data),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(
+            events,
+            'data: {"content": "Some"}\n\n'
+            'data: {"content": "thing "}\n\n'
+            'data: {"content": "else"}\n\n'
+            'event: done\ndata: {}\n\n'
+        )
+
+        mock_chat_response_stream.assert_called_once_with('Rendered template mock', test_data)
+        mock_chat_response.assert_not_called()
+
+        if history_enabled:
+            mock_save_chat_turn.assert_called_once_with(
+                self.course_run_key, self.user, test_data[-1]['content'], 'Something else'
+            )
+        else:
+            mock_save_chat_turn.assert_not_called()
+
+    @patch('learning_assistant.views.render_prompt_template')
+    @patch('learning_assistant.views.get_chat_response_stream')
+    @patch('learning_assistant.views.learning_assistant_enabled')
+    @patch('learning_assistant.views.get_user_role')
+    @patch('learning_assistant.views.CourseEnrollment')
+    @patch('learning_assistant.views.CourseMode')
+    @patch('learning_assistant.views.save_chat_turn')
+    @patch('learning_assistant.views.chat_history_enabled')
+    def test_chat_response_stream_error(
+        self,
+        mock_chat_history_enabled,
+        mock_save_chat_turn,
+        mock_mode,
+        mock_enrollment,
+        mock_get_user_role,
+        mock_waffle,
+        mock_chat_response_stream,
+        mock_render,
+    ):
+        mock_waffle.return_value = True
+        mock_get_user_role.return_value = 'staff'
+        mock_mode.VERIFIED_MODES = ['verified']
+        mock_mode.CREDIT_MODES = ['credit']
+        mock_mode.NO_ID_PROFESSIONAL_MODE = 'no-id'
+        mock_enrollment.get_enrollment.return_value = MagicMock(mode='verified', upgrade_deadline=None)
+        mock_render.return_value = 'Rendered template mock'
+        mock_chat_history_enabled.return_value = True
+        mock_chat_response_stream.return_value = (502, 'Failed to connect to chat completion API.')
+
+        test_data = [{'role': 'user', 'content': 'What is 2+2?'}]
+
+        response = self.client.post(
+            reverse('chat', kwargs={'course_run_id': self.course_id}) + '?stream=true',
+            data=json.dumps(test_data),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(response.json(), 'Failed to connect to chat completion API.')
+        mock_save_chat_turn.assert_called_once_with(self.course_run_key, self.user, test_data[-1]['content'], None)
+
+    @ddt.data(
+        (['Some', 'thing'], 'data: {"content": "Some"}\n\ndata: {"content": "thing"}\n\n', 'Something'),
+        ([], '', None),
+    )
+    @ddt.unpack
+    @patch('learning_assistant.views.render_prompt_template')
+    @patch('learning_assistant.views.get_chat_response_stream')
+    @patch('learning_assistant.views.learning_assistant_enabled')
+    @patch('learning_assistant.views.get_user_role')
+    @patch('learning_assistant.views.CourseEnrollment')
+    @patch('learning_assistant.views.CourseMode')
+    @patch('learning_assistant.views.save_chat_turn')
+    @patch('learning_assistant.views.chat_history_enabled')
+    def test_chat_response_stream_interrupted(
+        self,
+        streamed_chunks,
+        expected_content_events,
+        expected_content,
+        mock_chat_history_enabled,
+        mock_save_chat_turn,
+        mock_mode,
+        mock_enrollment,
+        mock_get_user_role,
+        mock_waffle,
+        mock_chat_response_stream,
+        mock_render,
+    ):
+        mock_waffle.return_value = True
+        mock_get_user_role.return_value = 'staff'
+        mock_mode.VERIFIED_MODES = ['verified']
+        mock_mode.CREDIT_MODES = ['credit']
+        mock_mode.NO_ID_PROFESSIONAL_MODE = 'no-id'
+        mock_enrollment.get_enrollment.return_value = MagicMock(mode='verified', upgrade_deadline=None)
+        mock_render.return_value = 'Rendered template mock'
+        mock_chat_history_enabled.return_value = True
+
+        def chunks():
+            yield from streamed_chunks
+            raise ReadTimeout('Read timed out.')
+
+        mock_chat_response_stream.return_value = (200, chunks())
+
+        test_data = [{'role': 'user', 'content': 'What is 2+2?'}]
+
+        response = self.client.post(
+            reverse('chat', kwargs={'course_run_id': self.course_id}) + '?stream=true',
+            data=json.dumps(test_data),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        with self.assertLogs('learning_assistant.views', level='ERROR'):
+            events = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(
+            events,
+            expected_content_events
+            + 'event: error\ndata: {"detail": "The chat completion stream was interrupted."}\n\n'
+        )
+        mock_save_chat_turn.assert_called_once_with(
+            self.course_run_key, self.user, test_data[-1]['content'], expected_content
+        )
+
+
+@ddt.ddt
+class AsyncCourseChatViewTests(LoggedInTestCase):
+    """
+    Tests for the AsyncCourseChatView
+    """
+    sys.modules['lms.djangoapps.courseware.access'] = MagicMock()
+    sys.modules['lms.djangoapps.courseware.toggles'] = MagicMock()
+    sys.modules['common.djangoapps.course_modes.models'] = MagicMock()
+    sys.modules['common.djangoapps.student.models'] = MagicMock()
+
+    def setUp(self):
+        super().setUp()
+        self.course_id = 'course-v1:edx+test+23'
+        self.course_run_key = CourseKey.from_string(self.course_id)
+        self.factory = AsyncRequestFactory()
+
+    async def post(self, course_run_id, data, authenticate=True):
+        """
+        Post the message list to the AsyncCourseChatView and return its response.
+        """
+        # Imported here, as the views module must be imported after the platform modules above are mocked.
+        from learning_assistant.views import AsyncCourseChatView  # pylint: disable=import-outside-toplevel
+
+        request = self.factory.post(
+            reverse('chat', kwargs={'course_run_id': course_run_id}),
+            data=json.dumps(data),
+            content_type='application/json',
+        )
+        if authenticate:
+            force_authenticate(request, user=self.user)
+
+        return await AsyncCourseChatView.as_view()(request, course_run_id=course_run_id)
+
+    async def test_invalid_course_id(self):
+        response = await self.post('not-a-course-id', [])
+        self.assertEqual(response.status_code, 400)
+
+    async def test_unauthenticated(self):
+        response = await self.post(self.course_id, [], authenticate=False)
+        self.assertIn(response.status_code, (401, 403))
+
+    @patch('learning_assistant.views.learning_assistant_enabled')
+    async def test_course_waffle_inactive(self, mock_waffle):
+        mock_waffle.return_value = False
+        response = await self.post(self.course_id, [])
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data, {'detail': 'Learning assistant not enabled for course.'})
+
+    @ddt.data(True, False)
+    @patch('learning_assistant.views.render_prompt_template')
+    @patch('learning_assistant.views.aget_chat_response', new_callable=AsyncMock)
+    @patch('learning_assistant.views.learning_assistant_enabled')
+    @patch('learning_assistant.views.get_user_role')
+    @patch('learning_assistant.views.CourseEnrollment')
+    @patch('learning_assistant.views.CourseMode')
+    @patch('learning_assistant.views.save_chat_turn')
+    @patch('learning_assistant.views.chat_history_enabled')
+    @patch('learning_assistant.views.extract_message_content')
+    async def test_chat_response(
+        self,
+        history_enabled,
+        mock_extract_message_content,
+        mock_chat_history_enabled,
+        mock_save_chat_turn,
+        mock_mode,
+        mock_enrollment,
+        mock_get_user_role,
+        mock_waffle,
+        mock_chat_response,
+        mock_render,
+    ):
+        mock_waffle.return_value = True
+        mock_get_user_role.return_value = 'student'
+        mock_mode.VERIFIED_MODES = ['verified']
+        mock_mode.CREDIT_MODES = ['credit']
+        mock_mode.NO_ID_PROFESSIONAL_MODE = 'no-id'
+        mock_enrollment.get_enrollment.return_value = MagicMock(mode='verified', upgrade_deadline=None)
+        mock_render.return_value = 'Rendered template mock'
+        mock_chat_history_enabled.return_value = history_enabled
+        mock_chat_response.return_value = (200, {'role': 'assistant', 'content': 'Something else'})
+        mock_extract_message_content.return_value = 'Something else'
+
+        test_data = [
+            {'role': 'user', 'content': 'What is 2+2?'},
+            {'role': 'assistant', 'content': 'It is 4'},
+            {'role': 'user', 'content': 'And what else?'},
+        ]
+
+        response = await self.post(self.course_id, test_data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'role': 'assistant', 'content': 'Something else'})
+        mock_chat_response.assert_awaited_once_with('Rendered template mock', test_data)
+
+        if history_enabled:
+            mock_save_chat_turn.assert_called_once_with(
+                self.course_run_key, self.user, test_data[-1]['content'], 'Something else'
+            )
+        else:
+            mock_save_chat_turn.assert_not_called()
+
+    @patch('learning_assistant.views.aget_chat_response', new_callable=AsyncMock)
+    @patch('learning_assistant.views.learning_assistant_enabled')
+    @patch('learning_assistant.views.get_user_role')
+    @patch('learning_assistant.views.CourseEnrollment')
+    @patch('learning_assistant.views.CourseMode')
+    @patch('learning_assistant.views.chat_history_enabled')
+    async def test_invalid_messages(
+        self,
+        mock_chat_history_enabled,
+        mock_mode,
+        mock_enrollment,
+        mock_get_user_role,
+        mock_waffle,
+        mock_chat_response,
+    ):
+        mock_waffle.return_value = True
+        mock_get_user_role.return_value = 'staff'
+        mock_mode.VERIFIED_MODES = ['verified']
+        mock_mode.CREDIT_MODES = ['credit']
+        mock_mode.NO_ID_PROFESSIONAL_MODE = 'no-id'
+        mock_enrollment.get_enrollment.return_value = MagicMock(mode='verified', upgrade_deadline=None)
+        mock_chat_history_enabled.return_value = False
+
+        response = await self.post(self.course_id, [{'role': 'assistant', 'content': 'Hello'}])
+
+        self.assertEqual(response.status_code, 400)
+        mock_chat_response.assert_not_awaited()
 
 
 @ddt.ddt
@@ -589,7 +950,7 @@ class LearningAssistantChatSummaryViewTests(LoggedInTestCase):
         mock_mode.NO_ID_PROFESSIONAL_MODE = 'no-id'
         mock_mode.UPSELL_TO_VERIFIED_MODES = ['audit']
 
-        mock_enrollment.get_enrollment.return_value = MagicMock(mode=course_mode_mock_value)
+        mock_enrollment.get_enrollment.return_value = MagicMock(mode=course_mode_mock_value, upgrade_deadline=None)
 
         # Set up message history data.
         if chat_history_enabled_mock_value:
@@ -714,7 +1075,7 @@ class LearningAssistantChatSummaryViewTests(LoggedInTestCase):
         mock_mode.NO_ID_PROFESSIONAL_MODE = 'no-id'
         mock_mode.UPSELL_TO_VERIFIED_MODES = ['audit']
 
-        mock_enrollment.get_enrollment.return_value = MagicMock(mode=course_mode_mock_value)
+        mock_enrollment.get_enrollment.return_value = MagicMock(mode=course_mode_mock_value, upgrade_deadline=None)
 
         # Set up message history data.
         if chat_history_enabled_mock_value:
@@ -839,7 +1200,7 @@ class LearningAssistantChatSummaryViewTests(LoggedInTestCase):
         mock_mode.NO_ID_PROFESSIONAL_MODE = 'no-id'
         mock_mode.UPSELL_TO_VERIFIED_MODES = ['audit']
 
-        mock_enrollment.get_enrollment.return_value = MagicMock(mode=course_mode_mock_value)
+        mock_enrollment.get_enrollment.return_value = MagicMock(mode=course_mode_mock_value, upgrade_deadline=None)
 
         # Set up message history data.
         if chat_history_enabled_mock_value:
@@ -970,7 +1331,7 @@ class LearningAssistantChatSummaryViewTests(LoggedInTestCase):
         mock_mode.NO_ID_PROFESSIONAL_MODE = 'no-id'
         mock_mode.UPSELL_TO_VERIFIED_MODES = ['audit']
 
-        mock_enrollment.get_enrollment.return_value = MagicMock(mode='staff')
+        mock_enrollment.get_enrollment.return_value = MagicMock(mode='staff', upgrade_deadline=None)
 
         url_kwargs = {'course_run_id': self.course_id}
         url = reverse('chat-summary', kwargs=url_kwargs)
@@ -979,3 +1340,251 @@ class LearningAssistantChatSummaryViewTests(LoggedInTestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data['enabled'], not dates['expects_fail'])
+
+    @override_settings(LEARNING_ASSISTANT_MESSAGE_HISTORY_MAX_PAGE_SIZE=2)
+    @patch('learning_assistant.views.chat_history_enabled')
+    @patch('learning_assistant.views.learning_assistant_enabled')
+    @patch('learning_assistant.views.get_user_role')
+    @patch('learning_assistant.views.CourseEnrollment')
+    @patch('learning_assistant.views.CourseMode')
+    def test_chat_summary_message_count_not_capped_by_page_size(
+        self,
+        mock_mode,
+        mock_enrollment,
+        mock_get_user_role,
+        mock_learning_assistant_enabled,
+        mock_chat_history_enabled,
+    ):
+        mock_learning_assistant_enabled.return_value = True
+        mock_chat_history_enabled.return_value = True
+        mock_get_user_role.return_value = 'staff'
+        mock_mode.VERIFIED_MODES = ['verified']
+        mock_mode.CREDIT_MODES = ['credit']
+        mock_mode.NO_ID_PROFESSIONAL_MODE = 'no-id'
+        mock_mode.UPSELL_TO_VERIFIED_MODES = ['audit']
+        mock_enrollment.get_enrollment.return_value = MagicMock(mode='staff', upgrade_deadline=None)
+
+        for i in range(1, 4):
+            LearningAssistantMessage.objects.create(
+                course_id=self.course_id,
+                user=self.user,
+                role='user',
+                content=f'Message {i}',
+            )
+
+        url = reverse('chat-summary', kwargs={'course_run_id': self.course_id})
+        response = self.client.get(f"{url}?{urlencode({'message_count': 3})}")
+
+        # The maximum page size only applies to the message history endpoint.
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([message['content'] for message in response.data['message_history']], [
+            'Message 1', 'Message 2', 'Message 3',
+        ])
+
+    @patch('learning_assistant.views.get_audit_trial', return_value=None)
+    @patch('learning_assistant.views.chat_history_enabled', return_value=True)
+    @patch('learning_assistant.views.learning_assistant_enabled', return_value=True)
+    @patch('learning_assistant.views.get_user_role', return_value='student')
+    @patch('learning_assistant.views.CourseEnrollment')
+    @patch('learning_assistant.views.CourseMode')
+    def test_chat_summary_access_evaluated_once(
+        self,
+        mock_mode,
+        mock_enrollment,
+        mock_get_user_role,
+        mock_learning_assistant_enabled,
+        mock_chat_history_enabled,
+        mock_get_audit_trial,
+    ):
+        mock_mode.VERIFIED_MODES = ['verified']
+        mock_mode.CREDIT_MODES = ['credit']
+        mock_mode.NO_ID_PROFESSIONAL_MODE = 'no-id'
+        mock_mode.UPSELL_TO_VERIFIED_MODES = ['audit']
+        mock_enrollment.get_enrollment.return_value = MagicMock(mode='audit', upgrade_deadline=None)
+
+        response = self.client.get(reverse('chat-summary', kwargs={'course_run_id': self.course_id}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['message_history'], [])
+        self.assertEqual(response.data['audit_trial'], {})
+        for mock in (
+            mock_get_audit_trial,
+            mock_learning_assistant_enabled,
+            mock_get_user_role,
+            mock_enrollment.get_enrollment,
+        ):
+            mock.assert_called_once()
+        mock_chat_history_enabled.assert_not_called()
+
+
+class LearningAssistantAccessTests(TestCase):
+    """
+    Tests for the LearningAssistantAccess component
+    """
+    sys.modules['lms.djangoapps.courseware.access'] = MagicMock()
+    sys.modules['common.djangoapps.course_modes.models'] = MagicMock()
+    sys.modules['common.djangoapps.student.models'] = MagicMock()
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='tester', email='tester@test.com')
+        self.course_id = 'course-v1:edx+test+23'
+        self.course_key = CourseKey.from_string(self.course_id)
+
+    def test_for_request(self):
+        from learning_assistant.views import LearningAssistantAccess  # pylint: disable=import-outside-toplevel
+
+        request = MagicMock(user=self.user)
+        access = LearningAssistantAccess.for_request(request, self.course_key, self.course_id)
+
+        other_course_id = 'course-v1:edx+test+24'
+        other_course_key = CourseKey.from_string(other_course_id)
+
+        self.assertIs(LearningAssistantAccess.for_request(request, self.course_key, self.course_id), access)
+        self.assertIsNot(
+            LearningAssistantAccess.for_request(MagicMock(user=self.user), self.course_key, self.course_id), access
+        )
+        self.assertIsNot(LearningAssistantAccess.for_request(request, other_course_key, other_course_id), access)
+
+    @patch('learning_assistant.views.get_cache_course_run_data', return_value=mocked_course)
+    @patch('learning_assistant.views.learning_assistant_enabled', return_value=True)
+    def test_enabled_memoized(self, mock_learning_assistant_enabled, mock_get_cache_course_run_data):
+        from learning_assistant.views import LearningAssistantAccess  # pylint: disable=import-outside-toplevel
+
+        access = LearningAssistantAccess(self.user, self.course_key, self.course_id)
+
+        self.assertTrue(access.enabled)
+        self.assertTrue(access.enabled)
+        mock_learning_assistant_enabled.assert_called_once_with(self.course_key)
+        mock_get_cache_course_run_data.assert_called_once()
+
+    @patch('learning_assistant.views.get_or_create_audit_trial')
+    @patch('learning_assistant.views.get_audit_trial', return_value=None)
+    def test_get_or_create_audit_trial(self, mock_get_audit_trial, mock_get_or_create_audit_trial):
+        from learning_assistant.views import LearningAssistantAccess  # pylint: disable=import-outside-toplevel
+
+        access = LearningAssistantAccess(self.user, self.course_key, self.course_id)
+
+        self.assertIsNone(access.audit_trial)
+        self.assertEqual(access.get_or_create_audit_trial(), mock_get_or_create_audit_trial.return_value)
+        self.assertEqual(access.audit_trial, mock_get_or_create_audit_trial.return_value)
+        self.assertEqual(access.get_or_create_audit_trial(), mock_get_or_create_audit_trial.return_value)
+        mock_get_audit_trial.assert_called_once_with(self.user)
+        mock_get_or_create_audit_trial.assert_called_once_with(self.user)
+
+
+@ddt.ddt
+@freeze_time('2024-06-15')
+class LearningAssistantMessageHistoryViewTests(LoggedInTestCase):
+    """
+    Tests for the LearningAssistantMessageHistoryView
+    """
+    sys.modules['lms.djangoapps.courseware.access'] = MagicMock()
+    sys.modules['lms.djangoapps.courseware.toggles'] = MagicMock()
+    sys.modules['common.djangoapps.course_modes.models'] = MagicMock()
+    sys.modules['common.djangoapps.student.models'] = MagicMock()
+
+    def setUp(self):
+        super().setUp()
+        self.course_id = 'course-v1:edx+test+23'
+        self.url = reverse('message-history', kwargs={'course_run_id': self.course_id})
+
+        for i in range(1, 6):
+            LearningAssistantMessage.objects.create(
+                course_id=self.course_id,
+                user=self.user,
+                role='user',
+                content=f'Message {i}',
+                created=timezone.make_aware(datetime(2024, 6, 1, i)),
+            )
+
+        for target, value in (
+            ('learning_assistant_enabled', True),
+            ('chat_history_enabled', True),
+            ('get_user_role', 'staff'),
+        ):
+            patcher = patch(f'learning_assistant.views.{target}', return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        patcher = patch('learning_assistant.views.CourseEnrollment')
+        mock_enrollment = patcher.start()
+        mock_enrollment.get_enrollment.return_value = MagicMock(mode='staff', upgrade_deadline=None)
+        self.addCleanup(patcher.stop)
+
+        patcher = patch('learning_assistant.views.CourseMode')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get(self, **query_params):
+        return self.client.get(f'{self.url}?{urlencode(query_params)}' if query_params else self.url)
+
+    @patch('learning_assistant.views.CourseKey')
+    def test_invalid_course_id(self, mock_course_key):
+        mock_course_key.from_string = MagicMock(side_effect=InvalidKeyError('foo', 'bar'))
+
+        response = self._get()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'], 'Course ID is not a valid course ID.')
+
+    def test_pages(self):
+        response = self._get(page_size=2)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([message['content'] for message in response.data['message_history']], [
+            'Message 4', 'Message 5',
+        ])
+        self.assertEqual(response.data['message_history'][0]['timestamp'], '2024-06-01T04:00:00Z')
+
+        response = self._get(page_size=2, cursor=response.data['next_cursor'])
+        self.assertEqual([message['content'] for message in response.data['message_history']], [
+            'Message 2', 'Message 3',
+        ])
+
+        response = self._get(page_size=2, cursor=response.data['next_cursor'])
+        self.assertEqual([message['content'] for message in response.data['message_history']], ['Message 1'])
+        self.assertIsNone(response.data['next_cursor'])
+
+    @override_settings(LEARNING_ASSISTANT_MESSAGE_HISTORY_PAGE_SIZE=3)
+    def test_default_page_size(self):
+        response = self._get()
+
+        self.assertEqual(len(response.data['message_history']), 3)
+
+    @override_settings(LEARNING_ASSISTANT_MESSAGE_HISTORY_MAX_PAGE_SIZE=4)
+    def test_page_size_capped(self):
+        response = self._get(page_size=1000)
+
+        self.assertEqual(len(response.data['message_history']), 4)
+        self.assertIsNotNone(response.data['next_cursor'])
+
+    @ddt.data('0', '-1', 'ten')
+    def test_invalid_page_size(self, page_size):
+        response = self._get(page_size=page_size)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'], 'Page size must be a positive integer.')
+
+    def test_invalid_cursor(self):
+        response = self._get(cursor='not a cursor')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'], 'Cursor is not a valid message history cursor.')
+
+    @ddt.data('learning_assistant_enabled', 'chat_history_enabled')
+    def test_disabled(self, target):
+        with patch(f'learning_assistant.views.{target}', return_value=False):
+            response = self._get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'message_history': [], 'next_cursor': None})
+
+    def test_no_access(self):
+        with patch('learning_assistant.views.get_user_role', return_value='student'):
+            with patch('learning_assistant.views.CourseEnrollment') as mock_enrollment:
+                mock_enrollment.get_enrollment.return_value = None
+                response = self._get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'message_history': [], 'next_cursor': None})